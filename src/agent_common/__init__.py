@@ -0,0 +1,7 @@
+"""
+Shared building blocks for the agent applications under ``src/``.
+
+各アプリ（langgraph-supervisor, streamlit-mcp-server-src, uv-agent-api）から
+共通で使う部品をまとめたパッケージ。利用側は ``src`` をPythonパスに追加して
+``from agent_common.xxx import ...`` でインポートします。
+"""
@@ -0,0 +1,449 @@
+"""
+Compiled, shared lookup index for HotPepper area / genre / budget codes.
+
+The code tables used to be rebuilt as dict literals on every call of
+``search_hotpepper_restaurants()``, and duplicate keys in the middle-area
+table silently overwrote each other. Here the tables are kept as ordered
+(name, code) pairs, compiled once at import time into read-only mappings
+and a character trie, and shared by the CLI / GUI supervisors and the
+HotPepper MCP server.
+
+Lookups find the longest name occurring in the query string
+(e.g. "渋谷駅周辺の居酒屋" → "渋谷"), and names that map to more than one
+code are reported as ambiguous instead of being dropped.
+
+エリア・ジャンル・予算コードの表をインポート時に一度だけ構築する共通リゾルバ。
+クエリ文字列中で最も左に現れる地名（同じ位置なら最長のもの）を探し、重複した名前は曖昧な候補として返す。
+"""
+
+import re
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+# 大エリアコード
+LARGE_AREAS: Tuple[Tuple[str, str], ...] = (
+    ("東京", "Z011"),
+    ("神奈川", "Z012"),
+    ("埼玉", "Z013"),
+    ("千葉", "Z014"),
+    ("茨城", "Z015"),
+    ("栃木", "Z016"),
+    ("群馬", "Z017"),
+    ("山梨", "Z018"),
+    ("新潟", "Z019"),
+    ("長野", "Z020"),
+    ("富山", "Z021"),
+    ("石川", "Z022"),
+    ("福井", "Z023"),
+    ("静岡", "Z024"),
+    ("愛知", "Z025"),
+    ("三重", "Z026"),
+    ("岐阜", "Z027"),
+    ("滋賀", "Z028"),
+    ("京都", "Z029"),
+    ("大阪", "Z030"),
+    ("兵庫", "Z031"),
+    ("奈良", "Z032"),
+    ("和歌山", "Z033"),
+    ("鳥取", "Z034"),
+    ("島根", "Z035"),
+    ("岡山", "Z036"),
+    ("広島", "Z037"),
+    ("山口", "Z038"),
+    ("徳島", "Z039"),
+    ("香川", "Z040"),
+    ("愛媛", "Z041"),
+    ("高知", "Z042"),
+    ("福岡", "Z043"),
+    ("佐賀", "Z044"),
+    ("長崎", "Z045"),
+    ("熊本", "Z046"),
+    ("大分", "Z047"),
+    ("宮崎", "Z048"),
+    ("鹿児島", "Z049"),
+    ("沖縄", "Z050"),
+)
+
+# 中エリアコード（元の表の重複もそのまま保持し、曖昧な候補として扱う）
+MIDDLE_AREAS: Tuple[Tuple[str, str], ...] = (
+    ("渋谷", "Z011001"),
+    ("新宿", "Z011002"),
+    ("池袋", "Z011003"),
+    ("銀座", "Z011004"),
+    ("六本木", "Z011005"),
+    ("原宿", "Z011006"),
+    ("青山", "Z011007"),
+    ("表参道", "Z011008"),
+    ("恵比寿", "Z011009"),
+    ("代官山", "Z011010"),
+    ("中目黒", "Z011011"),
+    ("目黒", "Z011012"),
+    ("五反田", "Z011013"),
+    ("品川", "Z011014"),
+    ("大井町", "Z011015"),
+    ("蒲田", "Z011016"),
+    ("羽田", "Z011017"),
+    ("大森", "Z011018"),
+    ("大井", "Z011019"),
+    ("西大井", "Z011020"),
+    ("上野", "Z011021"),
+    ("浅草", "Z011022"),
+    ("秋葉原", "Z011023"),
+    ("御徒町", "Z011024"),
+    ("日暮里", "Z011025"),
+    ("西日暮里", "Z011026"),
+    ("田端", "Z011027"),
+    ("駒込", "Z011028"),
+    ("巣鴨", "Z011029"),
+    ("大塚", "Z011030"),
+    ("池袋", "Z011031"),
+    ("目白", "Z011032"),
+    ("高田馬場", "Z011033"),
+    ("新宿", "Z011034"),
+    ("新大久保", "Z011035"),
+    ("高田馬場", "Z011036"),
+    ("早稲田", "Z011037"),
+    ("神楽坂", "Z011038"),
+    ("飯田橋", "Z011039"),
+    ("市ヶ谷", "Z011040"),
+    ("四ツ谷", "Z011041"),
+    ("新宿御苑前", "Z011042"),
+    ("新宿三丁目", "Z011043"),
+    ("新宿西口", "Z011044"),
+    ("西新宿", "Z011045"),
+    ("中野", "Z011046"),
+    ("高円寺", "Z011047"),
+    ("阿佐ヶ谷", "Z011048"),
+    ("荻窪", "Z011049"),
+    ("西荻窪", "Z011050"),
+    ("吉祥寺", "Z011051"),
+    ("三鷹", "Z011052"),
+    ("武蔵境", "Z011053"),
+    ("東小金井", "Z011054"),
+    ("武蔵小金井", "Z011055"),
+    ("国分寺", "Z011056"),
+    ("西国分寺", "Z011057"),
+    ("立川", "Z011058"),
+    ("八王子", "Z011059"),
+    ("町田", "Z011060"),
+    ("多摩", "Z011061"),
+    ("府中", "Z011062"),
+    ("調布", "Z011063"),
+    ("狛江", "Z011064"),
+    ("成城学園前", "Z011065"),
+    ("祖師ヶ谷大蔵", "Z011066"),
+    ("千歳烏山", "Z011067"),
+    ("仙川", "Z011068"),
+    ("つつじヶ丘", "Z011069"),
+    ("柴崎", "Z011070"),
+    ("国領", "Z011071"),
+    ("布田", "Z011072"),
+    ("調布", "Z011073"),
+    ("西調布", "Z011074"),
+    ("飛田給", "Z011075"),
+    ("武蔵野台", "Z011076"),
+    ("東府中", "Z011077"),
+    ("府中本町", "Z011078"),
+    ("分倍河原", "Z011079"),
+    ("西府", "Z011080"),
+    ("南多摩", "Z011081"),
+    ("多摩センター", "Z011082"),
+    ("唐木田", "Z011083"),
+    ("橋本", "Z011084"),
+    ("相模原", "Z011085"),
+    ("海老名", "Z011086"),
+    ("厚木", "Z011087"),
+    ("本厚木", "Z011088"),
+    ("愛甲石田", "Z011089"),
+    ("伊勢原", "Z011090"),
+    ("鶴巻温泉", "Z011091"),
+    ("東海大学前", "Z011092"),
+    ("小田原", "Z011093"),
+    ("箱根湯本", "Z011094"),
+    ("強羅", "Z011095"),
+    ("早雲山", "Z011096"),
+    ("大涌谷", "Z011097"),
+    ("桃源台", "Z011098"),
+    ("箱根町", "Z011099"),
+    ("元箱根", "Z011100"),
+    ("箱根湯本", "Z011101"),
+    ("小田原", "Z011102"),
+    ("熱海", "Z011103"),
+    ("伊東", "Z011104"),
+    ("伊豆高原", "Z011105"),
+    ("伊豆急下田", "Z011106"),
+    ("下田", "Z011107"),
+    ("石廊崎", "Z011108"),
+    ("松崎", "Z011109"),
+    ("西伊豆", "Z011110"),
+    ("土肥", "Z011111"),
+    ("修善寺", "Z011112"),
+    ("三島", "Z011113"),
+    ("沼津", "Z011114"),
+    ("清水", "Z011115"),
+    ("静岡", "Z011116"),
+    ("焼津", "Z011117"),
+    ("藤枝", "Z011118"),
+    ("島田", "Z011119"),
+    ("金谷", "Z011120"),
+    ("掛川", "Z011121"),
+    ("袋井", "Z011122"),
+    ("磐田", "Z011123"),
+    ("浜松", "Z011124"),
+    ("豊橋", "Z011125"),
+    ("名古屋", "Z011126"),
+    ("岐阜", "Z011127"),
+    ("大垣", "Z011128"),
+    ("関ヶ原", "Z011129"),
+    ("米原", "Z011130"),
+    ("彦根", "Z011131"),
+    ("近江八幡", "Z011132"),
+    ("草津", "Z011133"),
+    ("南草津", "Z011134"),
+    ("瀬田", "Z011135"),
+    ("石山", "Z011136"),
+    ("大津", "Z011137"),
+    ("山科", "Z011138"),
+    ("京都", "Z011139"),
+    ("大阪", "Z011140"),
+    ("神戸", "Z011141"),
+    ("姫路", "Z011142"),
+    ("岡山", "Z011143"),
+    ("広島", "Z011144"),
+    ("福岡", "Z011145"),
+    ("博多", "Z011146"),
+    ("天神", "Z011147"),
+    ("中洲", "Z011148"),
+    ("長崎", "Z011149"),
+    ("熊本", "Z011150"),
+    ("鹿児島", "Z011151"),
+    ("那覇", "Z011152"),
+)
+
+# ジャンルコード
+GENRES: Tuple[Tuple[str, str], ...] = (
+    ("居酒屋", "G001"),
+    ("ダイニングバー・バル", "G002"),
+    ("創作料理", "G003"),
+    ("アジア・エスニック料理", "G004"),
+    ("イタリアン・フレンチ", "G005"),
+    ("中華", "G006"),
+    ("焼肉・ホルモン", "G007"),
+    ("和食", "G008"),
+    ("洋食", "G009"),
+    ("カフェ・スイーツ", "G010"),
+    ("その他グルメ", "G011"),
+    ("韓国料理", "G012"),
+    ("イタリアン", "G005"),
+    ("フレンチ", "G005"),
+    ("エスニック", "G004"),
+    ("アジア料理", "G004"),
+    ("焼肉", "G007"),
+    ("ホルモン", "G007"),
+    ("カフェ", "G010"),
+    ("スイーツ", "G010"),
+    ("ラーメン", "G011"),
+    ("カラオケ", "G011"),
+    ("バー", "G002"),
+)
+
+# 予算コード
+BUDGETS: Tuple[Tuple[str, str], ...] = (
+    ("500円以下", "B009"),
+    ("501～1000円", "B010"),
+    ("1001～1500円", "B011"),
+    ("1501～2000円", "B001"),
+    ("2001～3000円", "B002"),
+    ("3001～4000円", "B003"),
+    ("4001～5000円", "B008"),
+    ("5001～7000円", "B004"),
+    ("7001～10000円", "B005"),
+    ("10001～15000円", "B006"),
+    ("15001～20000円", "B012"),
+    ("20001～30000円", "B013"),
+    ("30001円以上", "B014"),
+    ("3000円以下", "B002"),
+    ("5000円以下", "B008"),
+    ("10000円以下", "B005"),
+)
+
+
+class Match(NamedTuple):
+    """A table entry found in a query string."""
+
+    kind: str
+    name: str
+    code: str
+    start: int
+    end: int
+    # 同じ名前に割り当てられた他のコード（曖昧な場合のみ）
+    alternates: Tuple[str, ...] = ()
+
+    @property
+    def ambiguous(self) -> bool:
+        return bool(self.alternates)
+
+
+_TERMINAL = ""
+
+
+class PhraseResolver:
+    """
+    Immutable name → code resolver with longest-match search.
+
+    Args:
+        kind (str): Label stored in every Match (e.g. "middle_area")
+        entries (Tuple[Tuple[str, str], ...]): Ordered (name, code) pairs;
+            for duplicate names the first code is primary
+    """
+
+    def __init__(self, kind: str, entries: Tuple[Tuple[str, str], ...]):
+        self.kind = kind
+        codes: Dict[str, List[str]] = {}
+        for name, code in entries:
+            if code not in codes.setdefault(name, []):
+                codes[name].append(code)
+
+        self.codes: Mapping[str, str] = MappingProxyType({name: found[0] for name, found in codes.items()})
+        self.alternates: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {name: tuple(found[1:]) for name, found in codes.items() if len(found) > 1}
+        )
+
+        # 文字単位のトライ（終端は空文字キーに名前を格納）
+        trie: Dict[str, Any] = {}
+        for name in self.codes:
+            node = trie
+            for char in name:
+                node = node.setdefault(char, {})
+            node[_TERMINAL] = name
+        self._trie = trie
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.codes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _match(self, name: str, start: int = 0) -> Match:
+        return Match(self.kind, name, self.codes[name], start, start + len(name), self.alternates.get(name, ()))
+
+    def lookup(self, name: str) -> Optional[Match]:
+        """Returns the entry named exactly ``name``, if any."""
+        return self._match(name) if name in self.codes else None
+
+    def _longest_at(self, text: str, start: int) -> Optional[str]:
+        node, found = self._trie, None
+        for char in text[start:]:
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(_TERMINAL, found)
+        return found
+
+    def find_all(self, text: str) -> List[Match]:
+        """
+        Returns non-overlapping matches in ``text``, scanning left to right
+        and taking the longest name at each position.
+        """
+        matches = []
+        start = 0
+        while start < len(text):
+            name = self._longest_at(text, start)
+            if name is None:
+                start += 1
+                continue
+            matches.append(self._match(name, start))
+            start += len(name)
+        return matches
+
+    def longest_match(self, text: str) -> Optional[Match]:
+        """
+        Returns the longest name occurring anywhere in ``text``
+        (the leftmost one on ties).
+        """
+        best = None
+        for start in range(len(text)):
+            name = self._longest_at(text, start)
+            if name and (best is None or len(name) > len(best.name)):
+                best = self._match(name, start)
+        return best
+
+    def resolve(self, text: str) -> Optional[Match]:
+        """Exact lookup first, then the longest match inside ``text``."""
+        return self.lookup(text) or self.longest_match(text)
+
+
+LARGE_AREA_RESOLVER = PhraseResolver("large_area", LARGE_AREAS)
+MIDDLE_AREA_RESOLVER = PhraseResolver("middle_area", MIDDLE_AREAS)
+GENRE_RESOLVER = PhraseResolver("genre", GENRES)
+BUDGET_RESOLVER = PhraseResolver("budget", BUDGETS)
+
+# 読み取り専用の名前→コード表（動的検索で拡張する場合は dict() でコピーして使う）
+LARGE_AREA_CODES = LARGE_AREA_RESOLVER.codes
+MIDDLE_AREA_CODES = MIDDLE_AREA_RESOLVER.codes
+GENRE_CODES = GENRE_RESOLVER.codes
+BUDGET_CODES = BUDGET_RESOLVER.codes
+
+
+def _earliest_match(text: str, resolvers: Tuple[PhraseResolver, ...]) -> Optional[Match]:
+    # 最も左で始まる名前を採用し、同じ位置なら長い方（同じ長さなら先に渡した表）を優先する。
+    # 表ごとの最長一致を比べると "東京都" の中の "京都" のように、先に始まる名前と重なる候補が勝ってしまう
+    for start in range(len(text)):
+        best = None
+        for resolver in resolvers:
+            name = resolver._longest_at(text, start)
+            if name and (best is None or len(name) > len(best.name)):
+                best = resolver._match(name, start)
+        if best:
+            return best
+    return None
+
+
+def resolve_area(location: str) -> Optional[Match]:
+    """
+    Resolves a location string to a large or middle area code.
+
+    Exact names win (large area before middle area, as before); otherwise
+    the area name starting earliest in the string is used, the longest one
+    if several start there (e.g. "新宿三丁目" over "新宿", "東京" in "東京都").
+
+    Args:
+        location (str): Area name or free text (e.g. "渋谷駅周辺")
+
+    Returns:
+        Optional[Match]: Matched entry, or None if no known area occurs
+    """
+    exact = LARGE_AREA_RESOLVER.lookup(location) or MIDDLE_AREA_RESOLVER.lookup(location)
+    if exact:
+        return exact
+    return _earliest_match(location, (LARGE_AREA_RESOLVER, MIDDLE_AREA_RESOLVER))
+
+
+_TOKEN_SEPARATORS = re.compile(r"[\s、,・/／]+")
+_GENRE_SUFFIXES = ("料理", "系", "屋")
+
+
+def resolve_genre(cuisine: str) -> Optional[Match]:
+    """
+    Resolves a cuisine string to a genre code.
+
+    Only whole names match: the string itself, one of its space- or
+    comma-separated tokens, or such a token with a generic suffix
+    ("イタリアン料理"). Names inside longer words are not used
+    ("ハンバーガー" is not "バー"); callers fall back to a keyword search.
+    """
+    exact = GENRE_RESOLVER.lookup(cuisine.strip())
+    if exact:
+        return exact
+    for token in _TOKEN_SEPARATORS.split(cuisine):
+        for candidate in (token, *(token[: -len(s)] for s in _GENRE_SUFFIXES if token.endswith(s))):
+            match = GENRE_RESOLVER.lookup(candidate)
+            if match:
+                start = cuisine.find(candidate)
+                return match._replace(start=start, end=start + len(candidate))
+    return None
+
+
+def resolve_budget(budget: str) -> Optional[Match]:
+    """Resolves a budget string (e.g. "一人5000円以下") to a budget code."""
+    return BUDGET_RESOLVER.resolve(budget)
@@ -0,0 +1,285 @@
+"""
+Shared async HTTP client and sync/async network tools.
+
+The worker-agent tools block on ``requests``, so under ``app.ainvoke`` /
+``app.astream`` each in-flight tool call holds a thread and tool calls of
+one ReAct step cannot overlap on the event loop. This module provides:
+
+- one ``httpx.AsyncClient`` per event loop (keep-alive pool, the per-host
+  timeouts of ``http_pool``, connect retries, and backoff with jitter on
+  429/5xx like the sync session);
+- ``dual_io``: a tool body is written once as a generator that yields
+  ``HttpCall`` objects and receives responses, and the decorator returns
+  the usual sync function (driven by the ``http_pool`` session) with an
+  ``acall`` coroutine (driven by the async client) attached. A body can
+  also yield ``BlockingCall`` for non-HTTP blocking work (a token refresh,
+  a master-data lookup); ``acall`` runs it in a worker thread;
+- ``threaded``: attaches an ``acall`` that runs a blocking function (e.g.
+  the Google API client) in a worker thread.
+
+Errors of the async path are raised as the matching ``requests.exceptions``
+types, so the tools' ``except requests.exceptions.RequestException``
+handlers return the same error dict on both paths.
+
+エージェントツールのHTTP処理をジェネレーターとして1回だけ記述し、
+同期版（requestsのコネクションプール）と非同期版（共有httpx.AsyncClient）の
+両方で実行できるようにする。
+
+Environment variables:
+    HTTP_ASYNC_MAX_CONNECTIONS: Connection limit of the async client (default 100)
+    HTTP_POOL_MAXSIZE / HTTP_MAX_RETRIES / HTTP_BACKOFF_FACTOR / HTTP_BACKOFF_JITTER:
+        Shared with http_pool
+"""
+
+import asyncio
+import functools
+import random
+import weakref
+from typing import Any, Callable, Dict, Generator, NamedTuple, Optional, Tuple, Union
+
+import httpx
+import requests
+
+from agent_common import http_pool
+
+
+class HttpCall(NamedTuple):
+    """A request yielded by a tool body."""
+
+    method: str
+    url: str
+    params: Optional[Dict[str, Any]] = None
+    headers: Optional[Dict[str, str]] = None
+    data: Optional[Dict[str, Any]] = None
+
+
+class BlockingCall(NamedTuple):
+    """A blocking function call yielded by a tool body (run in a worker thread by ``acall``)."""
+
+    func: Callable[..., Any]
+    args: Tuple[Any, ...] = ()
+    kwargs: Optional[Dict[str, Any]] = None
+
+
+# HttpCall / BlockingCallをyieldし、結果を受け取って最終結果をreturnするジェネレーター
+Flow = Generator[Union[HttpCall, BlockingCall], Any, Any]
+
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def build_async_client() -> httpx.AsyncClient:
+    """
+    Creates an async client with a keep-alive pool and connect retries.
+
+    Returns:
+        httpx.AsyncClient: Configured client (not shared)
+    """
+    limits = httpx.Limits(
+        max_connections=http_pool._env_int("HTTP_ASYNC_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=http_pool._env_int("HTTP_POOL_MAXSIZE", 10) * 2,
+    )
+    transport = httpx.AsyncHTTPTransport(limits=limits, retries=http_pool._env_int("HTTP_MAX_RETRIES", 3))
+    # requests と同様にリダイレクトを追従する
+    return httpx.AsyncClient(transport=transport, follow_redirects=True)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Returns the client of the running event loop, creating it on first use.
+
+    httpx connection pools are bound to the loop that created them, so each
+    loop gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = build_async_client()
+        _clients[loop] = client
+    return client
+
+
+def timeout_for(url: str) -> httpx.Timeout:
+    """Returns the http_pool per-host timeout as an ``httpx.Timeout``."""
+    connect, read = http_pool.timeout_for(url)
+    return httpx.Timeout(read, connect=connect)
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    backoff = http_pool._env_float("HTTP_BACKOFF_FACTOR", 0.5) * (2 ** attempt)
+    return backoff + random.uniform(0, http_pool._env_float("HTTP_BACKOFF_JITTER", 0.3))
+
+
+async def arequest(method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """
+    Sends a request through the shared async client.
+
+    Idempotent requests answered with 429/5xx are retried with exponential
+    backoff and jitter; the per-host timeout applies unless ``timeout`` is given.
+
+    Args:
+        method (str): HTTP method
+        url (str): Request URL
+        **kwargs: Passed through to ``httpx.AsyncClient.request``
+
+    Returns:
+        httpx.Response: Response object
+    """
+    kwargs.setdefault("timeout", timeout_for(url))
+    retries = http_pool._env_int("HTTP_MAX_RETRIES", 3) if method.upper() in _IDEMPOTENT_METHODS else 0
+    client = get_async_client()
+    for attempt in range(retries + 1):
+        response = await client.request(method, url, **kwargs)
+        if response.status_code not in http_pool.RETRY_STATUS_CODES or attempt == retries:
+            return response
+        await response.aclose()
+        await asyncio.sleep(_retry_delay(response, attempt))
+    return response
+
+
+async def aget(url: str, params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> httpx.Response:
+    """Async counterpart of ``http_pool.get``."""
+    return await arequest("GET", url, params=params, **kwargs)
+
+
+async def aclose() -> None:
+    """Closes the running loop's client and its pooled connections."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class CompatResponse:
+    """
+    ``httpx.Response`` seen through the parts of the ``requests`` API the tools use.
+
+    ``url`` is a plain string so results stay JSON-serialisable.
+    """
+
+    def __init__(self, response: httpx.Response):
+        self._response = response
+        self.status_code = response.status_code
+        self.url = str(response.url)
+        self.headers = response.headers
+        self.content = response.content
+        self.text = response.text
+
+    def json(self) -> Any:
+        return self._response.json()
+
+    def raise_for_status(self) -> None:
+        """Raises ``requests.exceptions.HTTPError`` with the message ``requests`` uses for 4xx/5xx."""
+        status = self.status_code
+        if status < 400 or status >= 600:
+            return
+        kind = "Client Error" if status < 500 else "Server Error"
+        raise requests.exceptions.HTTPError(
+            f"{status} {kind}: {self._response.reason_phrase} for url: {self.url}", response=self
+        )
+
+
+def _as_requests_error(error: Exception) -> requests.exceptions.RequestException:
+    """Maps an httpx exception to the ``requests`` exception of the same kind."""
+    if isinstance(error, httpx.ConnectTimeout):
+        cls = requests.exceptions.ConnectTimeout
+    elif isinstance(error, httpx.ReadTimeout):
+        cls = requests.exceptions.ReadTimeout
+    elif isinstance(error, httpx.TimeoutException):
+        cls = requests.exceptions.Timeout
+    elif isinstance(error, httpx.TooManyRedirects):
+        cls = requests.exceptions.TooManyRedirects
+    elif isinstance(error, httpx.UnsupportedProtocol):
+        cls = requests.exceptions.InvalidSchema
+    elif isinstance(error, httpx.InvalidURL):
+        cls = requests.exceptions.InvalidURL
+    elif isinstance(error, httpx.NetworkError):
+        # requests は接続・読み込み中の切断も ConnectionError として送出する
+        cls = requests.exceptions.ConnectionError
+    else:
+        cls = requests.exceptions.RequestException
+    return cls(str(error))
+
+
+def _execute(call: Union[HttpCall, BlockingCall]) -> Any:
+    if isinstance(call, BlockingCall):
+        return call.func(*call.args, **(call.kwargs or {}))
+    return http_pool.request(call.method, call.url, params=call.params, headers=call.headers, data=call.data)
+
+
+async def _aexecute(call: Union[HttpCall, BlockingCall]) -> Any:
+    if isinstance(call, BlockingCall):
+        # イベントループを止めないようワーカースレッドで実行する
+        return await asyncio.to_thread(call.func, *call.args, **(call.kwargs or {}))
+    try:
+        response = await arequest(call.method, call.url, params=call.params, headers=call.headers, data=call.data)
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        raise _as_requests_error(e) from e
+    return CompatResponse(response)
+
+
+def run_flow(flow: Flow) -> Any:
+    """Drives a tool body with the pooled sync session."""
+    try:
+        call = next(flow)
+        while True:
+            try:
+                response = _execute(call)
+            except Exception as e:
+                # 例外はyield地点に投げ戻し、ツール本体のexceptで処理させる
+                call = flow.throw(e)
+            else:
+                call = flow.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def arun_flow(flow: Flow) -> Any:
+    """Drives a tool body with the shared async client."""
+    try:
+        call = next(flow)
+        while True:
+            try:
+                response = await _aexecute(call)
+            except Exception as e:
+                call = flow.throw(e)
+            else:
+                call = flow.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+def dual_io(func: Callable[..., Flow]) -> Callable[..., Any]:
+    """
+    Turns a generator tool body into a sync tool with an async ``acall``.
+
+    Both keep the body's name, docstring and signature, so they can be
+    registered together with ``StructuredTool.from_function(func=..., coroutine=...)``.
+    """
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return run_flow(func(*args, **kwargs))
+
+    @functools.wraps(func)
+    async def acall(*args: Any, **kwargs: Any) -> Any:
+        return await arun_flow(func(*args, **kwargs))
+
+    wrapper.acall = acall
+    return wrapper
+
+
+def threaded(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Attaches an ``acall`` that runs a blocking tool in a worker thread.
+
+    For tools built on blocking client libraries (e.g. googleapiclient).
+    """
+    @functools.wraps(func)
+    async def acall(*args: Any, **kwargs: Any) -> Any:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    func.acall = acall
+    return func
@@ -0,0 +1,254 @@
+"""
+Bounded conversation memory for chat agents.
+
+Sending the whole conversation with every LLM call makes prompt tokens (and
+therefore latency and cost) grow linearly with the number of turns.
+``ConversationMemory`` builds the messages actually sent to the model:
+
+- pinned context (system messages, and messages whose
+  ``additional_kwargs["pinned"]`` is true) is always kept;
+- the current turn (the last user message and the tool calls / results that
+  followed it) is always kept whole;
+- earlier turns are added newest first while they fit the token budget.
+  Turns are never split, so a tool result is never separated from the
+  AI message that requested it;
+- turns that fall out of the window are folded into a rolling summary, which
+  is sent as one system message in their place. Summarisation runs in a
+  background thread; a turn uses the summary available at that moment and
+  never waits for the LLM that writes the next one.
+
+The full history stays in the caller's store (checkpointer, session); only
+the prompt is bounded. The prompt-token count of each turn is recorded
+(``last_stats``) so the saving can be measured.
+
+会話履歴のトークン予算付きスライディングウィンドウ。溢れたターンはバックグラウンドで
+要約し、システム／固定メッセージと現在のターンは常に残す。ターン毎のプロンプト
+トークン数を記録する。
+
+Environment variables:
+    MEMORY_MAX_TOKENS: Token budget of the history sent per call (default 2000)
+"""
+
+import concurrent.futures
+import os
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+
+try:
+    from langchain_core.messages.utils import count_tokens_approximately
+except ImportError:  # 古い langchain-core
+    count_tokens_approximately = None
+
+DEFAULT_MAX_TOKENS = 2000
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARY_INSTRUCTION = (
+    "Update the running summary of a conversation between a user and an assistant. "
+    "Keep facts, names, numbers, decisions and open questions that later turns may refer to; "
+    "drop greetings and small talk. Answer with the summary only, in the language of the conversation."
+)
+
+# 要約関数: (これまでの要約, 新たに要約するメッセージ) -> 新しい要約
+Summarizer = Callable[[str, Sequence[BaseMessage]], str]
+
+
+class TurnStats(NamedTuple):
+    """Token accounting of one prompt built by ``ConversationMemory.window``."""
+
+    history_tokens: int  # 全履歴をそのまま送った場合のトークン数
+    prompt_tokens: int  # 実際に送るメッセージのトークン数
+    kept_messages: int
+    evicted_messages: int
+    summarized_messages: int  # 要約に含まれている（溢れた）メッセージ数
+
+
+def approximate_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Approximate token count of messages (about 4 characters per token)."""
+    if count_tokens_approximately is not None:
+        return count_tokens_approximately(messages)
+    return sum(len(str(message.content)) // 4 + 3 for message in messages)
+
+
+def _is_pinned(message: BaseMessage) -> bool:
+    return isinstance(message, SystemMessage) or bool(message.additional_kwargs.get("pinned"))
+
+
+def _split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    # ユーザーのメッセージ毎に区切る（ツール呼び出しと結果は同じターンに残る）
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def llm_summarizer(llm: Any, max_summary_tokens: int = 400) -> Summarizer:
+    """
+    Builds a summarizer that asks a chat model to update the running summary.
+
+    Args:
+        llm: LangChain chat model (a cheap model is enough)
+        max_summary_tokens (int): Length the summary should stay under
+
+    Returns:
+        Summarizer: ``(previous_summary, messages) -> summary``
+    """
+
+    def summarize(previous: str, messages: Sequence[BaseMessage]) -> str:
+        transcript = "\n".join(f"{message.type}: {message.content}" for message in messages if message.content)
+        prompt = (
+            f"{SUMMARY_INSTRUCTION} Stay under about {max_summary_tokens} tokens.\n\n"
+            f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"
+        )
+        return str(llm.invoke([HumanMessage(content=prompt)]).content).strip()
+
+    return summarize
+
+
+class _Session:
+    def __init__(self):
+        self.summary = ""
+        self.summarized = 0  # 要約済みのメッセージ数（固定メッセージを除く履歴の先頭から）
+        self.generation = 0  # 履歴が消去される度に増やす（古い要約を反映しないため）
+        self.pending: Optional[concurrent.futures.Future] = None
+        self.stats: Optional[TurnStats] = None
+
+
+class ConversationMemory:
+    """
+    Token-budgeted sliding window with rolling summarisation.
+
+    Args:
+        max_tokens (int): Budget for pinned context, summary and history per call
+        summarizer (Summarizer): Folds evicted turns into the summary; without
+            one, evicted turns are simply dropped
+        token_counter (Callable): Counts tokens of a list of messages
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        summarizer: Optional[Summarizer] = None,
+        token_counter: Callable[[Sequence[BaseMessage]], int] = approximate_tokens,
+    ):
+        self.max_tokens = max_tokens or int(os.getenv("MEMORY_MAX_TOKENS", str(DEFAULT_MAX_TOKENS)))
+        self.summarizer = summarizer
+        self.count_tokens = token_counter
+        self._sessions: Dict[str, _Session] = {}
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+
+    def _session(self, session_id: str) -> _Session:
+        with self._lock:
+            return self._sessions.setdefault(session_id, _Session())
+
+    def window(self, session_id: str, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """
+        Returns the messages to send to the model for this call.
+
+        Args:
+            session_id (str): Conversation (thread) the messages belong to
+            messages (Sequence[BaseMessage]): Full history, ending with the current turn
+
+        Returns:
+            List[BaseMessage]: Pinned context, summary and the most recent turns
+        """
+        session = self._session(session_id)
+        pinned = [message for message in messages if _is_pinned(message)]
+        history = [message for message in messages if not _is_pinned(message)]
+
+        with self._lock:
+            if session.summarized > len(history):
+                # 履歴が消去された（短くなった）場合は要約もやり直す
+                session.summary, session.summarized = "", 0
+                session.generation += 1
+            summary, summarized = session.summary, session.summarized
+
+        summary_messages = [SystemMessage(content=SUMMARY_PREFIX + summary)] if summary else []
+        budget = self.max_tokens - self.count_tokens(pinned + summary_messages)
+
+        turns = _split_turns(history)
+        kept: List[List[BaseMessage]] = []
+        used = 0
+        for index, turn in enumerate(reversed(turns)):
+            tokens = self.count_tokens(turn)
+            # 現在のターンは予算を超えても必ず残す
+            if index > 0 and used + tokens > budget:
+                break
+            kept.append(turn)
+            used += tokens
+        recent = [message for turn in reversed(kept) for message in turn]
+        evicted = len(history) - len(recent)
+
+        if evicted > summarized and self.summarizer is not None:
+            self._summarize_later(session, history[:evicted])
+        if evicted == 0:
+            summary_messages = []
+
+        prompt = pinned + summary_messages + recent
+        stats = TurnStats(
+            history_tokens=self.count_tokens(messages),
+            prompt_tokens=self.count_tokens(prompt),
+            kept_messages=len(recent),
+            evicted_messages=evicted,
+            summarized_messages=min(summarized, evicted),
+        )
+        with self._lock:
+            session.stats = stats
+        return prompt
+
+    def _summarize_later(self, session: _Session, evicted: List[BaseMessage]) -> None:
+        # 要約中なら次のターンに任せる（LLMの応答を待たない）
+        with self._lock:
+            if session.pending is not None and not session.pending.done():
+                return
+            previous, start = session.summary, session.summarized
+            session.pending = self._pool.submit(self._summarize, session, session.generation, previous, start, evicted)
+
+    def _summarize(self, session: _Session, generation: int, previous: str, start: int, evicted: List[BaseMessage]) -> None:
+        try:
+            summary = self.summarizer(previous, evicted[start:])
+        except Exception as e:
+            print(f"会話履歴の要約に失敗しました: {str(e)}")
+            return
+        with self._lock:
+            # 要約中に履歴が消去されていなければ反映する
+            if session.generation == generation:
+                session.summary, session.summarized = summary, len(evicted)
+
+    def pre_model_hook(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        """
+        ``create_react_agent(pre_model_hook=...)`` adapter.
+
+        Bounds the messages sent to the LLM without changing the stored
+        history; the session is the ``thread_id`` of the run config.
+        """
+        session_id = config.get("configurable", {}).get("thread_id", "default")
+        return {"llm_input_messages": self.window(session_id, state["messages"])}
+
+    def last_stats(self, session_id: str) -> Optional[TurnStats]:
+        """Token accounting of the last prompt built for the session."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session.stats if session else None
+
+    def summary(self, session_id: str) -> Tuple[str, int]:
+        """Current summary of the session and the number of messages it covers."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return (session.summary, session.summarized) if session else ("", 0)
+
+    def wait_for_summaries(self, timeout: Optional[float] = None) -> None:
+        """Waits until pending summaries are written (for tests and benchmarks)."""
+        with self._lock:
+            pending = [s.pending for s in self._sessions.values() if s.pending is not None]
+        concurrent.futures.wait(pending, timeout=timeout)
+
+    def forget(self, session_id: str) -> None:
+        """Drops the summary and statistics of a session (e.g. when its history is cleared)."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
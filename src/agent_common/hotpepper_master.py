@@ -0,0 +1,317 @@
+"""
+Local store for the HotPepper Gourmet master tables.
+
+All master tables (genre, budget, special, credit card and the large /
+middle / small area lists) are fetched once, persisted to a JSON file and
+served from memory. A stale file is still used immediately while a
+background thread refreshes it, so steady-state lookups never hit the
+network. Names are indexed by exact match, prefix (sorted list + bisect)
+and character bigrams so area / genre resolution does not scan the whole
+table.
+
+ホットペッパーのマスターデータを一度だけ取得してローカルファイルに保存し、
+メモリ上の索引（完全一致・前方一致・バイグラム）から引けるようにする。
+
+Environment variables:
+    RECRUIT_API_KEY: HotPepper API key
+    HOTPEPPER_MASTER_CACHE: Path of the JSON cache file
+    HOTPEPPER_MASTER_TTL: Seconds before the cache is refreshed (default 1 day)
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+API_BASE_URL = "https://webservice.recruit.co.jp/hotpepper"
+
+# マスター種別 → (エンドポイント, レスポンス内のキー)
+MASTER_TABLES: Dict[str, str] = {
+    "genre": "genre",
+    "budget": "budget",
+    "special": "special",
+    "special_category": "special_category",
+    "credit_card": "credit_card",
+    "large_area": "large_area",
+    "middle_area": "middle_area",
+    "small_area": "small_area",
+}
+
+# ツールで使われてきた別名
+MASTER_ALIASES = {"area": "small_area"}
+
+DEFAULT_CACHE_PATH = os.path.join(Path.home(), ".cache", "agent_common", "hotpepper_master.json")
+DEFAULT_TTL = 24 * 60 * 60
+
+Fetcher = Callable[[str], List[Dict[str, Any]]]
+
+
+class HotPepperMasterError(Exception):
+    """Raised when the HotPepper API returns an error payload."""
+
+
+def resolve_master_type(master_type: str) -> str:
+    """
+    Maps a tool-facing master type (including aliases) to a table name.
+
+    Raises:
+        KeyError: If the master type is not supported
+    """
+    name = MASTER_ALIASES.get(master_type, master_type)
+    if name not in MASTER_TABLES:
+        raise KeyError(master_type)
+    return name
+
+
+def fetch_master_table(table: str, api_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Downloads one master table from the HotPepper API.
+
+    Args:
+        table (str): Table name (key of MASTER_TABLES)
+        api_key (Optional[str]): API key, defaults to RECRUIT_API_KEY
+
+    Returns:
+        List[Dict[str, Any]]: Raw records of the table
+    """
+    from agent_common import http_pool
+
+    params = {
+        "key": api_key or os.getenv("RECRUIT_API_KEY", "18c8f07145ccf2ad"),
+        "format": "json",
+    }
+    response = http_pool.get(f"{API_BASE_URL}/{table}/v1/", params=params)
+    response.raise_for_status()
+    data = response.json()
+    if "error" in data:
+        error_info = data["error"]
+        if isinstance(error_info, list):
+            error_info = error_info[0] if error_info else {}
+        raise HotPepperMasterError(
+            f"{error_info.get('message', '不明なエラー')} (コード: {error_info.get('code', 'N/A')})"
+        )
+    results = data.get("results", {})
+    if MASTER_TABLES[table] not in results:
+        raise HotPepperMasterError(f"{table}マスターデータの形式が正しくありません。")
+    return results[MASTER_TABLES[table]]
+
+
+class NameIndex:
+    """
+    Immutable name index over master records.
+
+    Supports exact lookup, prefix lookup via bisect over the sorted names
+    and substring lookup via a character bigram inverted index.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        self.exact: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            name = record.get("name", "")
+            if name:
+                self.exact.setdefault(name, []).append(record)
+        self.sorted_names: List[str] = sorted(self.exact)
+        self.grams: Dict[str, Set[str]] = {}
+        for name in self.sorted_names:
+            for gram in self._grams(name):
+                self.grams.setdefault(gram, set()).add(name)
+
+    @staticmethod
+    def _grams(text: str) -> Set[str]:
+        # 1文字の名前・クエリも引けるよう、ユニグラムも索引に含める
+        return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+    def lookup(self, name: str) -> List[Dict[str, Any]]:
+        """Returns records whose name equals ``name``."""
+        return self.exact.get(name, [])
+
+    def prefix(self, prefix: str, limit: int = 20) -> List[str]:
+        """Returns up to ``limit`` names starting with ``prefix``."""
+        start = bisect.bisect_left(self.sorted_names, prefix)
+        names = []
+        for name in self.sorted_names[start:start + limit]:
+            if not name.startswith(prefix):
+                break
+            names.append(name)
+        return names
+
+    def containing(self, text: str) -> List[str]:
+        """Returns names that contain ``text`` as a substring."""
+        if not text:
+            return []
+        grams = [text[i:i + 2] for i in range(len(text) - 1)] or [text]
+        postings = sorted((self.grams.get(gram, set()) for gram in grams), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return sorted(name for name in candidates if text in name)
+
+    def contained_in(self, text: str) -> List[str]:
+        """Returns names that appear as a substring of ``text``."""
+        found = {
+            text[i:j]
+            for i in range(len(text))
+            for j in range(i + 1, len(text) + 1)
+            if text[i:j] in self.exact
+        }
+        return sorted(found)
+
+    def match(self, text: str) -> List[str]:
+        """Returns names that contain ``text`` or are contained in it (exact match first)."""
+        names = self.containing(text)
+        names += [name for name in self.contained_in(text) if name not in names]
+        if text in self.exact:
+            names.remove(text)
+            names.insert(0, text)
+        return names
+
+
+class HotPepperMasterStore:
+    """
+    Cached, indexed HotPepper master tables.
+
+    Args:
+        cache_path (str): JSON file used to persist the tables
+        ttl (float): Seconds before a refresh is triggered
+        fetcher (Optional[Fetcher]): Function downloading one table (for tests/offline use)
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        fetcher: Optional[Fetcher] = None,
+    ):
+        self.cache_path = Path(cache_path or os.getenv("HOTPEPPER_MASTER_CACHE", DEFAULT_CACHE_PATH))
+        self.ttl = ttl if ttl is not None else float(os.getenv("HOTPEPPER_MASTER_TTL", DEFAULT_TTL))
+        self.fetcher = fetcher or fetch_master_table
+        self._tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._indexes: Dict[str, NameIndex] = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    # --- Loading ---
+
+    def _install(self, tables: Dict[str, List[Dict[str, Any]]], fetched_at: float) -> None:
+        indexes = {table: NameIndex(records) for table, records in tables.items()}
+        # 索引を作ってから差し替える（参照側は常に一貫したスナップショットを見る）
+        self._tables, self._indexes, self._fetched_at = tables, indexes, fetched_at
+
+    def _read_file(self) -> bool:
+        if not self.cache_path.exists():
+            return False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return False
+        tables = payload.get("tables", {})
+        if set(tables) != set(MASTER_TABLES):
+            return False
+        self._install(tables, payload.get("fetched_at", 0.0))
+        return True
+
+    def _fetch_all(self) -> None:
+        tables = {table: self.fetcher(table) for table in MASTER_TABLES}
+        fetched_at = time.time()
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": fetched_at, "tables": tables}, f, ensure_ascii=False)
+        tmp.replace(self.cache_path)
+        self._install(tables, fetched_at)
+
+    def _background_refresh(self) -> None:
+        try:
+            self._fetch_all()
+        except Exception as e:
+            # 失敗しても古いデータで提供を続ける
+            print(f"ホットペッパーマスターデータの更新に失敗しました: {e}")
+        finally:
+            self._refreshing = False
+
+    def is_stale(self) -> bool:
+        return time.time() - self._fetched_at >= self.ttl
+
+    def ensure_loaded(self) -> None:
+        """
+        Makes the tables available, fetching synchronously only on first use.
+
+        A stale in-memory or on-disk copy is served immediately and refreshed
+        in a background thread.
+        """
+        if self._tables and not self.is_stale():
+            return
+        with self._lock:
+            if not self._tables and not self._read_file():
+                self._fetch_all()
+                return
+            if self.is_stale() and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def refresh(self) -> None:
+        """Downloads every table again and rewrites the cache file."""
+        with self._lock:
+            self._fetch_all()
+
+    # --- Lookups ---
+
+    @property
+    def fetched_at(self) -> float:
+        return self._fetched_at
+
+    def records(self, master_type: str) -> List[Dict[str, Any]]:
+        """
+        Returns the raw records of a master table.
+
+        Args:
+            master_type (str): Master type (aliases such as "area" are accepted)
+
+        Raises:
+            KeyError: If the master type is not supported
+        """
+        table = resolve_master_type(master_type)
+        self.ensure_loaded()
+        return self._tables[table]
+
+    def index(self, master_type: str) -> NameIndex:
+        """Returns the name index of a master table."""
+        table = resolve_master_type(master_type)
+        self.ensure_loaded()
+        return self._indexes[table]
+
+    def lookup_code(self, master_type: str, name: str) -> Optional[str]:
+        """Returns the code of the record named exactly ``name``, if any."""
+        matches = self.index(master_type).lookup(name)
+        return matches[0].get("code") if matches else None
+
+    def find(self, master_type: str, text: str) -> List[Dict[str, Any]]:
+        """
+        Returns records whose name contains ``text`` or is contained in it.
+
+        Args:
+            master_type (str): Master type
+            text (str): Name or free text (e.g. "大崎駅周辺")
+
+        Returns:
+            List[Dict[str, Any]]: Matching records, exact matches first
+        """
+        index = self.index(master_type)
+        return [record for name in index.match(text) for record in index.lookup(name)]
+
+
+_store: Optional[HotPepperMasterStore] = None
+_store_lock = threading.Lock()
+
+
+def get_master_store() -> HotPepperMasterStore:
+    """Returns the process-wide master store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HotPepperMasterStore()
+    return _store
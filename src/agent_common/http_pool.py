@@ -0,0 +1,168 @@
+"""
+Process-wide pooled HTTP transport for external API tools.
+
+Every tool used to call the bare ``requests.get``, which opens a new TCP+TLS
+connection per call. This module keeps one ``requests.Session`` per process
+with keep-alive connection pools per host, retries with exponential backoff
+and jitter for transient failures, and a timeout table per host.
+
+外部APIツール用のプロセス共通HTTPセッション（ホスト毎のコネクションプール、
+リトライ＋ジッター付きバックオフ、ホスト毎のタイムアウト）。
+
+Environment variables:
+    HTTP_POOL_CONNECTIONS: Number of per-host pools kept alive (default 16)
+    HTTP_POOL_MAXSIZE: Connections kept alive per host (default 10)
+    HTTP_MAX_RETRIES: Retries for connection errors and 429/5xx (default 3)
+    HTTP_BACKOFF_FACTOR: Base of the exponential backoff in seconds (default 0.5)
+    HTTP_BACKOFF_JITTER: Random jitter added to each backoff in seconds (default 0.3)
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect timeout, read timeout) in seconds
+Timeout = Tuple[float, float]
+
+DEFAULT_TIMEOUT: Timeout = (3.05, 10.0)
+
+# ホスト毎のタイムアウト（接続, 読み込み）
+HOST_TIMEOUTS: Dict[str, Timeout] = {
+    "webservice.recruit.co.jp": (3.05, 10.0),
+    "maps.googleapis.com": (3.05, 10.0),
+    "www.googleapis.com": (3.05, 10.0),
+    "www.jalan.net": (5.0, 10.0),
+    "www.airbnb.com": (5.0, 15.0),
+    "accounts.spotify.com": (3.05, 10.0),
+    "api.spotify.com": (3.05, 10.0),
+}
+
+# ホスト毎のプールサイズ（未指定のホストは HTTP_POOL_MAXSIZE）
+HOST_POOL_SIZES: Dict[str, int] = {}
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _retry() -> Retry:
+    options: Dict[str, Any] = dict(
+        total=_env_int("HTTP_MAX_RETRIES", 3),
+        backoff_factor=_env_float("HTTP_BACKOFF_FACTOR", 0.5),
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        respect_retry_after_header=True,
+        # 最終的なステータスは呼び出し側の raise_for_status() に任せる
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=_env_float("HTTP_BACKOFF_JITTER", 0.3), **options)
+    except TypeError:
+        # urllib3 < 2.0 には backoff_jitter がない
+        return Retry(**options)
+
+
+def _adapter(pool_maxsize: int) -> HTTPAdapter:
+    return HTTPAdapter(
+        pool_connections=_env_int("HTTP_POOL_CONNECTIONS", 16),
+        pool_maxsize=pool_maxsize,
+        max_retries=_retry(),
+        pool_block=False,
+    )
+
+
+def build_session() -> requests.Session:
+    """
+    Creates a session with pooled adapters, retries and backoff.
+
+    Returns:
+        requests.Session: Configured session (not shared)
+    """
+    session = requests.Session()
+    default_adapter = _adapter(_env_int("HTTP_POOL_MAXSIZE", 10))
+    session.mount("https://", default_adapter)
+    session.mount("http://", default_adapter)
+    for host, size in HOST_POOL_SIZES.items():
+        session.mount(f"https://{host}/", _adapter(size))
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the process-wide session, creating it on first use.
+
+    Returns:
+        requests.Session: Shared session with keep-alive connection pools
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def timeout_for(url: str) -> Timeout:
+    """
+    Returns the (connect, read) timeout configured for the URL's host.
+
+    Args:
+        url (str): Request URL
+
+    Returns:
+        Timeout: Per-host timeout, or DEFAULT_TIMEOUT
+    """
+    host = urlsplit(url).hostname or ""
+    return HOST_TIMEOUTS.get(host, DEFAULT_TIMEOUT)
+
+
+def request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """
+    Sends a request through the shared session.
+
+    The per-host timeout is applied unless ``timeout`` is given explicitly.
+
+    Args:
+        method (str): HTTP method
+        url (str): Request URL
+        **kwargs: Passed through to ``requests.Session.request``
+
+    Returns:
+        requests.Response: Response object
+    """
+    kwargs.setdefault("timeout", timeout_for(url))
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url: str, params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> requests.Response:
+    """Drop-in replacement for ``requests.get`` that uses the shared pool."""
+    return request("GET", url, params=params, **kwargs)
+
+
+def close() -> None:
+    """Closes the shared session and its pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
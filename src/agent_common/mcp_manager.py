@@ -0,0 +1,574 @@
+"""
+Process-wide MCP connection manager for the Streamlit apps.
+
+``MultiServerMCPClient.get_tools()`` returns tools that open a new session
+for every call, and the Streamlit apps rebuilt the client on every
+(re)initialisation, so each tool call spawned a fresh stdio server process
+(Python start-up, imports, MCP handshake) and every browser session paid
+the same start-up again. ``MCPConnectionManager`` instead:
+
+- keeps one long-lived session (and server process) per configured server,
+  owned by a background event-loop thread, so the process survives
+  Streamlit reruns and is shared by all browser sessions of the process;
+- hands out LangChain tools that forward calls to that session from any
+  thread or event loop (each Streamlit session has its own loop);
+- pings the servers periodically (and while a call is pending) and
+  restarts dead ones; a call that fails because its server died is
+  retried once after the restart;
+- stops servers that have been idle for a while (they restart lazily on
+  the next call) and shuts everything down at interpreter exit.
+
+Servers are identified by name and connection settings, so two configs
+that define the same server share its process. Relative stdio paths are
+resolved against the working directory at registration time.
+
+Start-up is concurrent and bounded: each server gets its own start-up
+timeout (``"startup_timeout"`` in its config entry, MCP_STARTUP_TIMEOUT
+otherwise), and a slow or broken server is left out of the returned tools
+instead of failing or blocking the others. A timed-out server keeps
+starting in the background; a failed one is retried by the health check.
+The tool schemas of stdio servers are cached on disk, keyed by a hash of
+the server script and its connection settings, so once a server has been
+seen its tools are returned immediately and the agent can be built while
+the process is still warming up (the first call waits for it).
+
+MCPサーバーをプロセス内で1つずつ常駐させ、Streamlitの再実行・複数セッション間で
+共有する。ヘルスチェックで落ちたサーバーを再起動し、終了時にまとめて停止する。
+
+Environment variables:
+    MCP_HEALTH_INTERVAL: Seconds between health checks (default 30)
+    MCP_PING_TIMEOUT: Seconds to wait for a ping reply (default 5)
+    MCP_IDLE_TIMEOUT: Seconds without use before a server is stopped (default 1800)
+    MCP_STARTUP_TIMEOUT: Seconds to wait for a server without cached schemas (default 15)
+    MCP_SCHEMA_CACHE: Path of the tool schema cache (default ~/.cache/agent_common/mcp_tool_schemas.json)
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+DEFAULT_HEALTH_INTERVAL = 30.0
+DEFAULT_PING_TIMEOUT = 5.0
+DEFAULT_IDLE_TIMEOUT = 1800.0
+DEFAULT_STARTUP_TIMEOUT = 15.0
+DEFAULT_SCHEMA_CACHE_PATH = os.path.join(Path.home(), ".cache", "agent_common", "mcp_tool_schemas.json")
+_STOP_TIMEOUT = 5.0
+
+ServerKey = Tuple[str, str]
+
+
+def _server_key(name: str, connection: Mapping[str, Any]) -> ServerKey:
+    return name, json.dumps(connection, sort_keys=True, default=str)
+
+
+def _normalize(connection: Mapping[str, Any]) -> Dict[str, Any]:
+    connection = dict(connection)
+    # "./tools/xxx.py" のような相対パスは登録時の作業ディレクトリで解決する
+    if connection.get("transport", "stdio") == "stdio" and not connection.get("cwd"):
+        connection["cwd"] = os.getcwd()
+    return connection
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _source_hash(connection: Mapping[str, Any]) -> Optional[str]:
+    """Hash of a stdio server's script files and connection settings (None if there is no script)."""
+    if connection.get("transport", "stdio") != "stdio":
+        return None
+    cwd = connection.get("cwd") or os.getcwd()
+    files = [os.path.join(cwd, arg) for arg in connection.get("args", []) if os.path.isfile(os.path.join(cwd, arg))]
+    if not files:
+        return None
+    digest = hashlib.sha256(json.dumps(connection, sort_keys=True, default=str).encode("utf-8"))
+    for path in files:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _describe(error: BaseException) -> str:
+    # anyioのTaskGroupはExceptionGroupで包むため、原因の例外を取り出す
+    while getattr(error, "exceptions", None):
+        error = error.exceptions[0]
+    return f"{type(error).__name__}: {error}"
+
+
+def _tool_schema(tool: Any) -> Dict[str, Any]:
+    args_schema = tool.args_schema
+    if not isinstance(args_schema, dict):
+        args_schema = args_schema.model_json_schema()
+    return {
+        "name": tool.name,
+        "description": tool.description,
+        "args_schema": args_schema,
+        "response_format": tool.response_format,
+        "metadata": tool.metadata,
+    }
+
+
+class ToolSchemaCache:
+    """
+    Tool schemas of MCP servers on disk, one entry per server.
+
+    Entries are stored under a digest of the server's identity (never the
+    raw connection, which may hold API keys in ``env``) together with the
+    source hash they were listed for; a changed script misses the cache.
+    A start-up failure is recorded too, so the next process does not wait
+    for a server that is known to be broken.
+
+    Args:
+        path (Optional[str]): Cache file (MCP_SCHEMA_CACHE by default)
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv("MCP_SCHEMA_CACHE", DEFAULT_SCHEMA_CACHE_PATH))
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _entry(self, server_id: str, source_hash: str) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._load().get(server_id)
+        return entry if entry and entry.get("hash") == source_hash else {}
+
+    def get(self, server_id: str, source_hash: str) -> Optional[List[Dict[str, Any]]]:
+        """Returns the cached tool schemas, or None if the server script changed or was never listed."""
+        return self._entry(server_id, source_hash).get("tools")
+
+    def failure(self, server_id: str, source_hash: str) -> Optional[str]:
+        """Returns the recorded start-up error of this server version, if any."""
+        return self._entry(server_id, source_hash).get("error")
+
+    def put(self, server_id: str, source_hash: str, schemas: List[Dict[str, Any]]) -> None:
+        self._write(server_id, {"hash": source_hash, "tools": schemas})
+
+    def put_failure(self, server_id: str, source_hash: str, error: str) -> None:
+        self._write(server_id, {"hash": source_hash, "error": error})
+
+    def _write(self, server_id: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            entries = self._load()
+            if entries.get(server_id) == entry:
+                return
+            entries[server_id] = entry
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, ensure_ascii=False, default=str)
+                tmp.replace(self.path)
+            except OSError:
+                # キャッシュに書けなくても起動処理は続ける
+                pass
+
+
+class _Server:
+    """State of one managed server; touched only on the manager's loop."""
+
+    def __init__(self, name: str, connection: Dict[str, Any]):
+        self.name = name
+        self.connection = connection
+        self.key = _server_key(name, connection)
+        self.server_id = _digest(f"{self.key[0]}:{self.key[1]}")[:16]
+        self.source_hash = _source_hash(connection)
+        self.startup_timeout = DEFAULT_STARTUP_TIMEOUT
+        self.session: Any = None
+        self.tools: Dict[str, Any] = {}
+        self.schemas: Optional[List[Dict[str, Any]]] = None
+        self.known_failure: Optional[str] = None
+        self.bridges: Dict[str, Any] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.stopping: Optional[asyncio.Event] = None
+        self.lock: Optional[asyncio.Lock] = None
+        self.generation = 0
+        self.restarts = 0
+        self.startup_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.failed_at: Optional[float] = None
+        self.last_used = time.monotonic()
+
+    def alive(self) -> bool:
+        return self.session is not None and self.task is not None and not self.task.done()
+
+    def failed(self) -> bool:
+        return self.task is not None and self.task.done()
+
+    def offered(self) -> bool:
+        # 起動中でもスキーマが分かっていればツールを提供する（呼び出しは起動完了を待つ）
+        return self.schemas is not None and not self.failed()
+
+    def status(self) -> Dict[str, Any]:
+        if self.alive():
+            state = "ready"
+        elif self.failed():
+            state = "failed"
+        elif self.task is not None:
+            state = "starting"
+        else:
+            state = "stopped"
+        return {
+            "name": self.name,
+            "state": state,
+            "tools": [schema["name"] for schema in self.schemas or []],
+            "startup_ms": self.startup_ms,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+        }
+
+
+class MCPConnectionManager:
+    """
+    Keeps one warm MCP session per server and shares it process-wide.
+
+    Args:
+        health_interval (Optional[float]): Seconds between health checks (MCP_HEALTH_INTERVAL by default)
+        ping_timeout (Optional[float]): Seconds to wait for a ping reply (MCP_PING_TIMEOUT by default)
+        idle_timeout (Optional[float]): Seconds without use before a server is stopped (MCP_IDLE_TIMEOUT by default)
+        startup_timeout (Optional[float]): Default start-up wait per server (MCP_STARTUP_TIMEOUT by default)
+        schema_cache (Optional[ToolSchemaCache]): Tool schema cache (MCP_SCHEMA_CACHE by default)
+    """
+
+    def __init__(
+        self,
+        health_interval: Optional[float] = None,
+        ping_timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        startup_timeout: Optional[float] = None,
+        schema_cache: Optional[ToolSchemaCache] = None,
+    ):
+        self.health_interval = health_interval or float(os.getenv("MCP_HEALTH_INTERVAL", DEFAULT_HEALTH_INTERVAL))
+        self.ping_timeout = ping_timeout or float(os.getenv("MCP_PING_TIMEOUT", DEFAULT_PING_TIMEOUT))
+        self.idle_timeout = idle_timeout or float(os.getenv("MCP_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT))
+        self.startup_timeout = startup_timeout or float(os.getenv("MCP_STARTUP_TIMEOUT", DEFAULT_STARTUP_TIMEOUT))
+        self.schema_cache = schema_cache or ToolSchemaCache()
+        self._background: set = set()
+        self._servers: Dict[ServerKey, _Server] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._monitor: Optional[concurrent.futures.Future] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    # --- event loop thread ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MCP connection manager has been shut down")
+            if self._loop is None:
+                # サーバーのセッションはこのループ上のタスクが保持し続ける
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="mcp-manager", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+                self._monitor = asyncio.run_coroutine_threadsafe(self._health_loop(), loop)
+            return self._loop
+
+    def _submit(self, coro: Any) -> concurrent.futures.Future:
+        try:
+            loop = self._ensure_loop()
+        except RuntimeError:
+            coro.close()
+            raise
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    # --- server lifecycle (manager loop) ---
+
+    async def _serve(self, server: _Server, ready: asyncio.Future) -> None:
+        from langchain_mcp_adapters.client import MultiServerMCPClient
+        from langchain_mcp_adapters.tools import load_mcp_tools
+
+        start = time.perf_counter()
+        client = MultiServerMCPClient({server.name: server.connection})
+        try:
+            # セッションのコンテキストは開始したタスク内で閉じる必要があるため、停止要求までここで待つ
+            async with client.session(server.name) as session:
+                tools = await load_mcp_tools(session)
+                server.session = session
+                server.tools = {tool.name: tool for tool in tools}
+                schemas = [_tool_schema(tool) for tool in tools]
+                if schemas != server.schemas:
+                    server.schemas, server.bridges = schemas, {}
+                if server.source_hash:
+                    await asyncio.to_thread(self.schema_cache.put, server.server_id, server.source_hash, schemas)
+                server.startup_ms = (time.perf_counter() - start) * 1000
+                server.last_error = server.failed_at = server.known_failure = None
+                ready.set_result(None)
+                await server.stopping.wait()
+        except Exception as e:
+            server.last_error = _describe(e)
+            if not ready.done():
+                server.failed_at = time.monotonic()
+                if server.source_hash and server.schemas is None:
+                    await asyncio.to_thread(
+                        self.schema_cache.put_failure, server.server_id, server.source_hash, server.last_error
+                    )
+                ready.set_exception(RuntimeError(f"MCP server '{server.name}' failed to start: {server.last_error}"))
+        finally:
+            server.session = None
+
+    async def _stop(self, server: _Server) -> None:
+        task, server.task = server.task, None
+        if task is None:
+            return
+        server.stopping.set()
+        try:
+            await asyncio.wait_for(task, _STOP_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.CancelledError, Exception):
+            task.cancel()
+        server.session = None
+
+    async def _ensure_started(self, server: _Server, stale_generation: Optional[int] = None) -> None:
+        if server.lock is None:
+            server.lock = asyncio.Lock()
+        async with server.lock:
+            # 他の呼び出しが既に再起動していればそのまま使う
+            if server.alive() and server.generation != stale_generation:
+                return
+            if server.failed() and server.failed_at and time.monotonic() - server.failed_at < self.health_interval:
+                # 起動に失敗したばかりのサーバーは毎回起動し直さず、ヘルスチェックでの再試行を待つ
+                raise RuntimeError(f"MCP server '{server.name}' is unavailable: {server.last_error}")
+            if server.task is not None:
+                server.restarts += 1
+                await self._stop(server)
+            server.stopping = asyncio.Event()
+            ready = asyncio.get_running_loop().create_future()
+            server.task = asyncio.create_task(self._serve(server, ready))
+            server.generation += 1
+            await ready
+
+    async def _healthy(self, server: _Server) -> bool:
+        if not server.alive():
+            return False
+        try:
+            await asyncio.wait_for(server.session.send_ping(), self.ping_timeout)
+            return True
+        except Exception as e:
+            server.last_error = f"health check failed: {_describe(e)}"
+            return False
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            now = time.monotonic()
+            for server in list(self._servers.values()):
+                # 停止中・起動（再起動）中のサーバーは確認しない
+                if server.task is None or server.lock.locked():
+                    continue
+                if now - server.last_used > self.idle_timeout:
+                    # 長時間使われていないサーバーは停止し、次の呼び出しで起動し直す
+                    async with server.lock:
+                        await self._stop(server)
+                    continue
+                generation = server.generation
+                if not await self._healthy(server):
+                    try:
+                        await self._ensure_started(server, stale_generation=generation)
+                    except Exception as e:
+                        server.last_error = str(e)
+
+    # --- tools ---
+
+    def _register(self, config: Mapping[str, Mapping[str, Any]]) -> List[_Server]:
+        servers = []
+        with self._lock:
+            for name, connection in config.items():
+                connection = _normalize(connection)
+                startup_timeout = connection.pop("startup_timeout", None)
+                key = _server_key(name, connection)
+                server = self._servers.get(key)
+                if server is None:
+                    server = self._servers[key] = _Server(name, connection)
+                    if server.source_hash:
+                        server.schemas = self.schema_cache.get(server.server_id, server.source_hash)
+                        server.known_failure = self.schema_cache.failure(server.server_id, server.source_hash)
+                server.startup_timeout = float(startup_timeout or self.startup_timeout)
+                servers.append(server)
+        return servers
+
+    async def _guarded(self, server: _Server, coro: Any) -> Any:
+        # プロセスが落ちても応答待ちのリクエストが終わらないことがあるため、待機中は定期的にpingで生存確認する
+        call = asyncio.ensure_future(coro)
+        try:
+            while True:
+                done, _ = await asyncio.wait({call}, timeout=self.ping_timeout)
+                if done:
+                    return call.result()
+                if not await self._healthy(server):
+                    raise ConnectionError(f"MCP server '{server.name}' stopped responding")
+        finally:
+            call.cancel()
+
+    async def _call(self, key: ServerKey, name: str, arguments: Dict[str, Any]) -> Any:
+        from langchain_core.tools import ToolException
+
+        server = self._servers[key]
+        server.last_used = time.monotonic()
+        for attempt in range(2):
+            await self._ensure_started(server)
+            generation = server.generation
+            tool = server.tools.get(name)
+            if tool is None:
+                raise ToolException(f"Tool '{name}' is not provided by MCP server '{server.name}'")
+            try:
+                return await self._guarded(server, tool.coroutine(**arguments))
+            except ToolException:
+                raise
+            except Exception:
+                # サーバーが落ちていた場合のみ再起動して1回だけ再試行する
+                if attempt or await self._healthy(server):
+                    raise
+                await self._ensure_started(server, stale_generation=generation)
+
+    def _bridge(self, server: _Server, schema: Dict[str, Any]) -> Any:
+        from langchain_core.tools import StructuredTool
+
+        key, name = server.key, schema["name"]
+
+        def call(**arguments: Any) -> Any:
+            return self._submit(self._call(key, name, arguments)).result()
+
+        async def acall(**arguments: Any) -> Any:
+            # 呼び出し元のループ（Streamlitセッション毎）から管理スレッドのループへ橋渡しする
+            return await asyncio.wrap_future(self._submit(self._call(key, name, arguments)))
+
+        return StructuredTool(
+            name=name,
+            description=schema["description"],
+            args_schema=schema["args_schema"],
+            func=call,
+            coroutine=acall,
+            response_format=schema["response_format"],
+            metadata=schema["metadata"],
+        )
+
+    def _in_background(self, coro: Any) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        # 結果を待つ呼び出し元がいなくても例外は回収しておく
+        task.add_done_callback(lambda t: self._background.discard(t) or t.cancelled() or t.exception())
+        return task
+
+    async def _warm(self, server: _Server) -> None:
+        server.last_used = time.monotonic()
+        # タイムアウトしても起動自体は続ける（次の初期化・呼び出しで使える）
+        start = self._in_background(self._ensure_started(server))
+        if server.alive() or server.offered():
+            return
+        if server.known_failure:
+            # 前回このバージョンの起動に失敗したサーバーは待たない（起動は裏で試し続ける）
+            server.last_error = server.last_error or f"{server.known_failure} (last start; retrying in background)"
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(start), server.startup_timeout)
+        except asyncio.TimeoutError:
+            server.last_error = f"startup timed out after {server.startup_timeout:g}s (still starting)"
+        except Exception:
+            # 失敗の内容は server.last_error に記録済み
+            pass
+
+    async def _get_tools(self, servers: List[_Server]) -> List[Any]:
+        await asyncio.gather(*(self._warm(server) for server in servers))
+        tools = []
+        for server in servers:
+            if not server.offered():
+                continue
+            for schema in server.schemas:
+                if schema["name"] not in server.bridges:
+                    server.bridges[schema["name"]] = self._bridge(server, schema)
+                tools.append(server.bridges[schema["name"]])
+        return tools
+
+    def get_tools(self, config: Mapping[str, Mapping[str, Any]], timeout: Optional[float] = None) -> List[Any]:
+        """
+        Starts (or reuses) the configured servers concurrently and returns their tools.
+
+        Servers with cached schemas are not waited for. Servers that fail or
+        exceed their start-up timeout are left out (see ``unavailable``).
+
+        Args:
+            config (Mapping[str, Mapping[str, Any]]): MCP server config (same format as
+                MultiServerMCPClient, plus an optional ``"startup_timeout"`` per server)
+            timeout (Optional[float]): Overall seconds to wait
+
+        Returns:
+            List[BaseTool]: Tools that call the shared sessions
+        """
+        return self._submit(self._get_tools(self._register(config))).result(timeout)
+
+    async def aget_tools(self, config: Mapping[str, Mapping[str, Any]]) -> List[Any]:
+        """Async version of ``get_tools`` (usable from any event loop)."""
+        return await asyncio.wrap_future(self._submit(self._get_tools(self._register(config))))
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Returns the state, tools, start-up time and restarts of each known server."""
+        with self._lock:
+            return [server.status() for server in self._servers.values()]
+
+    def unavailable(self, config: Mapping[str, Mapping[str, Any]]) -> Dict[str, str]:
+        """
+        Returns the servers of ``config`` whose tools are currently not offered.
+
+        Returns:
+            Dict[str, str]: Reason (last error) by server name
+        """
+        return {
+            server.name: server.last_error or "not started"
+            for server in self._register(config)
+            if not server.offered()
+        }
+
+    # --- shutdown ---
+
+    async def _stop_all(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+        await asyncio.gather(*(self._stop(server) for server in list(self._servers.values())))
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Stops all servers and the manager thread (registered with ``atexit``)."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            loop, thread = self._loop, self._thread
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop_all(), loop).result(timeout)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+
+
+_manager: Optional[MCPConnectionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_mcp_manager() -> MCPConnectionManager:
+    """Returns the process-wide MCP connection manager."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = MCPConnectionManager()
+                atexit.register(_manager.shutdown)
+    return _manager
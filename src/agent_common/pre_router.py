@@ -0,0 +1,432 @@
+"""
+Deterministic pre-router in front of the supervisor LLM.
+
+Every supervisor request used to start with an LLM routing turn, even for
+requests that are obviously about music or restaurants. The pre-router runs
+cheap local stages first and only falls back to the supervisor when none of
+them is confident:
+
+1. ``KeywordRules``: regular expressions per intent. Exactly one matching
+   intent routes directly; several matching intents (e.g. "find a restaurant
+   and add it to my calendar") go to the supervisor.
+2. ``WeakKeywordRules``: ambiguous keywords ("予定", "バンド", "アポ", ...)
+   that also appear in unrelated requests. A match only routes when the
+   classifier's top class is the same intent; it still makes stage 1 treat
+   the request as possibly compound.
+3. ``TfidfLogisticClassifier``: character n-gram TF-IDF features and a
+   multinomial logistic regression trained on labelled example requests.
+   The top class routes directly when its probability reaches the
+   threshold; the ``supervisor`` class stands for greetings and multi-step
+   requests.
+
+Stages are pluggable: anything with ``route(text) -> Optional[RouteDecision]``
+can be added to ``PreRouter``. Returning ``None`` passes the request to the
+next stage.
+
+スーパーバイザーLLMの前段でキーワード規則とローカル分類器により明らかな意図を
+直接ワーカーエージェントへ振り分け、自信がない場合のみLLMルーティングに任せる。
+
+Environment variables:
+    PRE_ROUTER_ENABLED: "0" disables the pre-router (default "1")
+    PRE_ROUTER_THRESHOLD: Minimum classifier probability (default 0.6)
+"""
+
+import math
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# 直接振り分け可能な意図（スーパーバイザーのルーティング表と同じ区分）
+INTENTS: Tuple[str, ...] = ("music", "video", "travel", "restaurant", "scheduler", "math", "research")
+# スーパーバイザーLLMに任せる
+SUPERVISOR = "supervisor"
+
+DEFAULT_THRESHOLD = 0.6
+# 弱いキーワードと分類器が一致したとみなす最低確率
+WEAK_RULE_THRESHOLD = 0.4
+
+# 単独で振り分けてよい（他の依頼に紛れ込まない）キーワード
+RULES: Tuple[Tuple[str, str], ...] = (
+    ("music", r"spotify|スポティファイ|楽曲|プレイリスト|アーティスト|ミュージシャン|の曲(?![がげ])|の歌(?!舞伎)|新曲|ヒット曲"),
+    ("video", r"youtube|ユーチューブ|動画|ビデオ|映像|再生回数"),
+    ("travel", r"ホテル|旅館|宿泊|宿を|の宿|泊まれる|泊まりたい|airbnb|エアビー|じゃらん|民宿|ゲストハウス|\d+泊"),
+    ("restaurant", r"レストラン|ホットペッパー|hotpepper|居酒屋|ランチ|ディナー|飲食店|グルメ|食べ放題|予約できる店|ご飯屋|お店を|の店|カフェ|食べたい"),
+    ("scheduler", r"予定に(入れ|追加|登録)|予定を(入れ|追加|登録|削除)|カレンダー|スケジュールに|リマインド|会議を入れ|アポイントを|アポを(入れ|取)"),
+    ("math", r"\d+\s*[+\-*/×÷＋－]\s*\d+|計算|足して|掛けて|割って|足し算|掛け算|かけ算|割り算|平方根|何倍"),
+    ("research", r"ニュース|最新情報|とは何|天気|株価"),
+)
+
+# 無関係な依頼にも現れる語（「旅行の予定を立てて」「ヘアバンド」「アポロ」「寿司屋を調べて」など）。
+# 分類器の判定が同じ意図のときだけ振り分けに使う
+WEAK_RULES: Tuple[Tuple[str, str], ...] = (
+    ("music", r"バンド|アルバム|音楽|ジャズ|bgm"),
+    ("restaurant", r"お店"),
+    ("scheduler", r"予定|スケジュール|アポ"),
+    ("research", r"調べて|について教えて"),
+)
+
+# 分類器の学習用ラベル付き例文
+TRAINING_EXAMPLES: Tuple[Tuple[str, str], ...] = (
+    ("ミセスグリーンアップルの曲を教えて", "music"),
+    ("YOASOBIの人気曲を探して", "music"),
+    ("ビートルズの曲を探して", "music"),
+    ("米津玄師の新しい歌は？", "music"),
+    ("作業用に聴ける落ち着いた音楽", "music"),
+    ("テイラー・スウィフトのアーティスト情報", "music"),
+    ("人気のプレイリストを教えて", "music"),
+    ("ドライブで聴きたい洋楽", "music"),
+    ("最近流行っている邦楽ロック", "music"),
+    ("宇多田ヒカルのおすすめソング", "music"),
+    ("ジャズのいい曲ある？", "music"),
+    ("Play some music by Queen", "music"),
+    ("料理の動画を探して", "video"),
+    ("猫のおもしろ動画が見たい", "video"),
+    ("筋トレのやり方を解説してるYouTube", "video"),
+    ("Pythonのチュートリアル動画", "video"),
+    ("この動画の詳細を教えて", "video"),
+    ("ゲーム実況を見たい", "video"),
+    ("ヨガのレッスン映像を探して", "video"),
+    ("MVを見たい", "video"),
+    ("おすすめのVlogチャンネル", "video"),
+    ("find videos about cooking pasta", "video"),
+    ("東京のホテルを明日から2泊で探して", "travel"),
+    ("大阪のAirbnbを来週から3泊で探して", "travel"),
+    ("京都で泊まれる旅館", "travel"),
+    ("箱根の温泉宿を探して", "travel"),
+    ("札幌の安い宿泊先", "travel"),
+    ("沖縄のリゾートに泊まりたい", "travel"),
+    ("週末に家族で泊まれるところ", "travel"),
+    ("福岡の格安ホテル", "travel"),
+    ("金沢への旅行で宿を探している", "travel"),
+    ("find a hotel in Tokyo for two nights", "travel"),
+    ("渋谷のイタリアンを探して", "restaurant"),
+    ("新宿の3000円以下のレストランを探して", "restaurant"),
+    ("大崎で焼肉が食べたい", "restaurant"),
+    ("池袋のおいしいラーメン屋", "restaurant"),
+    ("銀座でお寿司を食べたい", "restaurant"),
+    ("恵比寿の居酒屋を教えて", "restaurant"),
+    ("梅田で個室のある和食のお店", "restaurant"),
+    ("品川駅周辺のカフェ", "restaurant"),
+    ("六本木でディナーにおすすめの店", "restaurant"),
+    ("横浜の中華街で食事したい", "restaurant"),
+    ("ご飯を食べる場所を探して", "restaurant"),
+    ("find a sushi restaurant near Shibuya", "restaurant"),
+    ("明日の15時に会議を予定に入れて", "scheduler"),
+    ("今日の14:30に歯医者の予約を入れて", "scheduler"),
+    ("来週月曜日の10時に面接を予定に入れて", "scheduler"),
+    ("金曜の夜に飲み会をカレンダーに登録", "scheduler"),
+    ("明後日の9時に打ち合わせを追加", "scheduler"),
+    ("毎週水曜のミーティングを入れておいて", "scheduler"),
+    ("3日後の18時にジムの予定", "scheduler"),
+    ("schedule a meeting tomorrow at 3pm", "scheduler"),
+    ("12と34を足して", "math"),
+    ("3かける7はいくつ", "math"),
+    ("1234に56を掛けると？", "math"),
+    ("3.5と2.25の和を求めて", "math"),
+    ("100を8で割ると", "math"),
+    ("15の2乗は", "math"),
+    ("合計金額を出して 1200円と3400円", "math"),
+    ("what is 17 times 23", "math"),
+    ("今日のニュースを教えて", "research"),
+    ("生成AIの最新動向を調べて", "research"),
+    ("量子コンピュータとは何か説明して", "research"),
+    ("日本の人口はどれくらい", "research"),
+    ("円安の原因は？", "research"),
+    ("東京の明日の天気", "research"),
+    ("LangGraphについて教えて", "research"),
+    ("最近の半導体業界の動き", "research"),
+    ("who won the world cup", "research"),
+    ("こんにちは", SUPERVISOR),
+    ("ありがとう", SUPERVISOR),
+    ("何ができるの？", SUPERVISOR),
+    ("手伝ってほしい", SUPERVISOR),
+    ("渋谷でランチして午後に会議を入れたい", SUPERVISOR),
+    ("京都旅行の宿とおすすめのお店を教えて", SUPERVISOR),
+    ("週末の予定を立てて、音楽もかけて", SUPERVISOR),
+    ("よろしくお願いします", SUPERVISOR),
+    ("hello", SUPERVISOR),
+    ("いろいろ相談したい", SUPERVISOR),
+)
+
+
+class RouteDecision(NamedTuple):
+    """Result of pre-routing one request (``intent`` is None for the supervisor)."""
+
+    intent: Optional[str]
+    confidence: float
+    stage: str
+    latency_ms: float = 0.0
+
+    @property
+    def bypass(self) -> bool:
+        return self.intent is not None
+
+    @property
+    def compound(self) -> bool:
+        # キーワード規則が複数の意図を検出した依頼（プランナーで分割する候補）
+        return self.intent is None and self.stage == KeywordRules.name
+
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalises, case-folds and removes whitespace."""
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", text or "")).casefold()
+
+
+class KeywordRules:
+    """
+    Regex rules per intent.
+
+    Args:
+        rules (Iterable[Tuple[str, str]]): (intent, pattern) pairs
+        weak_rules (Iterable[Tuple[str, str]]): (intent, pattern) pairs that never
+            route by themselves but mark a request as possibly multi-intent
+    """
+
+    name = "rules"
+
+    def __init__(self, rules: Iterable[Tuple[str, str]] = RULES, weak_rules: Iterable[Tuple[str, str]] = ()):
+        self.rules = [(intent, re.compile(pattern, re.IGNORECASE)) for intent, pattern in rules]
+        self.weak_rules = [(intent, re.compile(pattern, re.IGNORECASE)) for intent, pattern in weak_rules]
+
+    def matches(self, text: str) -> List[str]:
+        normalized = normalize_text(text)
+        return [intent for intent, pattern in self.rules if pattern.search(normalized)]
+
+    def route(self, text: str) -> Optional[RouteDecision]:
+        intents = set(self.matches(text))
+        if len(intents) == 1 and self.weak_rules:
+            # 「アルバムを調べて」「予定にも入れて」のように弱いキーワードが別の意図を示す場合
+            normalized = normalize_text(text)
+            intents.update(intent for intent, pattern in self.weak_rules if pattern.search(normalized))
+        if len(intents) == 1:
+            return RouteDecision(intents.pop(), 1.0, self.name)
+        if len(intents) > 1:
+            # 複数の意図を含む依頼はスーパーバイザーに分解させる
+            return RouteDecision(None, 0.0, self.name)
+        return None
+
+
+class WeakKeywordRules:
+    """
+    Keyword rules that only route when the classifier agrees.
+
+    Args:
+        rules (Iterable[Tuple[str, str]]): (intent, pattern) pairs
+        classifier (TfidfLogisticClassifier): Trained classifier
+        threshold (float): Minimum probability of the classifier's top class
+    """
+
+    name = "weak_rules"
+
+    def __init__(
+        self,
+        rules: Iterable[Tuple[str, str]],
+        classifier: "TfidfLogisticClassifier",
+        threshold: float = WEAK_RULE_THRESHOLD,
+    ):
+        self.rules = KeywordRules(rules)
+        self.classifier = classifier
+        self.threshold = threshold
+
+    def route(self, text: str) -> Optional[RouteDecision]:
+        intents = set(self.rules.matches(text))
+        if not intents:
+            return None
+        probs = self.classifier.predict_proba(text)
+        intent, confidence = max(probs.items(), key=lambda item: item[1])
+        if intent in intents and confidence >= self.threshold:
+            return RouteDecision(intent, confidence, self.name)
+        # 分類器が同意しない場合は次の段（分類器単独の判定）に任せる
+        return None
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (1, 3)) -> Counter:
+    """Counts character n-grams of the normalised text."""
+    normalized = normalize_text(text)
+    grams: Counter = Counter()
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for i in range(len(normalized) - n + 1):
+            grams[normalized[i:i + n]] += 1
+    return grams
+
+
+class TfidfLogisticClassifier:
+    """
+    Character n-gram TF-IDF + multinomial logistic regression (pure Python).
+
+    Vectors are sparse dicts, so training only touches the features present
+    in each example.
+
+    Args:
+        ngram_range (Tuple[int, int]): Character n-gram sizes
+        epochs (int): SGD passes over the training set
+        learning_rate (float): Initial SGD step size
+        l2 (float): L2 regularisation strength
+        seed (int): Shuffling seed (training is deterministic)
+    """
+
+    def __init__(
+        self,
+        ngram_range: Tuple[int, int] = (1, 3),
+        epochs: int = 40,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+        seed: int = 0,
+    ):
+        self.ngram_range = ngram_range
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.seed = seed
+        self.labels: List[str] = []
+        self.idf: Dict[str, float] = {}
+        self.weights: Dict[str, Dict[str, float]] = {}
+        self.bias: Dict[str, float] = {}
+
+    def vectorize(self, text: str) -> Dict[str, float]:
+        """Returns the L2-normalised TF-IDF vector (unknown n-grams are dropped)."""
+        vector = {}
+        for gram, count in char_ngrams(text, self.ngram_range).items():
+            idf = self.idf.get(gram)
+            if idf is not None:
+                vector[gram] = (1.0 + math.log(count)) * idf
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {gram: v / norm for gram, v in vector.items()} if norm else vector
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str]) -> "TfidfLogisticClassifier":
+        self.labels = sorted(set(labels))
+        documents = [char_ngrams(text, self.ngram_range) for text in texts]
+        df: Counter = Counter()
+        for grams in documents:
+            df.update(grams.keys())
+        n = len(documents)
+        self.idf = {gram: math.log((1 + n) / (1 + count)) + 1.0 for gram, count in df.items()}
+        self.weights = {label: {} for label in self.labels}
+        self.bias = {label: 0.0 for label in self.labels}
+
+        samples = [(self.vectorize(text), label) for text, label in zip(texts, labels)]
+        rng = random.Random(self.seed)
+        for epoch in range(self.epochs):
+            rng.shuffle(samples)
+            lr = self.learning_rate / (1.0 + 0.1 * epoch)
+            for vector, target in samples:
+                probs = self._probabilities(vector)
+                for label in self.labels:
+                    error = probs[label] - (1.0 if label == target else 0.0)
+                    weights = self.weights[label]
+                    for gram, value in vector.items():
+                        w = weights.get(gram, 0.0)
+                        weights[gram] = w - lr * (error * value + self.l2 * w)
+                    self.bias[label] -= lr * error
+        return self
+
+    def _probabilities(self, vector: Dict[str, float]) -> Dict[str, float]:
+        scores = {}
+        for label in self.labels:
+            weights = self.weights[label]
+            scores[label] = self.bias[label] + sum(weights.get(gram, 0.0) * value for gram, value in vector.items())
+        top = max(scores.values())
+        exps = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        return self._probabilities(self.vectorize(text))
+
+
+class ClassifierStage:
+    """
+    Routes with a trained classifier when the top probability reaches the threshold.
+
+    Args:
+        classifier (TfidfLogisticClassifier): Trained classifier
+        threshold (float): Minimum probability for a direct route
+    """
+
+    name = "classifier"
+
+    def __init__(self, classifier: TfidfLogisticClassifier, threshold: float = DEFAULT_THRESHOLD):
+        self.classifier = classifier
+        self.threshold = threshold
+
+    def route(self, text: str) -> Optional[RouteDecision]:
+        probs = self.classifier.predict_proba(text)
+        intent, confidence = max(probs.items(), key=lambda item: item[1])
+        if intent == SUPERVISOR or confidence < self.threshold:
+            return RouteDecision(None, confidence, self.name)
+        return RouteDecision(intent, confidence, self.name)
+
+
+class PreRouter:
+    """
+    Runs the stages in order; the first decision wins, otherwise the supervisor.
+
+    Args:
+        stages (Sequence): Objects with ``route(text) -> Optional[RouteDecision]``
+    """
+
+    def __init__(self, stages: Sequence):
+        self.stages = list(stages)
+
+    def route(self, text: str) -> RouteDecision:
+        start = time.perf_counter()
+        decision = None
+        for stage in self.stages:
+            decision = stage.route(text)
+            if decision is not None:
+                break
+        if decision is None:
+            decision = RouteDecision(None, 0.0, "fallback")
+        return decision._replace(latency_ms=(time.perf_counter() - start) * 1000)
+
+
+def build_pre_router(
+    examples: Iterable[Tuple[str, str]] = TRAINING_EXAMPLES,
+    rules: Iterable[Tuple[str, str]] = RULES,
+    threshold: float = DEFAULT_THRESHOLD,
+    weak_rules: Iterable[Tuple[str, str]] = WEAK_RULES,
+) -> PreRouter:
+    """
+    Builds the default rules + weak rules + classifier pre-router.
+
+    Args:
+        examples (Iterable[Tuple[str, str]]): Labelled (text, intent) training pairs
+        rules (Iterable[Tuple[str, str]]): (intent, regex) rules
+        threshold (float): Classifier probability needed to bypass the supervisor
+        weak_rules (Iterable[Tuple[str, str]]): (intent, regex) rules that need the classifier to agree
+    Returns:
+        PreRouter: Ready-to-use router
+    """
+    texts, labels = zip(*examples)
+    classifier = TfidfLogisticClassifier().fit(texts, labels)
+    return PreRouter([
+        KeywordRules(rules, weak_rules),
+        WeakKeywordRules(weak_rules, classifier),
+        ClassifierStage(classifier, threshold),
+    ])
+
+
+_router: Optional[PreRouter] = None
+_router_lock = threading.Lock()
+
+
+def pre_router_enabled() -> bool:
+    return os.getenv("PRE_ROUTER_ENABLED", "1") != "0"
+
+
+def get_pre_router() -> PreRouter:
+    """Returns the process-wide pre-router (trained on first use)."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = build_pre_router(
+                    threshold=float(os.getenv("PRE_ROUTER_THRESHOLD", str(DEFAULT_THRESHOLD)))
+                )
+    return _router
@@ -0,0 +1,409 @@
+"""
+Result cache for external search tools.
+
+Tool results are cached under a key built from the tool name and its
+normalised arguments (bound to the signature with defaults applied,
+strings NFKC-normalised, trimmed, whitespace-collapsed and case-folded), so
+"Mrs. GREEN APPLE" and " mrs. green apple" share one entry. Each tool has
+its own TTL. Entries live in an in-memory LRU, optionally written through
+to SQLite so they survive restarts. Identical calls that arrive while the
+first one is still running wait for it instead of calling the upstream API
+again (single-flight), and hit / miss counters are kept per tool.
+
+外部APIツールの結果キャッシュ（正規化した引数のキー、ツール毎のTTL、
+メモリLRU＋任意のSQLite、同一リクエストの合流、ヒット率の計測）。
+
+Environment variables:
+    RESULT_CACHE_MAX_ENTRIES: Size of the in-memory LRU (default 1024)
+    RESULT_CACHE_SQLITE_PATH: Enables the SQLite backend at this path
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+DEFAULT_TTL = 300.0
+_WHITESPACE = re.compile(r"\s+")
+
+# キャッシュ上の値（失効時刻, 値）
+Entry = Tuple[float, Any]
+
+
+def _default_should_cache(result: Any) -> bool:
+    # エラーを返した呼び出しはキャッシュしない
+    return not (isinstance(result, dict) and "error" in result)
+
+
+def normalize_value(value: Any) -> Any:
+    """Normalises an argument value so equivalent queries share a cache key."""
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", value)).strip().casefold()
+    if isinstance(value, dict):
+        return {str(k): normalize_value(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(v) for v in value]
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+class MemoryBackend:
+    """Thread-safe in-memory LRU."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Persistent backend storing JSON-serialisable results in SQLite."""
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            " key TEXT PRIMARY KEY,"
+            " expires_at REAL NOT NULL,"
+            " value TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, key: str, entry: Entry) -> None:
+        try:
+            value = json.dumps(entry[1], ensure_ascii=False)
+        except (TypeError, ValueError):
+            # JSONにできない結果はメモリにのみ保持
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, entry[0], value),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM result_cache")
+
+    def purge_expired(self) -> int:
+        """Deletes expired rows and returns how many were removed."""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM result_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+class ResultCache:
+    """
+    Tool result cache with per-tool TTL and single-flight coalescing.
+
+    Args:
+        max_entries (int): Size of the in-memory LRU
+        persistent (Optional[SQLiteBackend]): Optional write-through second level
+        ttls (Optional[Dict[str, float]]): Default TTL per tool name
+        clock (Callable[[], float]): Time source (wall clock, shared with SQLite entries)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        persistent: Optional[SQLiteBackend] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.memory = MemoryBackend(max_entries)
+        self.persistent = persistent
+        self.ttls: Dict[str, float] = dict(ttls or {})
+        self.clock = clock
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+
+    # --- Keys & stats ---
+
+    @staticmethod
+    def make_key(tool_name: str, func: Callable[..., Any], args: tuple, kwargs: dict) -> str:
+        """
+        Builds the cache key for a call from its normalised, bound arguments.
+        """
+        try:
+            bound = inspect.signature(func).bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+        except (TypeError, ValueError):
+            arguments = {"args": list(args), "kwargs": kwargs}
+        payload = json.dumps([tool_name, normalize_value(arguments)], ensure_ascii=False, sort_keys=True)
+        return f"{tool_name}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def _count(self, tool_name: str, field: str) -> None:
+        with self._stats_lock:
+            counters = self._stats.setdefault(tool_name, {"hits": 0, "misses": 0, "coalesced": 0, "uncached": 0})
+            counters[field] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns hit / miss counters per tool and overall.
+
+        Returns:
+            Dict[str, Any]: {"tools": {name: counters + hit_rate}, "total": {...}, "entries": int}
+        """
+        with self._stats_lock:
+            tools = {name: dict(counters) for name, counters in self._stats.items()}
+        total = {"hits": 0, "misses": 0, "coalesced": 0, "uncached": 0}
+        for counters in tools.values():
+            for field in total:
+                total[field] += counters[field]
+            lookups = counters["hits"] + counters["misses"] + counters["coalesced"]
+            counters["hit_rate"] = round((counters["hits"] + counters["coalesced"]) / lookups, 3) if lookups else 0.0
+        lookups = total["hits"] + total["misses"] + total["coalesced"]
+        total["hit_rate"] = round((total["hits"] + total["coalesced"]) / lookups, 3) if lookups else 0.0
+        return {"tools": tools, "total": total, "entries": len(self.memory)}
+
+    # --- Storage ---
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Returns (found, value) for a key, dropping it if expired."""
+        now = self.clock()
+        entry = self.memory.get(key)
+        if entry is None and self.persistent is not None:
+            entry = self.persistent.get(key)
+            if entry is not None and entry[0] > now:
+                self.memory.set(key, entry)
+        if entry is None:
+            return False, None
+        if entry[0] <= now:
+            self.invalidate(key)
+            return False, None
+        return True, entry[1]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        entry = (self.clock() + ttl, value)
+        self.memory.set(key, entry)
+        if self.persistent is not None:
+            self.persistent.set(key, entry)
+
+    def invalidate(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.persistent is not None:
+            self.persistent.delete(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    # --- Calls ---
+
+    def get_or_call(
+        self,
+        tool_name: str,
+        key: str,
+        call: Callable[[], Any],
+        ttl: Optional[float] = None,
+        should_cache: Callable[[Any], bool] = _default_should_cache,
+    ) -> Any:
+        """
+        Returns the cached result for ``key`` or computes it once.
+
+        Concurrent callers with the same key wait for the running call and
+        share its result instead of calling upstream again.
+        """
+        found, value = self.get(key)
+        if found:
+            self._count(tool_name, "hits")
+            return value
+
+        future, leader = self._join(key)
+        if not leader:
+            self._count(tool_name, "coalesced")
+            return future.result()
+
+        self._count(tool_name, "misses")
+        try:
+            value = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            return self._store(tool_name, key, future, value, ttl, should_cache)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_call(
+        self,
+        tool_name: str,
+        key: str,
+        call: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        should_cache: Callable[[Any], bool] = _default_should_cache,
+    ) -> Any:
+        """
+        Async counterpart of ``get_or_call``.
+
+        Sync and async callers share the entries and the in-flight calls, so
+        an async call waits for an identical sync call that is still running
+        (and vice versa) without blocking the event loop.
+        """
+        found, value = self.get(key)
+        if found:
+            self._count(tool_name, "hits")
+            return value
+
+        future, leader = self._join(key)
+        if not leader:
+            self._count(tool_name, "coalesced")
+            return await asyncio.wrap_future(future)
+
+        self._count(tool_name, "misses")
+        try:
+            value = await call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            return self._store(tool_name, key, future, value, ttl, should_cache)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        # 実行中の同一呼び出しがあればそのFutureを返す（なければ自分が実行する）
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _store(
+        self,
+        tool_name: str,
+        key: str,
+        future: Future,
+        value: Any,
+        ttl: Optional[float],
+        should_cache: Callable[[Any], bool],
+    ) -> Any:
+        if should_cache(value):
+            self.set(key, value, ttl if ttl is not None else self.ttls.get(tool_name, DEFAULT_TTL))
+        else:
+            self._count(tool_name, "uncached")
+        future.set_result(value)
+        return value
+
+    def cached(
+        self,
+        tool_name: Optional[str] = None,
+        ttl: Optional[float] = None,
+        should_cache: Callable[[Any], bool] = _default_should_cache,
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """
+        Decorator caching a tool function's results.
+
+        ``functools.wraps`` keeps the name, docstring and signature, so the
+        decorated function can still be registered as an agent tool.
+        Coroutine functions get an async wrapper, and an ``acall`` attribute
+        (see ``async_http.dual_io``) is cached under the same tool name.
+
+        Args:
+            tool_name (Optional[str]): Name used for keys and stats (function name by default)
+            ttl (Optional[float]): TTL in seconds for this tool
+            should_cache (Callable[[Any], bool]): Predicate deciding whether a result is stored
+        """
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            name = tool_name or func.__name__
+            if ttl is not None:
+                self.ttls[name] = ttl
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    key = self.make_key(name, func, args, kwargs)
+                    return await self.aget_or_call(name, key, lambda: func(*args, **kwargs), should_cache=should_cache)
+
+                async_wrapper.cache = self
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                key = self.make_key(name, func, args, kwargs)
+                return self.get_or_call(name, key, lambda: func(*args, **kwargs), should_cache=should_cache)
+
+            wrapper.cache = self
+            if hasattr(func, "acall"):
+                wrapper.acall = decorator(func.acall)
+            return wrapper
+
+        return decorator
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Returns the process-wide result cache configured from the environment."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                sqlite_path = os.getenv("RESULT_CACHE_SQLITE_PATH")
+                _cache = ResultCache(
+                    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024")),
+                    persistent=SQLiteBackend(sqlite_path) if sqlite_path else None,
+                )
+    return _cache
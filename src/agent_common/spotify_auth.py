@@ -0,0 +1,174 @@
+"""
+Shared Spotify client-credentials token manager.
+
+The Spotify tools used to POST to ``accounts.spotify.com/api/token`` before
+every search. The manager caches the access token until shortly before its
+``expires_in``, refreshes it under a lock so concurrent calls do not all
+request a new one, and sends API calls through the pooled HTTP session.
+
+Spotifyのアクセストークンを有効期限の少し前までキャッシュし、
+ロック付きで更新する共通トークンマネージャー。
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+
+from agent_common import http_pool
+
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+API_BASE_URL = "https://api.spotify.com/v1"
+
+# 有効期限のこの秒数前に更新する
+DEFAULT_REFRESH_MARGIN = 60.0
+
+
+class SpotifyAuthError(Exception):
+    """Raised when a client-credentials token cannot be obtained."""
+
+
+def credentials_from_env() -> Tuple[Optional[str], Optional[str]]:
+    """
+    Reads the Spotify client id / secret from the environment.
+
+    SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET are preferred; the older
+    SPOTIFY_USER_ID / SPOTIFY_TOKEN names are still accepted.
+    """
+    client_id = os.getenv("SPOTIFY_CLIENT_ID") or os.getenv("SPOTIFY_USER_ID")
+    client_secret = os.getenv("SPOTIFY_CLIENT_SECRET") or os.getenv("SPOTIFY_TOKEN")
+    return client_id, client_secret
+
+
+class SpotifyTokenManager:
+    """
+    Caches a client-credentials access token and refreshes it proactively.
+
+    Args:
+        client_id (str): Spotify client id
+        client_secret (str): Spotify client secret
+        refresh_margin (float): Seconds before expiry at which the token is refreshed
+        session (Optional[requests.Session]): Session to use (the shared pool by default)
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+        session: Optional[requests.Session] = None,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self._session = session
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"token_requests": 0, "api_requests": 0}
+
+    @property
+    def session(self) -> requests.Session:
+        return self._session or http_pool.get_session()
+
+    def _valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expires_at - self.refresh_margin
+
+    def _request_token(self) -> None:
+        response = self.session.post(
+            TOKEN_URL,
+            data={"grant_type": "client_credentials"},
+            auth=(self.client_id, self.client_secret),
+            timeout=http_pool.timeout_for(TOKEN_URL),
+        )
+        self.stats["token_requests"] += 1
+        if response.status_code != 200:
+            raise SpotifyAuthError(f"Failed to authenticate with Spotify API (status {response.status_code})")
+        payload = response.json()
+        self._token = payload["access_token"]
+        self._expires_at = time.monotonic() + float(payload.get("expires_in", 3600))
+
+    def cached_token(self) -> Optional[str]:
+        """Returns the cached token if it is still valid, without any network I/O."""
+        return self._token if self._valid() else None
+
+    def get_token(self) -> str:
+        """
+        Returns a valid access token, requesting a new one only when needed.
+
+        Returns:
+            str: Bearer token
+
+        Raises:
+            SpotifyAuthError: If the token endpoint rejects the credentials
+        """
+        if self._valid():
+            return self._token
+        with self._lock:
+            # ロック待ちの間に他のスレッドが更新済みなら再取得しない
+            if not self._valid():
+                self._request_token()
+            return self._token
+
+    def invalidate(self) -> None:
+        """Forgets the cached token (e.g. after a 401)."""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+        """
+        Calls a Spotify Web API endpoint with the cached token.
+
+        A 401 response invalidates the token and the call is retried once.
+
+        Args:
+            path (str): Endpoint path below /v1 (e.g. "/search") or a full URL
+            params (Optional[Dict[str, Any]]): Query parameters
+
+        Returns:
+            requests.Response: API response
+        """
+        url = path if path.startswith("http") else f"{API_BASE_URL}{path}"
+        for attempt in range(2):
+            response = self.session.get(
+                url,
+                params=params,
+                headers={"Authorization": f"Bearer {self.get_token()}"},
+                timeout=http_pool.timeout_for(url),
+            )
+            self.stats["api_requests"] += 1
+            if response.status_code != 401 or attempt == 1:
+                return response
+            self.invalidate()
+        return response
+
+
+_managers: Dict[Tuple[str, str], SpotifyTokenManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(client_id: Optional[str] = None, client_secret: Optional[str] = None) -> SpotifyTokenManager:
+    """
+    Returns the process-wide token manager for a set of credentials.
+
+    Args:
+        client_id (Optional[str]): Client id (read from the environment if omitted)
+        client_secret (Optional[str]): Client secret (read from the environment if omitted)
+
+    Raises:
+        SpotifyAuthError: If no credentials are configured
+    """
+    if not client_id or not client_secret:
+        client_id, client_secret = credentials_from_env()
+    if not client_id or not client_secret:
+        raise SpotifyAuthError(
+            "Spotify API credentials not configured. Please set SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET in your .env file."
+        )
+    key = (client_id, client_secret)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = SpotifyTokenManager(client_id, client_secret)
+        return _managers[key]
@@ -0,0 +1,112 @@
+"""
+Coalesced re-rendering of streamed text for Streamlit placeholders.
+
+Streamlit replaces the whole element on every ``markdown()`` call, so a
+stream loop that renders per token re-renders the answer once per token
+and the total cost grows quadratically with the answer length. These
+renderers collect chunks and render at most once per frame.
+
+ストリーミング中のテキストを一定間隔・一定文字数ごとにまとめて再描画する。
+"""
+
+import math
+import time
+from typing import Any, Callable, List, Optional
+
+
+class BufferedMarkdownRenderer:
+    """
+    Coalesces streamed text into frames before re-rendering a placeholder.
+
+    Streamlit replaces the whole element on every ``markdown()`` call, so
+    rendering per token costs a join and a full re-render of the answer for
+    each token. Chunks are collected and rendered at most once per
+    ``interval`` seconds, or earlier once ``max_chars`` are pending; the
+    joined text is kept as a rolling buffer so only the new frame is joined.
+
+    Args:
+        render (Callable[[str], Any]): Renders the full text, e.g. ``placeholder.markdown``
+        interval (float): Maximum time between frames in seconds. Default is 0.05
+        max_chars (int): Pending characters that force a frame. Default is 200
+        clock (Callable[[], float]): Time source. Default is ``time.monotonic``
+    """
+
+    def __init__(
+        self,
+        render: Callable[[str], Any],
+        interval: float = 0.05,
+        max_chars: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._render = render
+        self.interval = interval
+        self.max_chars = max_chars
+        self._clock = clock
+        self._text = ""
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._last_frame = -math.inf
+        self._rendered_chars = 0
+        self.frames = 0
+
+    @property
+    def text(self) -> str:
+        """Full text received so far, including chunks not yet rendered."""
+        self._join_pending()
+        return self._text
+
+    def _join_pending(self) -> None:
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+
+    def append(self, chunk: str) -> None:
+        """Adds a chunk and renders a frame if the time or size budget is spent."""
+        if not chunk:
+            return
+        self._pending.append(chunk)
+        self._pending_chars += len(chunk)
+        now = self._clock()
+        if self._pending_chars >= self.max_chars or now - self._last_frame >= self.interval:
+            self.flush(now)
+
+    def flush(self, now: Optional[float] = None) -> None:
+        """Renders pending chunks immediately (call once the stream ends)."""
+        self._join_pending()
+        if len(self._text) == self._rendered_chars:
+            return
+        self._render(self._text)
+        self._rendered_chars = len(self._text)
+        self._last_frame = self._clock() if now is None else now
+        self.frames += 1
+
+
+class BufferedExpanderRenderer(BufferedMarkdownRenderer):
+    """
+    ``BufferedMarkdownRenderer`` for a log shown inside an expander.
+
+    The expander and its markdown element are created once and only the
+    inner element is updated; they are re-created only when the label changes.
+
+    Args:
+        placeholder: Streamlit container (e.g. ``st.empty()``) that holds the expander
+        label (str): Expander label
+        **kwargs: Passed to ``BufferedMarkdownRenderer``
+    """
+
+    def __init__(self, placeholder: Any, label: str, **kwargs: Any):
+        super().__init__(self._render_body, **kwargs)
+        self._placeholder = placeholder
+        self.label = label
+        self._body = None
+
+    def set_label(self, label: str) -> None:
+        if label != self.label:
+            self.label = label
+            self._body = None
+
+    def _render_body(self, text: str) -> None:
+        if self._body is None:
+            self._body = self._placeholder.expander(self.label, expanded=True).empty()
+        self._body.markdown(text)
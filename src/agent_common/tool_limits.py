@@ -0,0 +1,164 @@
+"""
+Per-tool timeouts and a shared concurrency cap for agent tools.
+
+LangGraph's stock ``ToolNode`` already runs the tool calls of one AI message
+concurrently (an executor map in ``invoke``, ``asyncio.gather`` in
+``ainvoke``, one ``Send`` per call in ``create_react_agent`` v2). What it
+does not provide is a bound on a slow API and on the number of calls in
+flight across agents. ``ToolLimits.wrap`` adds both around each tool and
+leaves everything else to the stock node (argument injection, ``Command``
+results, ``handle_tool_errors``, callbacks and streaming events):
+
+- the timeout is per tool name and counted from when the call actually
+  starts, so waiting for a slot does not eat into it;
+- a timed-out call returns ``{"error": ...}`` (the convention of the tools
+  themselves). An async call is cancelled and gives its slot back. A sync
+  call cannot be interrupted, so it finishes in its own thread in the
+  background and keeps its slot until it really ends: threads left behind
+  by timeouts count against the cap and cannot pile up;
+- the cap is shared by every tool wrapped with the same ``ToolLimits``
+  (a thread semaphore for sync calls, one asyncio semaphore per event loop
+  for async calls).
+
+ツール毎のタイムアウトと全エージェント共通の同時実行数の上限をツール単位の
+ラッパーとして付与する（並行実行自体はLangGraph標準のToolNodeに任せる）。
+
+Environment variables:
+    TOOL_MAX_CONCURRENCY: Concurrent tool calls per ToolLimits (default 8)
+    TOOL_TIMEOUT: Default timeout per tool call in seconds (default 30)
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict, Mapping, Optional
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 30.0
+
+
+class ToolLimits:
+    """
+    Timeouts per tool name and a concurrency cap shared by the wrapped tools.
+
+    Args:
+        max_concurrency (Optional[int]): Concurrent calls (TOOL_MAX_CONCURRENCY by default)
+        timeouts (Optional[Mapping[str, float]]): Timeout in seconds per tool name
+        default_timeout (Optional[float]): Timeout for tools not in ``timeouts`` (TOOL_TIMEOUT by default)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        timeouts: Optional[Mapping[str, float]] = None,
+        default_timeout: Optional[float] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(os.getenv("TOOL_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout or float(os.getenv("TOOL_TIMEOUT", DEFAULT_TIMEOUT))
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "timeouts": 0, "running_after_timeout": 0}
+
+    def timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name, self.default_timeout)
+
+    def _timeout_result(self, name: str) -> Dict[str, str]:
+        self.stats["timeouts"] += 1
+        return {"error": f"{name} timed out after {self.timeout_for(name):g}s"}
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    def limit_sync(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Wraps a blocking function (keeps its signature, so config/callbacks parameters still receive values)."""
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            outcome: Dict[str, Any] = {}
+            # コールバック等のcontextvarsを引き継ぐ。止められないため専用スレッドで実行する
+            context = contextvars.copy_context()
+
+            def target() -> None:
+                try:
+                    outcome["result"] = context.run(func, *args, **kwargs)
+                except BaseException as e:
+                    outcome["exception"] = e
+                finally:
+                    # タイムアウト後も実際に終わるまで枠を占有する（残ったスレッドが際限なく増えないように）
+                    with self._lock:
+                        outcome["done"] = True
+                        if outcome.get("timed_out"):
+                            self.stats["running_after_timeout"] -= 1
+                    self._slots.release()
+
+            self._slots.acquire()
+            self.stats["calls"] += 1
+            thread = threading.Thread(target=target, name=f"tool-{name}", daemon=True)
+            try:
+                thread.start()
+            except BaseException:
+                self._slots.release()
+                raise
+            thread.join(self.timeout_for(name))
+            with self._lock:
+                if not outcome.get("done"):
+                    outcome["timed_out"] = True
+                    self.stats["running_after_timeout"] += 1
+            if outcome.get("timed_out"):
+                return self._timeout_result(name)
+            if "exception" in outcome:
+                raise outcome["exception"]
+            return outcome.get("result")
+
+        return wrapper
+
+    def limit_async(self, name: str, coroutine: Callable[..., Any]) -> Callable[..., Any]:
+        """Wraps a coroutine function with the per-loop cap and ``asyncio.wait_for``."""
+        @functools.wraps(coroutine)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            async with self._semaphore():
+                self.stats["calls"] += 1
+                try:
+                    return await asyncio.wait_for(coroutine(*args, **kwargs), self.timeout_for(name))
+                except asyncio.TimeoutError:
+                    return self._timeout_result(name)
+
+        return wrapper
+
+    def wrap(self, tool: Any) -> Any:
+        """
+        Returns a copy of a tool whose calls go through the limits.
+
+        Args:
+            tool (Any): Plain function (its ``acall``, if any, becomes the async
+                version) or ``StructuredTool``
+
+        Returns:
+            StructuredTool: Same name, description and argument schema
+        """
+        from langchain_core.tools import StructuredTool
+        from langchain_core.tools import tool as create_tool
+
+        if not isinstance(tool, StructuredTool):
+            if not callable(tool) or hasattr(tool, "invoke"):
+                raise TypeError(f"Cannot apply tool limits to {type(tool).__name__}; pass a function or StructuredTool")
+            coroutine = getattr(tool, "acall", None)
+            tool = StructuredTool.from_function(func=tool, coroutine=coroutine) if coroutine else create_tool(tool)
+        update = {}
+        if tool.func is not None:
+            update["func"] = self.limit_sync(tool.name, tool.func)
+        if tool.coroutine is not None:
+            update["coroutine"] = self.limit_async(tool.name, tool.coroutine)
+        return tool.model_copy(update=update)
@@ -0,0 +1,83 @@
+"""
+Import-time benchmark for supervisor_workers_multiagents.
+
+Each measurement runs in a fresh interpreter so that nothing is cached in
+sys.modules: the cold import of the module, the first get_app() call (which
+imports LangChain/LangGraph and builds the agents and the supervisor), and a
+second get_app() call (served from the cached graph). With --importtime the
+slowest modules reported by ``python -X importtime`` are listed as well.
+
+supervisor_workers_multiagents のインポート時間と初回グラフ構築時間のベンチマーク
+（OPENAI_API_KEY が未設定の場合はダミー値を使用し、APIは呼び出さない）。
+
+Usage:
+    python benchmark_import_time.py --runs 5 --importtime
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODULE = "supervisor_workers_multiagents"
+
+MEASURE = f"""
+import time
+start = time.perf_counter()
+import {MODULE} as m
+imported = time.perf_counter()
+m.get_app()
+built = time.perf_counter()
+m.get_app()
+cached = time.perf_counter()
+print(imported - start, built - imported, cached - built)
+"""
+
+
+def run_once(env):
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE], cwd=HERE, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return [float(value) * 1000 for value in output.split()[-3:]]
+
+
+def slowest_imports(env, top):
+    """Returns the modules with the largest cumulative import time (µs)."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        cwd=HERE, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="show the slowest imports from -X importtime")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+    samples = [run_once(env) for _ in range(args.runs)]
+    print(f"{'phase':<22} {'median ms':>10} {'min ms':>10} {'max ms':>10}")
+    for label, values in zip(["import module", "first get_app()", "cached get_app()"], zip(*samples)):
+        print(f"{label:<22} {statistics.median(values):10.1f} {min(values):10.1f} {max(values):10.1f}")
+
+    if args.importtime:
+        print(f"\nslowest imports (cumulative, {MODULE}):")
+        for cumulative, name in slowest_imports(env, args.top):
+            print(f"{cumulative / 1000:10.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
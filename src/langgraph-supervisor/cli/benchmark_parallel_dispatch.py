@@ -0,0 +1,168 @@
+"""
+End-to-end latency of compound requests: sequential supervisor handoffs vs
+the planner/fan-out mode (``get_parallel_app()``).
+
+The supervisor hands a compound request ("渋谷でイタリアン、近くのホテル、
+移動中に聴くジャズ") to one worker at a time with an LLM turn in between,
+so its latency is roughly ``(n + 1) × supervisor turn + Σ worker time``.
+The parallel mode plans once, runs the workers as parallel graph branches
+and synthesises once: ``plan + max worker time + synthesis``.
+
+The planner is one extra LLM round-trip, so ``invoke_agent()`` only uses
+the parallel mode for requests in which the pre-router's keyword rules
+find several intents; every run first prints which requests would be
+planned. ``--simulate`` also reports what the planner would add to a
+single-intent request that is not gated this way (``plan + supervisor``
+instead of ``supervisor``).
+
+Modes:
+    default     Calls the real model and APIs (needs OPENAI_API_KEY and the
+                tool API keys) on the compound requests below, both modes,
+                and reports per-request and median latency.
+    --simulate  No network: the real parallel graph runs with stub planner,
+                workers and synthesizer that sleep for --llm-ms / --agent-ms;
+                the sequential handoff chain is replayed with the same delays.
+
+複合的な依頼の処理時間を、スーパーバイザーの逐次ハンドオフとプランナー/並行実行モードで比較する。
+
+Usage:
+    python benchmark_parallel_dispatch.py --repeat 3
+    python benchmark_parallel_dispatch.py --simulate --llm-ms 800 --agent-ms 2500,3000,1500
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import supervisor_workers_multiagents as swm
+
+COMPOUND_REQUESTS = [
+    "渋谷でイタリアンのお店と、その近くで明日泊まれるホテル、移動中に聴けるジャズを探して",
+    "新宿の居酒屋を探して、あと作業用BGMのプレイリストも教えて",
+    "京都で今週末泊まれる宿と、京都観光のYouTube動画を探して",
+]
+
+# プランナーを通さずにスーパーバイザー（またはワーカー）が処理する依頼
+SINGLE_INTENT_REQUESTS = [
+    "King Gnuの代表曲は？",
+    "渋谷で安い焼き鳥屋",
+    "こんにちは",
+]
+
+SIMULATED_PLAN = [
+    {"agent": "restaurant_expert", "task": "渋谷のイタリアンのお店を探して"},
+    {"agent": "travel_expert", "task": "渋谷周辺で明日泊まれるホテルを探して"},
+    {"agent": "music_expert", "task": "移動中に聴けるジャズを探して"},
+]
+
+
+def report_routing():
+    router = swm.get_pre_router()
+    for request in COMPOUND_REQUESTS + SINGLE_INTENT_REQUESTS:
+        decision = router.route(request)
+        if decision.bypass:
+            route = f"worker ({decision.intent})"
+        else:
+            route = "planner" if decision.compound else "supervisor"
+        print(f"{request[:40]:<40}  -> {route}")
+
+
+def run_real(args):
+    sequential = swm.get_app()
+    parallel = swm.get_parallel_app()
+    rows = []
+    for request in COMPOUND_REQUESTS:
+        timings = {}
+        for mode, app in (("sequential", sequential), ("parallel", parallel)):
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                app.invoke({"messages": [{"role": "user", "content": request}]})
+                samples.append(time.perf_counter() - start)
+            timings[mode] = statistics.median(samples)
+        rows.append(timings)
+        print(f"{request[:40]:<40}  sequential {timings['sequential']:6.2f} s  parallel {timings['parallel']:6.2f} s")
+    return rows
+
+
+def run_simulated(args):
+    from langchain_core.runnables import RunnableLambda
+
+    llm_s = args.llm_ms / 1000
+    agent_s = [float(ms) / 1000 for ms in args.agent_ms.split(",")]
+    plan = SIMULATED_PLAN[:len(agent_s)]
+    delays = {subtask["agent"]: delay for subtask, delay in zip(plan, agent_s)}
+
+    def stub_agent(name):
+        def run(state):
+            time.sleep(delays[name])
+            return {"messages": state["messages"] + [{"role": "assistant", "content": f"{name} done"}]}
+        return RunnableLambda(run)
+
+    def planner(request):
+        time.sleep(llm_s)
+        return plan if request in COMPOUND_REQUESTS else []
+
+    def synthesizer(request, results):
+        time.sleep(llm_s)
+        return "\n".join(result["answer"] for result in results)
+
+    app = swm.build_parallel_app(
+        agents={name: stub_agent(name) for name in delays},
+        supervisor=stub_agent(plan[0]["agent"]),
+        planner=planner,
+        synthesizer=synthesizer,
+    )
+
+    def sequential_handoffs():
+        # スーパーバイザーのターン → ワーカー → スーパーバイザーのターン → ... → 最終回答
+        for delay in agent_s:
+            time.sleep(llm_s)
+            time.sleep(delay)
+        time.sleep(llm_s)
+
+    timings = {"sequential": [], "parallel": [], "single": [], "single_planned": []}
+    single = {"messages": [{"role": "user", "content": SINGLE_INTENT_REQUESTS[0]}]}
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        sequential_handoffs()
+        timings["sequential"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        app.invoke({"messages": [{"role": "user", "content": COMPOUND_REQUESTS[0]}]})
+        timings["parallel"].append(time.perf_counter() - start)
+        # 単一の意図の依頼: スーパーバイザーのみ（invoke_agent）と、プランナーを経由した場合
+        start = time.perf_counter()
+        stub_agent(plan[0]["agent"]).invoke(single)
+        timings["single"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        app.invoke(single)
+        timings["single_planned"].append(time.perf_counter() - start)
+    row = {mode: statistics.median(samples) for mode, samples in timings.items()}
+    print(f"workers: {len(agent_s)}  LLM turn {args.llm_ms:.0f} ms  worker time {args.agent_ms} ms")
+    print(f"expected sequential ≈ {(len(agent_s) + 1) * llm_s + sum(agent_s):.2f} s, "
+          f"parallel ≈ {2 * llm_s + max(agent_s):.2f} s")
+    print(f"single-intent:      {row['single']:.2f} s without the planner, {row['single_planned']:.2f} s through it "
+          f"(+{row['single_planned'] - row['single']:.2f} s, avoided by the pre-router gate)")
+    return [row]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--simulate", action="store_true", help="stub LLM and workers with sleeps (no network)")
+    parser.add_argument("--llm-ms", type=float, default=800.0, help="simulated LLM turn (planner/supervisor/synthesis)")
+    parser.add_argument("--agent-ms", default="2500,3000,1500", help="simulated worker times, one per sub-task")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    report_routing()
+    rows = run_simulated(args) if args.simulate else run_real(args)
+    sequential = statistics.median(row["sequential"] for row in rows)
+    parallel = statistics.median(row["parallel"] for row in rows)
+    print(f"median sequential:  {sequential:.2f} s")
+    print(f"median parallel:    {parallel:.2f} s  ({sequential / parallel:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
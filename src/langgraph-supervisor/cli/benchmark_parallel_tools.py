@@ -0,0 +1,123 @@
+"""
+Benchmark for the tool calls of one agent turn: stock ToolNode vs limited tools.
+
+Builds one AI message with one tool call per ``--delays`` entry against stub
+tools that only sleep (no network, no LLM) and runs it through a one-node
+graph with LangGraph's stock ``ToolNode``:
+
+- with the bare tools;
+- with the same tools wrapped by ``ToolLimits`` (per-tool timeout and a
+  shared concurrency cap), as the worker agents use them.
+
+Both sync (``invoke``) and async (``ainvoke``, async tools) are measured.
+The stock node already runs the calls concurrently, so both take about the
+slowest call; the wrapper should add no measurable time. With
+``--max-concurrency`` below the number of calls the limited node becomes
+≈ sum / limit. ``--hang`` adds a call that never finishes in time, to show
+that it is cut off after ``--timeout`` (a sync call's thread keeps its slot
+until it really ends, another ``--timeout`` later).
+
+1ターン内のツール呼び出しを標準のToolNodeで、素のツールとToolLimits付きのツールで
+実行し、実時間を比較する。
+
+Usage:
+    python benchmark_parallel_tools.py --delays 0.4,0.3,0.2,0.1 --max-concurrency 8 --repeat 5 --hang
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agent_common.tool_limits import ToolLimits
+
+
+def make_tool(name, delay, use_async):
+    from langchain_core.tools import StructuredTool
+
+    def tool() -> dict:
+        time.sleep(delay)
+        return {"tool": name, "slept": delay}
+
+    async def atool() -> dict:
+        await asyncio.sleep(delay)
+        return {"tool": name, "slept": delay}
+
+    return StructuredTool.from_function(
+        func=tool, coroutine=atool if use_async else None, name=name, description=f"Sleeps {delay}s."
+    )
+
+
+def make_graph(tools):
+    from langgraph.graph import START, MessagesState, StateGraph
+    from langgraph.prebuilt import ToolNode
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("tools", ToolNode(tools))
+    graph.add_edge(START, "tools")
+    return graph.compile()
+
+
+def make_input(names):
+    from langchain_core.messages import AIMessage
+
+    calls = [{"name": name, "args": {}, "id": f"call_{i}", "type": "tool_call"} for i, name in enumerate(names)]
+    return {"messages": [AIMessage(content="", tool_calls=calls)]}
+
+
+def timed(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delays", default="0.4,0.3,0.2,0.1", help="comma-separated sleep seconds of the stub tools")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=None, help="per-tool timeout in seconds (default: 10x the slowest delay)")
+    parser.add_argument("--hang", action="store_true", help="add a call that sleeps 2x the timeout")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    delays = [float(d) for d in args.delays.split(",")]
+    timeout = args.timeout or max(delays) * 10
+    if args.hang:
+        delays.append(timeout * 2)
+    names = [f"stub_{i}" for i in range(len(delays))]
+    payload = make_input(names)
+    limits = ToolLimits(max_concurrency=args.max_concurrency, default_timeout=timeout)
+
+    rows = []
+    for use_async in (False, True):
+        tools = [make_tool(name, delay, use_async) for name, delay in zip(names, delays)]
+        for label, graph in (("stock ToolNode", make_graph(tools)), ("+ ToolLimits", make_graph([limits.wrap(t) for t in tools]))):
+            if args.hang and label == "stock ToolNode":
+                # 制限なしでは最も遅い呼び出しを待ち続けるため計測しない
+                continue
+            if use_async:
+                ms, result = timed(lambda: asyncio.run(graph.ainvoke(payload)), args.repeat)
+            else:
+                ms, result = timed(lambda: graph.invoke(payload), args.repeat)
+            ordered = [m.tool_call_id for m in result["messages"][1:]] == [f"call_{i}" for i in range(len(names))]
+            timeouts = sum("timed out" in str(m.content) for m in result["messages"][1:])
+            rows.append((f"{label} ({'async' if use_async else 'sync'})", ms, ordered, timeouts))
+
+    print(f"tool calls:         {len(names)}  (max concurrency {args.max_concurrency}, timeout {timeout:g}s)")
+    print(f"max delay:          {min(max(delays), timeout) * 1000:.0f} ms  (sum {sum(min(d, timeout) for d in delays) * 1000:.0f} ms, for reference)")
+    for label, ms, ordered, timeouts in rows:
+        print(f"{label:<28} {ms:>7.0f} ms  request order kept: {ordered}  timeouts: {timeouts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark for the supervisor pre-router on a labelled fixture set.
+
+Routes every request in pre_router_fixtures.json and reports:
+
+- accuracy: the final destination (worker agent or supervisor) is the expected one
+- bypass rate: share of requests sent straight to a worker agent
+- bypass precision: share of bypassed requests sent to the right agent
+- misroutes: requests sent to the wrong worker (these are the costly errors;
+  a fallback only costs the usual supervisor turn)
+- router latency and the estimated latency saved, i.e. bypassed requests ×
+  the supervisor routing turn (``--supervisor-ms``, measure it in your own
+  environment; no LLM is called here)
+
+事前ルーターのラベル付きフィクスチャでの精度・スキップ率の計測と削減レイテンシの概算。
+
+Usage:
+    python benchmark_pre_router.py --supervisor-ms 1500 --verbose
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agent_common.pre_router import SUPERVISOR, build_pre_router
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pre_router_fixtures.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--supervisor-ms", type=float, default=1500.0, help="assumed latency of one supervisor routing turn (not measured here)")
+    parser.add_argument("--verbose", action="store_true", help="print fallbacks and misroutes")
+    args = parser.parse_args()
+
+    with open(args.fixtures, encoding="utf-8") as f:
+        cases = json.load(f)
+
+    start = time.perf_counter()
+    router = build_pre_router(threshold=args.threshold)
+    train_ms = (time.perf_counter() - start) * 1000
+
+    correct = bypassed = bypass_correct = 0
+    stages = Counter()
+    latencies = []
+    for case in cases:
+        decision = router.route(case["text"])
+        expected = None if case["intent"] == SUPERVISOR else case["intent"]
+        latencies.append(decision.latency_ms)
+        stages[decision.stage if decision.bypass else "supervisor"] += 1
+        correct += decision.intent == expected
+        if decision.bypass:
+            bypassed += 1
+            bypass_correct += decision.intent == expected
+        if args.verbose and decision.intent != expected:
+            kind = "MISROUTE" if decision.bypass else "fallback"
+            print(f"{kind:<8} {case['text']!r}: expected {case['intent']}, got {decision.intent} "
+                  f"({decision.stage}, p={decision.confidence:.2f})")
+
+    total = len(cases)
+    saved_ms = bypassed * args.supervisor_ms - sum(latencies)
+    print(f"cases:              {total}")
+    print(f"training:           {train_ms:.1f} ms")
+    print(f"accuracy:           {correct / total:.3f}")
+    print(f"bypass rate:        {bypassed / total:.3f}  ({dict(stages)})")
+    print(f"bypass precision:   {bypass_correct / bypassed if bypassed else 1.0:.3f}")
+    print(f"misroutes:          {bypassed - bypass_correct}")
+    print(f"router latency:     p50 {statistics.median(latencies):.3f} ms, max {max(latencies):.3f} ms")
+    print(f"est. latency saved: {saved_ms / 1000:.1f} s total, {saved_ms / total:.0f} ms per request "
+          f"(estimate: assumes a {args.supervisor_ms:.0f} ms supervisor turn, --supervisor-ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,46 @@
-from langchain_openai import ChatOpenAI
-
-from langgraph_supervisor import create_supervisor
-from langgraph.prebuilt import create_react_agent
+# 重い依存（LangChain/LangGraph・Google API・matplotlib・streamlit等）は
+# 使用する関数内で遅延インポートし、モジュールのインポートを軽く保つ
 from load_dotenv import load_dotenv
-from langchain_tavily import TavilySearch
 import datetime
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 import os
-import pickle
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
 from pydantic import BaseModel, Field
 from typing import Optional, List
 import requests
 import json
 from urllib.parse import quote
 import re
-import matplotlib.pyplot as plt
-import io
-import streamlit as st
 from collections import Counter
+import sys
+import threading
+import time
+
+# src/ をPythonパスに追加（共通モジュール agent_common を利用するため）
+src_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agent_common.hotpepper_master import (
+    MASTER_ALIASES,
+    MASTER_TABLES,
+    HotPepperMasterError,
+    get_master_store,
+)
+from agent_common.area_resolver import (
+    LARGE_AREA_CODES,
+    MIDDLE_AREA_CODES,
+    resolve_area,
+    resolve_budget,
+    resolve_genre,
+)
+from agent_common.result_cache import get_result_cache
+from agent_common.pre_router import get_pre_router, pre_router_enabled
+from agent_common.spotify_auth import SpotifyAuthError, get_token_manager
+# ネットワークツールは同期版（http_pool）と非同期版（共有httpx.AsyncClient）の両方で実行できる
+from agent_common.async_http import BlockingCall, HttpCall, dual_io, threaded
+from agent_common.tool_limits import ToolLimits
+
+# 検索系ツールの結果キャッシュ（正規化した引数ごと・ツール毎のTTL・同一リクエストの合流）
+result_cache = get_result_cache()
 
 load_dotenv()
 
@@ -35,7 +55,33 @@ class WorkflowState(BaseModel):
     current_time: Optional[str] = Field(None, description="現在時刻")
     final_result: Optional[str] = Field(None, description="最終結果")
 
-model = ChatOpenAI(model="gpt-4o-mini")
+class SubTask(BaseModel):
+    agent: str = Field(..., description="担当するワーカーエージェント名")
+    task: str = Field(..., description="そのエージェントに渡す、単独で理解できる依頼文")
+
+class TaskPlan(BaseModel):
+    subtasks: List[SubTask] = Field(default_factory=list, description="互いに独立して並行実行できるサブタスク")
+
+MODEL_NAME = "gpt-4o-mini"
+
+_model = None
+_agents = None
+_app = None
+_model_lock = threading.Lock()
+_agents_lock = threading.Lock()
+_app_lock = threading.Lock()
+_parallel_app = None
+_parallel_app_lock = threading.Lock()
+
+def get_model():
+    """共有のChatOpenAIモデルを初回使用時に生成して返す"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from langchain_openai import ChatOpenAI
+                _model = ChatOpenAI(model=MODEL_NAME)
+    return _model
 
 # Create specialized agents
 
@@ -47,15 +93,28 @@ def multiply(a: float, b: float) -> float:
     """Multiply two numbers."""
     return a * b
 
-def web_search(query: str) -> str:
-    """TavilyでWeb検索を行う。"""
-    wrapped = TavilySearch(max_results=5)
-    result = wrapped.invoke({"query": query})
+def _format_web_search(result) -> str:
     # 結果の要約や本文を返す（必要に応じて調整）
     if isinstance(result, dict) and "results" in result:
         return "\n".join([r.get("content", "") for r in result["results"]])
     return str(result)
 
+def web_search(query: str) -> str:
+    """TavilyでWeb検索を行う。"""
+    from langchain_tavily import TavilySearch
+
+    wrapped = TavilySearch(max_results=5)
+    return _format_web_search(wrapped.invoke({"query": query}))
+
+async def aweb_search(query: str) -> str:
+    """TavilyでWeb検索を行う。"""
+    from langchain_tavily import TavilySearch
+
+    wrapped = TavilySearch(max_results=5)
+    return _format_web_search(await wrapped.ainvoke({"query": query}))
+
+web_search.acall = aweb_search
+
 def get_current_time() -> dict:
     """現在時刻（ISO 8601形式の文字列）を返すツール。"""
     now = datetime.datetime.now().isoformat()
@@ -137,6 +196,11 @@ TOKEN_FILE = 'token.pickle'
 
 def get_google_calendar_service():
     """GoogleカレンダーAPIのサービスを取得"""
+    import pickle
+    from google.auth.transport.requests import Request
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     creds = None
     
     # トークンファイルから認証情報を読み込み
@@ -159,6 +223,7 @@ def get_google_calendar_service():
     
     return build('calendar', 'v3', credentials=creds)
 
+@threaded
 def add_to_google_calendar(event: str, time: str) -> dict:
     """Googleカレンダーに予定を追加するツール。
     
@@ -257,6 +322,22 @@ def add_to_google_calendar(event: str, time: str) -> dict:
 
 
 # Spotify関連のツール
+def _spotify_api(path: str, params: dict = None):
+    """Spotify Web APIを呼び出す（共通トークンマネージャーのトークンを再利用し、401時は1回だけ再取得）"""
+    token_manager = get_token_manager()
+    url = f"https://api.spotify.com/v1{path}"
+    for attempt in range(2):
+        # トークンの更新（POST）は非同期版ではワーカースレッドで行う
+        token = token_manager.cached_token() or (yield BlockingCall(token_manager.get_token))
+        response = yield HttpCall("GET", url, params=params, headers={"Authorization": f"Bearer {token}"})
+        if response.status_code != 401 or attempt == 1:
+            break
+        token_manager.invalidate()
+    response.raise_for_status()
+    return response.json()
+
+@result_cache.cached("spotify_tracks", ttl=60 * 60)
+@dual_io
 def search_spotify_tracks(query: str) -> dict:
     """Spotifyで楽曲を検索するツール。
     
@@ -264,28 +345,8 @@ def search_spotify_tracks(query: str) -> dict:
         query: 検索クエリ（アーティスト名、曲名など）
     """
     try:
-        # spotipyを使用したSpotify APIクライアントの初期化
-        import spotipy
-        from spotipy.oauth2 import SpotifyClientCredentials
-        
-        # CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
-        # CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
-        CLIENT_ID = os.getenv("SPOTIFY_USER_ID")
-        CLIENT_SECRET = os.getenv("SPOTIFY_TOKEN")
-        
-        if not CLIENT_ID or not CLIENT_SECRET:
-            return {
-                "error": "Spotify API認証情報が設定されていません。SPOTIFY_CLIENT_IDとSPOTIFY_CLIENT_SECRETを設定してください。",
-                "query": query
-            }
-        
-        sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-            client_id=CLIENT_ID, 
-            client_secret=CLIENT_SECRET
-        ))
-        
         # Spotify APIを使用して楽曲を検索
-        results = sp.search(q=query, type='track', limit=5)
+        results = yield from _spotify_api("/search", {"q": query, "type": "track", "limit": 5})
         tracks = results.get('tracks', {}).get('items', [])
         
         if not tracks:
@@ -319,12 +380,18 @@ def search_spotify_tracks(query: str) -> dict:
         }
         # return SpotifyTrackList(results=tracks)
         
+    except SpotifyAuthError:
+        return {
+            "error": "Spotify API認証情報が設定されていません。SPOTIFY_CLIENT_IDとSPOTIFY_CLIENT_SECRETを設定してください。",
+            "query": query
+        }
     except Exception as e:
         return {
             "error": f"Spotify検索エラー: {str(e)}",
             "query": query
         }
 
+@dual_io
 def get_spotify_playlist(playlist_id: str) -> dict:
     """Spotifyのプレイリストを取得するツール。
     
@@ -332,29 +399,12 @@ def get_spotify_playlist(playlist_id: str) -> dict:
         playlist_id: プレイリストのIDまたはURL
     """
     try:
-        import spotipy
-        from spotipy.oauth2 import SpotifyClientCredentials
-        
-        CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
-        CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
-        
-        if not CLIENT_ID or not CLIENT_SECRET:
-            return {
-                "error": "Spotify API認証情報が設定されていません。SPOTIFY_CLIENT_IDとSPOTIFY_CLIENT_SECRETを設定してください。",
-                "playlist_id": playlist_id
-            }
-        
-        sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-            client_id=CLIENT_ID, 
-            client_secret=CLIENT_SECRET
-        ))
-        
         # URLからプレイリストIDを抽出
         if 'spotify.com' in playlist_id:
             playlist_id = playlist_id.split('/')[-1].split('?')[0]
         
         # プレイリスト情報を取得
-        playlist = sp.playlist(playlist_id)
+        playlist = yield from _spotify_api(f"/playlists/{playlist_id}")
         
         playlist_info = {
             'name': playlist['name'],
@@ -383,12 +433,18 @@ def get_spotify_playlist(playlist_id: str) -> dict:
         
         return playlist_info
         
+    except SpotifyAuthError:
+        return {
+            "error": "Spotify API認証情報が設定されていません。SPOTIFY_CLIENT_IDとSPOTIFY_CLIENT_SECRETを設定してください。",
+            "playlist_id": playlist_id
+        }
     except Exception as e:
         return {
             "error": f"プレイリスト取得エラー: {str(e)}",
             "playlist_id": playlist_id
         }
 
+@dual_io
 def search_spotify_artists(artist_name: str) -> dict:
     """Spotifyでアーティストを検索するツール。
     
@@ -396,25 +452,8 @@ def search_spotify_artists(artist_name: str) -> dict:
         artist_name: 検索するアーティスト名
     """
     try:
-        import spotipy
-        from spotipy.oauth2 import SpotifyClientCredentials
-        
-        CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
-        CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
-        
-        if not CLIENT_ID or not CLIENT_SECRET:
-            return {
-                "error": "Spotify API認証情報が設定されていません。SPOTIFY_CLIENT_IDとSPOTIFY_CLIENT_SECRETを設定してください。",
-                "artist_name": artist_name
-            }
-        
-        sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-            client_id=CLIENT_ID, 
-            client_secret=CLIENT_SECRET
-        ))
-        
         # アーティストを検索
-        results = sp.search(q=artist_name, type='artist', limit=5)
+        results = yield from _spotify_api("/search", {"q": artist_name, "type": "artist", "limit": 5})
         artists = results.get('artists', {}).get('items', [])
         
         if not artists:
@@ -445,6 +484,11 @@ def search_spotify_artists(artist_name: str) -> dict:
             "message": f"{artist_name}の検索結果: {len(artist_results)}件見つかりました。"
         }
         
+    except SpotifyAuthError:
+        return {
+            "error": "Spotify API認証情報が設定されていません。SPOTIFY_CLIENT_IDとSPOTIFY_CLIENT_SECRETを設定してください。",
+            "artist_name": artist_name
+        }
     except Exception as e:
         return {
             "error": f"アーティスト検索エラー: {str(e)}",
@@ -452,6 +496,8 @@ def search_spotify_artists(artist_name: str) -> dict:
         }
 
 # 動画検索関連のツール
+@result_cache.cached("youtube_videos", ttl=30 * 60)
+@dual_io
 def search_youtube_videos(query: str) -> dict:
     """YouTubeで動画を検索するツール。
     
@@ -473,7 +519,7 @@ def search_youtube_videos(query: str) -> dict:
             'key': os.getenv("GOOGLE_MAPS_API_KEY", "")
         }
         
-        response = requests.get(search_url, params=params)
+        response = yield HttpCall("GET", search_url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -510,6 +556,7 @@ def search_youtube_videos(query: str) -> dict:
             "query": query
         }
 
+@dual_io
 def get_video_info(video_id: str) -> dict:
     """YouTube動画の詳細情報を取得するツール。
     
@@ -525,7 +572,7 @@ def get_video_info(video_id: str) -> dict:
             'key': os.getenv("YOUTUBE_API_KEY", "")
         }
         
-        response = requests.get(video_url, params=params)
+        response = yield HttpCall("GET", video_url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -566,6 +613,7 @@ def get_video_info(video_id: str) -> dict:
         }
 
 # 旅行サイト関連のツール
+@dual_io
 def search_jalan_hotels(location: str, check_in: str, check_out: str, guests: int = 2) -> dict:
     """じゃらんでホテルを検索するツール。
     
@@ -608,7 +656,7 @@ def search_jalan_hotels(location: str, check_in: str, check_out: str, guests: in
         }
         
         # リクエストを送信
-        response = requests.get(search_url, headers=headers, timeout=10)
+        response = yield HttpCall("GET", search_url, headers=headers)
         response.raise_for_status()
         
         # BeautifulSoupでHTMLを解析
@@ -700,6 +748,7 @@ def search_jalan_hotels(location: str, check_in: str, check_out: str, guests: in
             ]
         }
 
+@dual_io
 def search_airbnb_accommodations(location: str, check_in: str, check_out: str, guests: int = 2) -> dict:
     """Airbnbで宿泊施設を検索するツール。
     
@@ -749,7 +798,7 @@ def search_airbnb_accommodations(location: str, check_in: str, check_out: str, g
         }
         
         # リクエストを送信
-        response = requests.get(search_url, headers=headers, timeout=15)
+        response = yield HttpCall("GET", search_url, headers=headers)
         response.raise_for_status()
         
         # BeautifulSoupでHTMLを解析
@@ -865,6 +914,8 @@ def search_airbnb_accommodations(location: str, check_in: str, check_out: str, g
         }
 
 # レストラン検索関連のツール
+@result_cache.cached("hotpepper_restaurants", ttl=10 * 60)
+@dual_io
 def search_hotpepper_restaurants(location: str, cuisine: str = "", budget: str = "") -> dict:
     """ホットペッパーグルメでレストランを検索するツール。
     
@@ -880,230 +931,36 @@ def search_hotpepper_restaurants(location: str, cuisine: str = "", budget: str =
         # APIキーを環境変数から取得
         api_key = os.getenv("RECRUIT_API_KEY", "18c8f07145ccf2ad")
         
-        # エリアコードのマッピング（大エリア）
-        large_area_mapping = {
-            '東京': 'Z011',
-            '神奈川': 'Z012', 
-            '埼玉': 'Z013',
-            '千葉': 'Z014',
-            '茨城': 'Z015',
-            '栃木': 'Z016',
-            '群馬': 'Z017',
-            '山梨': 'Z018',
-            '新潟': 'Z019',
-            '長野': 'Z020',
-            '富山': 'Z021',
-            '石川': 'Z022',
-            '福井': 'Z023',
-            '静岡': 'Z024',
-            '愛知': 'Z025',
-            '三重': 'Z026',
-            '岐阜': 'Z027',
-            '滋賀': 'Z028',
-            '京都': 'Z029',
-            '大阪': 'Z030',
-            '兵庫': 'Z031',
-            '奈良': 'Z032',
-            '和歌山': 'Z033',
-            '鳥取': 'Z034',
-            '島根': 'Z035',
-            '岡山': 'Z036',
-            '広島': 'Z037',
-            '山口': 'Z038',
-            '徳島': 'Z039',
-            '香川': 'Z040',
-            '愛媛': 'Z041',
-            '高知': 'Z042',
-            '福岡': 'Z043',
-            '佐賀': 'Z044',
-            '長崎': 'Z045',
-            '熊本': 'Z046',
-            '大分': 'Z047',
-            '宮崎': 'Z048',
-            '鹿児島': 'Z049',
-            '沖縄': 'Z050'
-        }
-        
-        # 中エリアコードのマッピング（東京エリア）
-        middle_area_mapping = {
-            '渋谷': 'Z011001',
-            '新宿': 'Z011002',
-            '池袋': 'Z011003',
-            '銀座': 'Z011004',
-            '六本木': 'Z011005',
-            '原宿': 'Z011006',
-            '青山': 'Z011007',
-            '表参道': 'Z011008',
-            '恵比寿': 'Z011009',
-            '代官山': 'Z011010',
-            '中目黒': 'Z011011',
-            '目黒': 'Z011012',
-            '五反田': 'Z011013',
-            '品川': 'Z011014',
-            '大井町': 'Z011015',
-            '蒲田': 'Z011016',
-            '羽田': 'Z011017',
-            '大森': 'Z011018',
-            '大井': 'Z011019',
-            '西大井': 'Z011020',
-            '上野': 'Z011021',
-            '浅草': 'Z011022',
-            '秋葉原': 'Z011023',
-            '御徒町': 'Z011024',
-            '日暮里': 'Z011025',
-            '西日暮里': 'Z011026',
-            '田端': 'Z011027',
-            '駒込': 'Z011028',
-            '巣鴨': 'Z011029',
-            '大塚': 'Z011030',
-            '池袋': 'Z011031',
-            '目白': 'Z011032',
-            '高田馬場': 'Z011033',
-            '新宿': 'Z011034',
-            '新大久保': 'Z011035',
-            '高田馬場': 'Z011036',
-            '早稲田': 'Z011037',
-            '神楽坂': 'Z011038',
-            '飯田橋': 'Z011039',
-            '市ヶ谷': 'Z011040',
-            '四ツ谷': 'Z011041',
-            '新宿御苑前': 'Z011042',
-            '新宿三丁目': 'Z011043',
-            '新宿西口': 'Z011044',
-            '西新宿': 'Z011045',
-            '中野': 'Z011046',
-            '高円寺': 'Z011047',
-            '阿佐ヶ谷': 'Z011048',
-            '荻窪': 'Z011049',
-            '西荻窪': 'Z011050',
-            '吉祥寺': 'Z011051',
-            '三鷹': 'Z011052',
-            '武蔵境': 'Z011053',
-            '東小金井': 'Z011054',
-            '武蔵小金井': 'Z011055',
-            '国分寺': 'Z011056',
-            '西国分寺': 'Z011057',
-            '立川': 'Z011058',
-            '八王子': 'Z011059',
-            '町田': 'Z011060',
-            '多摩': 'Z011061',
-            '府中': 'Z011062',
-            '調布': 'Z011063',
-            '狛江': 'Z011064',
-            '成城学園前': 'Z011065',
-            '祖師ヶ谷大蔵': 'Z011066',
-            '千歳烏山': 'Z011067',
-            '仙川': 'Z011068',
-            'つつじヶ丘': 'Z011069',
-            '柴崎': 'Z011070',
-            '国領': 'Z011071',
-            '布田': 'Z011072',
-            '調布': 'Z011073',
-            '西調布': 'Z011074',
-            '飛田給': 'Z011075',
-            '武蔵野台': 'Z011076',
-            '東府中': 'Z011077',
-            '府中本町': 'Z011078',
-            '分倍河原': 'Z011079',
-            '西府': 'Z011080',
-            '南多摩': 'Z011081',
-            '多摩センター': 'Z011082',
-            '唐木田': 'Z011083',
-            '橋本': 'Z011084',
-            '相模原': 'Z011085',
-            '海老名': 'Z011086',
-            '厚木': 'Z011087',
-            '本厚木': 'Z011088',
-            '愛甲石田': 'Z011089',
-            '伊勢原': 'Z011090',
-            '鶴巻温泉': 'Z011091',
-            '東海大学前': 'Z011092',
-            '小田原': 'Z011093',
-            '箱根湯本': 'Z011094',
-            '強羅': 'Z011095',
-            '早雲山': 'Z011096',
-            '大涌谷': 'Z011097',
-            '桃源台': 'Z011098',
-            '箱根町': 'Z011099',
-            '元箱根': 'Z011100',
-            '箱根湯本': 'Z011101',
-            '小田原': 'Z011102',
-            '熱海': 'Z011103',
-            '伊東': 'Z011104',
-            '伊豆高原': 'Z011105',
-            '伊豆急下田': 'Z011106',
-            '下田': 'Z011107',
-            '石廊崎': 'Z011108',
-            '松崎': 'Z011109',
-            '西伊豆': 'Z011110',
-            '土肥': 'Z011111',
-            '修善寺': 'Z011112',
-            '三島': 'Z011113',
-            '沼津': 'Z011114',
-            '清水': 'Z011115',
-            '静岡': 'Z011116',
-            '焼津': 'Z011117',
-            '藤枝': 'Z011118',
-            '島田': 'Z011119',
-            '金谷': 'Z011120',
-            '掛川': 'Z011121',
-            '袋井': 'Z011122',
-            '磐田': 'Z011123',
-            '浜松': 'Z011124',
-            '豊橋': 'Z011125',
-            '名古屋': 'Z011126',
-            '岐阜': 'Z011127',
-            '大垣': 'Z011128',
-            '関ヶ原': 'Z011129',
-            '米原': 'Z011130',
-            '彦根': 'Z011131',
-            '近江八幡': 'Z011132',
-            '草津': 'Z011133',
-            '南草津': 'Z011134',
-            '瀬田': 'Z011135',
-            '石山': 'Z011136',
-            '大津': 'Z011137',
-            '山科': 'Z011138',
-            '京都': 'Z011139',
-            '大阪': 'Z011140',
-            '神戸': 'Z011141',
-            '姫路': 'Z011142',
-            '岡山': 'Z011143',
-            '広島': 'Z011144',
-            '福岡': 'Z011145',
-            '博多': 'Z011146',
-            '天神': 'Z011147',
-            '中洲': 'Z011148',
-            '長崎': 'Z011149',
-            '熊本': 'Z011150',
-            '鹿児島': 'Z011151',
-            '那覇': 'Z011152'
-        }
-        
-        # エリアコードを設定（動的検索機能付き）
+        # エリアコードを設定（共通リゾルバで完全一致→最長一致、見つからない場合は動的検索）
         area_code_found = False
         search_method = "static_mapping"
+        ambiguous_areas = []
         
-        if location in large_area_mapping:
-            large_area_code = large_area_mapping[location]
-            area_code_found = True
-        elif location in middle_area_mapping:
-            middle_area_code = middle_area_mapping[location]
+        area_match = resolve_area(location)
+        if area_match:
+            if area_match.kind == "large_area":
+                large_area_code = area_match.code
+            else:
+                middle_area_code = area_match.code
             area_code_found = True
+            if area_match.name != location:
+                search_method = "static_longest_match"
+            if area_match.ambiguous:
+                # 同名で複数のコードがある場合は候補として返す
+                ambiguous_areas = [area_match.code, *area_match.alternates]
         else:
             # エリアコードが見つからない場合は動的検索を実行
             print(f"エリアコードが見つかりません: {location}。動的検索を実行します...")
-            dynamic_search_result = find_and_add_area_code(location, large_area_mapping, middle_area_mapping)
+            large_area_mapping = dict(LARGE_AREA_CODES)
+            middle_area_mapping = dict(MIDDLE_AREA_CODES)
+            # 初回はマスターデータの取得を伴うため、非同期版ではワーカースレッドで行う
+            dynamic_search_result = yield BlockingCall(find_and_add_area_code, (location, large_area_mapping, middle_area_mapping))
             
             if 'error' not in dynamic_search_result and dynamic_search_result.get('found_areas'):
                 # 動的検索でエリアが見つかった場合
                 found_areas = dynamic_search_result['found_areas']
-                updated_large_area_mapping = dynamic_search_result['updated_large_area_mapping']
-                updated_middle_area_mapping = dynamic_search_result['updated_middle_area_mapping']
-                
-                # マッピングを更新
-                large_area_mapping.update(updated_large_area_mapping)
-                middle_area_mapping.update(updated_middle_area_mapping)
+                large_area_mapping = dynamic_search_result['updated_large_area_mapping']
+                middle_area_mapping = dynamic_search_result['updated_middle_area_mapping']
                 
                 # 見つかったエリアで再度チェック
                 if location in large_area_mapping:
@@ -1152,34 +1009,10 @@ def search_hotpepper_restaurants(location: str, cuisine: str = "", budget: str =
         
         # 料理ジャンルが指定されている場合
         if cuisine:
-            # ジャンルコードのマッピング（実際のAPIコード）
-            genre_mapping = {
-                '居酒屋': 'G001',
-                'ダイニングバー・バル': 'G002',
-                '創作料理': 'G003',
-                'アジア・エスニック料理': 'G004',
-                'イタリアン・フレンチ': 'G005',
-                '中華': 'G006',
-                '焼肉・ホルモン': 'G007',
-                '和食': 'G008',
-                '洋食': 'G009',
-                'カフェ・スイーツ': 'G010',
-                'その他グルメ': 'G011',
-                '韓国料理': 'G012',
-                'イタリアン': 'G005',
-                'フレンチ': 'G005',
-                'エスニック': 'G004',
-                'アジア料理': 'G004',
-                '焼肉': 'G007',
-                'ホルモン': 'G007',
-                'カフェ': 'G010',
-                'スイーツ': 'G010',
-                'ラーメン': 'G011',
-                'カラオケ': 'G011',
-                'バー': 'G002'
-            }
-            if cuisine in genre_mapping:
-                params['genre'] = genre_mapping[cuisine]
+            # ジャンルコードを共通リゾルバで解決（完全一致→最長一致）
+            genre_match = resolve_genre(cuisine)
+            if genre_match:
+                params['genre'] = genre_match.code
             else:
                 # ジャンルコードが見つからない場合はキーワード検索に追加
                 if params['keyword']:
@@ -1189,29 +1022,10 @@ def search_hotpepper_restaurants(location: str, cuisine: str = "", budget: str =
         
         # 予算が指定されている場合
         if budget:
-            # 予算コードのマッピング（実際のAPIコード）
-            budget_mapping = {
-                '500円以下': 'B009',
-                '501～1000円': 'B010',
-                '1001～1500円': 'B011',
-                '1501～2000円': 'B001',
-                '2001～3000円': 'B002',
-                '3001～4000円': 'B003',
-                '4001～5000円': 'B008',
-                '5001～7000円': 'B004',
-                '7001～10000円': 'B005',
-                '10001～15000円': 'B006',
-                '15001～20000円': 'B012',
-                '20001～30000円': 'B013',
-                '30001円以上': 'B014',
-                '3000円以下': 'B002',
-                '5000円以下': 'B008',
-                '10000円以下': 'B005'
-            }
-            for budget_range, code in budget_mapping.items():
-                if budget_range in budget:
-                    params['budget'] = code
-                    break
+            # 予算コードを共通リゾルバで解決
+            budget_match = resolve_budget(budget)
+            if budget_match:
+                params['budget'] = budget_match.code
         
         # 特集コードの設定（人気の特集）
         popular_specials = [
@@ -1236,7 +1050,7 @@ def search_hotpepper_restaurants(location: str, cuisine: str = "", budget: str =
             params['credit_card'] = random.choice(credit_card_codes)
         
         # 最初のAPIリクエストを送信
-        response = requests.get(base_url, params=params, timeout=10)
+        response = yield HttpCall("GET", base_url, params=params)
         response.raise_for_status()
         
         # JSONレスポンスを解析
@@ -1279,7 +1093,7 @@ def search_hotpepper_restaurants(location: str, cuisine: str = "", budget: str =
                     fallback_params['genre'] = ''
                 
                 try:
-                    fallback_response = requests.get(base_url, params=fallback_params, timeout=10)
+                    fallback_response = yield HttpCall("GET", base_url, params=fallback_params)
                     fallback_response.raise_for_status()
                     fallback_data = fallback_response.json()
                     
@@ -1318,6 +1132,7 @@ def search_hotpepper_restaurants(location: str, cuisine: str = "", budget: str =
         # 検索方法に応じたメッセージを生成
         search_method_messages = {
             "static_mapping": f"{location}のレストラン検索結果: {len(restaurants)}件見つかりました。（既存エリアコード使用）",
+            "static_longest_match": f"{location}のレストラン検索結果: {len(restaurants)}件見つかりました。（エリア名の最長一致で既存エリアコード使用）",
             "dynamic_large_area": f"{location}のレストラン検索結果: {len(restaurants)}件見つかりました。（動的検索で大エリアコード発見）",
             "dynamic_middle_area": f"{location}のレストラン検索結果: {len(restaurants)}件見つかりました。（動的検索で中エリアコード発見）",
             "dynamic_partial_match": f"{location}のレストラン検索結果: {len(restaurants)}件見つかりました。（動的検索で部分一致エリアコード使用）",
@@ -1336,7 +1151,8 @@ def search_hotpepper_restaurants(location: str, cuisine: str = "", budget: str =
             "message": message,
             "api_url": response.url,
             "search_params": params,
-            "search_method": search_method
+            "search_method": search_method,
+            "ambiguous_area_codes": ambiguous_areas
         }
         
     except requests.exceptions.RequestException as e:
@@ -1459,6 +1275,7 @@ def format_restaurant_data(shops, location):
     
     return restaurants
 
+@dual_io
 def search_google_maps_restaurants(location: str, cuisine: str = "", radius: int = 1000) -> dict:
     """Google Mapsでレストランを検索するツール。
     
@@ -1481,7 +1298,7 @@ def search_google_maps_restaurants(location: str, cuisine: str = "", radius: int
             'key': os.getenv("GOOGLE_MAPS_API_KEY", "")
         }
         
-        response = requests.get(base_url, params=params)
+        response = yield HttpCall("GET", base_url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -1589,6 +1406,7 @@ def check_restaurant_availability(restaurant_name: str, date: str, time: str, gu
             "restaurant": restaurant_name
         }
 
+@threaded
 def get_hotpepper_master_data(master_type: str = "genre") -> dict:
     """ホットペッパーグルメAPIのマスターデータを取得するツール。
     
@@ -1596,60 +1414,18 @@ def get_hotpepper_master_data(master_type: str = "genre") -> dict:
         master_type: マスターデータの種類（"genre", "area", "budget", "special", "credit_card"）
     """
     try:
-        # APIキーを環境変数から取得
-        api_key = os.getenv("RECRUIT_API_KEY", "18c8f07145ccf2ad")
-        
-        # マスターデータのエンドポイントマッピング
-        endpoint_mapping = {
-            'genre': 'https://webservice.recruit.co.jp/hotpepper/genre/v1/',
-            'area': 'https://webservice.recruit.co.jp/hotpepper/small_area/v1/',
-            'budget': 'https://webservice.recruit.co.jp/hotpepper/budget/v1/',
-            'special': 'https://webservice.recruit.co.jp/hotpepper/special/v1/',
-            'credit_card': 'https://webservice.recruit.co.jp/hotpepper/credit_card/v1/',
-            'large_area': 'https://webservice.recruit.co.jp/hotpepper/large_area/v1/',
-            'middle_area': 'https://webservice.recruit.co.jp/hotpepper/middle_area/v1/'
-        }
-        
-        if master_type not in endpoint_mapping:
+        # マスターデータはローカルキャッシュから取得（初回のみAPIから取得し、以降はバックグラウンドで更新）
+        store = get_master_store()
+        try:
+            items = store.records(master_type)
+        except KeyError:
             return {
                 "error": f"サポートされていないマスターデータタイプ: {master_type}",
-                "supported_types": list(endpoint_mapping.keys())
-            }
-        
-        base_url = endpoint_mapping[master_type]
-        
-        # パラメータを構築
-        params = {
-            'key': api_key,
-            'format': 'json'
-        }
-        
-        # APIリクエストを送信
-        response = requests.get(base_url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        # JSONレスポンスを解析
-        data = response.json()
-        
-        # エラーチェック
-        if 'error' in data:
-            error_info = data['error']
-            return {
-                "error": f"ホットペッパーAPIエラー: {error_info.get('message', '不明なエラー')} (コード: {error_info.get('code', 'N/A')})",
-                "master_type": master_type,
-                "api_url": response.url
-            }
-        
-        if 'results' not in data:
-            return {
-                "error": "APIレスポンスの形式が正しくありません。",
-                "master_type": master_type,
-                "api_url": response.url
+                "supported_types": list(MASTER_TABLES.keys()) + list(MASTER_ALIASES.keys())
             }
         
         # マスターデータの種類に応じてデータを抽出
         if master_type == 'genre':
-            items = data['results'].get('genre', [])
             result_data = []
             for item in items:
                 result_data.append({
@@ -1657,9 +1433,7 @@ def get_hotpepper_master_data(master_type: str = "genre") -> dict:
                     'name': item.get('name', ''),
                     'category': item.get('category', {}).get('name', '')
                 })
-        elif master_type in ['large_area', 'middle_area', 'area']:
-            area_key = master_type.replace('_', '')
-            items = data['results'].get(area_key, [])
+        elif master_type in ['large_area', 'middle_area', 'small_area', 'area']:
             result_data = []
             for item in items:
                 result_data.append({
@@ -1669,7 +1443,6 @@ def get_hotpepper_master_data(master_type: str = "genre") -> dict:
                     'middle_area': item.get('middle_area', {}).get('name', '') if 'middle_area' in item else ''
                 })
         elif master_type == 'budget':
-            items = data['results'].get('budget', [])
             result_data = []
             for item in items:
                 result_data.append({
@@ -1678,7 +1451,6 @@ def get_hotpepper_master_data(master_type: str = "genre") -> dict:
                     'average': item.get('average', '')
                 })
         elif master_type == 'special':
-            items = data['results'].get('special', [])
             result_data = []
             for item in items:
                 result_data.append({
@@ -1687,7 +1459,6 @@ def get_hotpepper_master_data(master_type: str = "genre") -> dict:
                     'category': item.get('special_category', {}).get('name', '')
                 })
         elif master_type == 'credit_card':
-            items = data['results'].get('credit_card', [])
             result_data = []
             for item in items:
                 result_data.append({
@@ -1695,16 +1466,21 @@ def get_hotpepper_master_data(master_type: str = "genre") -> dict:
                     'name': item.get('name', '')
                 })
         else:
-            result_data = data['results']
+            result_data = items
         
         return {
             "master_type": master_type,
             "data": result_data,
             "total_count": len(result_data),
-            "api_url": response.url,
+            "fetched_at": datetime.datetime.fromtimestamp(store.fetched_at).isoformat(timespec="seconds"),
             "message": f"{master_type}マスターデータを{len(result_data)}件取得しました。"
         }
         
+    except HotPepperMasterError as e:
+        return {
+            "error": f"ホットペッパーAPIエラー: {str(e)}",
+            "master_type": master_type
+        }
     except requests.exceptions.RequestException as e:
         return {
             "error": f"ホットペッパーAPI通信エラー: {str(e)}",
@@ -1716,6 +1492,7 @@ def get_hotpepper_master_data(master_type: str = "genre") -> dict:
             "master_type": master_type
         }
 
+@dual_io
 def search_hotpepper_restaurants_by_name(restaurant_name: str) -> dict:
     """店名でホットペッパーグルメのレストランを検索するツール。
     
@@ -1738,7 +1515,7 @@ def search_hotpepper_restaurants_by_name(restaurant_name: str) -> dict:
         }
         
         # APIリクエストを送信
-        response = requests.get(base_url, params=params, timeout=10)
+        response = yield HttpCall("GET", base_url, params=params)
         response.raise_for_status()
         
         # JSONレスポンスを解析
@@ -1858,54 +1635,20 @@ def find_and_add_area_code(location: str, large_area_mapping: dict, middle_area_
         更新されたマッピング辞書と検索結果
     """
     try:
-        # APIキーを環境変数から取得
-        api_key = os.getenv("RECRUIT_API_KEY", "18c8f07145ccf2ad")
-        
-        # 小エリアマスターデータを取得
-        small_area_url = "https://webservice.recruit.co.jp/hotpepper/small_area/v1/"
-        params = {
-            'key': api_key,
-            'format': 'json'
-        }
-        
-        response = requests.get(small_area_url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        if 'error' in data:
-            return {
-                "error": f"エリアコード検索エラー: {data['error'].get('message', '不明なエラー')}",
-                "location": location,
-                "large_area_mapping": large_area_mapping,
-                "middle_area_mapping": middle_area_mapping
-            }
-        
-        if 'results' not in data or 'small_area' not in data['results']:
-            return {
-                "error": "エリアマスターデータの形式が正しくありません。",
-                "location": location,
-                "large_area_mapping": large_area_mapping,
-                "middle_area_mapping": middle_area_mapping
-            }
-        
-        small_areas = data['results']['small_area']
+        # 小エリアマスターはローカルキャッシュの索引から検索（線形走査・API呼び出しなし）
         found_areas = []
-        
-        # エリア名で部分一致検索
-        for area in small_areas:
-            area_name = area.get('name', '')
-            if location in area_name or area_name in location:
-                middle_area_info = area.get('middle_area', {})
-                large_area_info = middle_area_info.get('large_area', {})
-                
-                found_areas.append({
-                    'code': area.get('code', ''),  # 小エリアコード
-                    'name': area_name,
-                    'middle_area': middle_area_info.get('name', ''),
-                    'middle_area_code': middle_area_info.get('code', ''),  # 中エリアコード
-                    'large_area': large_area_info.get('name', ''),
-                    'large_area_code': large_area_info.get('code', '')  # 大エリアコード
-                })
+        for area in get_master_store().find("small_area", location):
+            middle_area_info = area.get('middle_area', {})
+            large_area_info = area.get('large_area') or middle_area_info.get('large_area', {})
+            
+            found_areas.append({
+                'code': area.get('code', ''),  # 小エリアコード
+                'name': area.get('name', ''),
+                'middle_area': middle_area_info.get('name', ''),
+                'middle_area_code': middle_area_info.get('code', ''),  # 中エリアコード
+                'large_area': large_area_info.get('name', ''),
+                'large_area_code': large_area_info.get('code', '')  # 大エリアコード
+            })
         
         # 見つかったエリアをマッピングに追加
         updated_large_area_mapping = large_area_mapping.copy()
@@ -1930,6 +1673,13 @@ def find_and_add_area_code(location: str, large_area_mapping: dict, middle_area_
             "location": location
         }
         
+    except HotPepperMasterError as e:
+        return {
+            "error": f"エリアコード検索エラー: {str(e)}",
+            "location": location,
+            "large_area_mapping": large_area_mapping,
+            "middle_area_mapping": middle_area_mapping
+        }
     except requests.exceptions.RequestException as e:
         return {
             "error": f"エリアコード検索通信エラー: {str(e)}",
@@ -1946,6 +1696,11 @@ def find_and_add_area_code(location: str, large_area_mapping: dict, middle_area_
         }
 
 
+def get_result_cache_stats() -> dict:
+    """検索結果キャッシュのツール毎のヒット・ミス数を返す（監視用）"""
+    return result_cache.stats()
+
+
 def generate_google_maps_url(location: str, restaurant_name: str = "") -> dict:
     """Googleマップで目的地を表示するURLを生成するツール。
     
@@ -2036,229 +1791,780 @@ def generate_directions_url(origin: str, destination: str, mode: str = "driving"
             "mode": mode
         }
 
-# 構造化出力を使用するスケジューラーエージェント用のモデル
-# scheduler_model = model.with_structured_output(ScheduleRequest)
-
-scheduler_agent = create_react_agent(
-    model=model,  # 通常のモデルを使用
-    tools=[add_to_google_calendar, get_current_time, calculate_target_date],
-    # name="scheduler_agent",
-    name="scheduler_expert",
-    prompt="""
-            You are a scheduler agent. Use Google Calendar to add events.
-
-            When a user asks to schedule something, you should:
-            1. FIRST, use get_current_time() to get the current time
-            2. Extract the event title and time from their request
-            3. If the user mentions relative dates (like "明日", "今日", "来週"), use calculate_target_date() to get the actual datetime
-            4. Use the calculated datetime with add_to_google_calendar tool
-
-            Examples:
-            - User: "明日の15時に会議を予定に入れて" 
-            → 1. get_current_time() to get current date
-            → 2. calculate_target_date(relative_date="明日", time_str="15時")
-            → 3. add_to_google_calendar(event="会議", time="[calculated_datetime]")
-
-            - User: "今日の14:30に歯医者の予約を入れて" 
-            → 1. get_current_time() to get current date
-            → 2. calculate_target_date(relative_date="今日", time_str="14:30")
-            → 3. add_to_google_calendar(event="歯医者の予約", time="[calculated_datetime]")
-
-            - User: "来週月曜日の10時に面接を予定に入れて" 
-            → 1. get_current_time() to get current date
-            → 2. calculate_target_date(relative_date="来週月曜日", time_str="10時")
-            → 3. add_to_google_calendar(event="面接", time="[calculated_datetime]")
-
-            ALWAYS start by calling get_current_time() to get the current date, then use calculate_target_date() for relative dates, and finally call add_to_google_calendar().
-            """
-)
+def as_tool(func):
+    """
+    非同期版（func.acall）を持つツールは同期版と合わせて1つのStructuredToolとして登録する
+    （invoke では同期版、ainvoke/astream ではイベントループ上で非同期版が実行される）
+    """
+    coroutine = getattr(func, "acall", None)
+    if coroutine is None:
+        return func
+    from langchain_core.tools import StructuredTool
+
+    return StructuredTool.from_function(func=func, coroutine=coroutine)
+
+# ツール毎のタイムアウト（秒）。未指定のツールは TOOL_TIMEOUT（既定30秒）
+TOOL_TIMEOUTS = {
+    "add": 5,
+    "multiply": 5,
+    "get_current_time": 5,
+    "calculate_target_date": 5,
+    "generate_google_maps_url": 5,
+    "generate_directions_url": 5,
+    "web_search": 20,
+    "add_to_google_calendar": 20,
+    "search_jalan_hotels": 45,
+    "search_airbnb_accommodations": 45,
+}
+
+def worker_tools(funcs, limits):
+    """
+    ワーカーエージェント用のツールを作成する
+    （1ターン内の複数のツール呼び出しは標準のToolNodeが並行実行する。各ツールにはタイムアウトと共通の同時実行数上限を付ける）
 
-math_agent = create_react_agent(
-    model=model,
-    tools=[add, multiply],
-    name="math_expert",
-    prompt="You are a math expert. Always use one tool at a time."
-)
+    Args:
+        funcs: ツール関数のタプル
+        limits: エージェント間で共有する ToolLimits
+    """
+    return [limits.wrap(as_tool(func)) for func in funcs]
 
-research_agent = create_react_agent(
-    model=model,
-    tools=[web_search, get_current_time],
-    name="research_expert",
-    prompt="You are a world class researcher with access to web search and current time. Do not do any math."
-)
+def build_agents(model=None):
+    """
+    専門ワーカーエージェントを構築する
 
-# 新しいエージェントの作成
-
-# 音楽エージェント
-music_agent = create_react_agent(
-    model=model,
-    tools=[search_spotify_tracks, get_spotify_playlist, search_spotify_artists, get_current_time],
-    name="music_expert",
-    prompt="""
-            You are a music expert with access to Spotify. You can search for tracks, artists, and playlists.
-
-            When users ask about music, you should:
-            1. Search for tracks using search_spotify_tracks()
-            2. Search for artists using search_spotify_artists()
-            3. Get playlist information using get_spotify_playlist()
-            4. Provide music recommendations and information
-
-            Examples:
-            - User: "ビートルズの曲を探して" → search_spotify_tracks(query="ビートルズ")
-            - User: "ビートルズのアーティスト情報を教えて" → search_spotify_artists(artist_name="ビートルズ")
-            - User: "人気のプレイリストを教えて" → get_spotify_playlist(playlist_id="37i9dQZEVXbMDoHDwVN2tF") # Global Top 50
-
-            Always provide helpful music recommendations and information. Include Spotify URLs when available.
-            """
-)
+    Args:
+        model: 使用するチャットモデル（省略時は get_model()）
+    Returns:
+        エージェント名 → エージェントのdict（スーパーバイザーに渡す順）
+    """
+    from langgraph.prebuilt import create_react_agent
 
-# 動画エージェント
-video_agent = create_react_agent(
-    model=model,
-    tools=[search_youtube_videos, get_video_info, get_current_time],
-    name="video_expert",
-    prompt="""
-            You are a video expert with access to YouTube. You can search for videos and get detailed information.
-
-            When users ask about videos, you should:
-            1. Search for videos using search_youtube_videos()
-            2. Get detailed video information using get_video_info()
-            3. Provide video recommendations and information
-
-            Examples:
-            - User: "料理の動画を探して" → search_youtube_videos(query="料理 レシピ")
-            - User: "この動画の詳細を教えて" → get_video_info(video_id="video_id")
-
-            Always provide helpful video recommendations and information.
-            """
-)
+    if model is None:
+        model = get_model()
+    # 同時実行数の上限は全ワーカーエージェントで共有する
+    limits = ToolLimits(timeouts=TOOL_TIMEOUTS)
 
-# 旅行エージェント
-travel_agent = create_react_agent(
-    model=model,
-    tools=[search_jalan_hotels, search_airbnb_accommodations, get_current_time],
-    name="travel_expert",
-    prompt="""
-            You are a travel expert with access to hotel and accommodation booking services through web scraping.
-
-            When users ask about travel accommodations, you should:
-            1. Search for hotels using search_jalan_hotels() - scrapes Jalan.net for real hotel data
-            2. Search for Airbnb accommodations using search_airbnb_accommodations() - scrapes Airbnb.com for real accommodation data
-            3. Provide travel recommendations and booking information
-
-            Examples:
-            - User: "東京のホテルを明日から2泊で探して" 
-            → search_jalan_hotels(location="東京", check_in="2024-12-20", check_out="2024-12-22", guests=2)
-            - User: "大阪のAirbnbを来週から3泊で探して" 
-            → search_airbnb_accommodations(location="大阪", check_in="2024-12-25", check_out="2024-12-28", guests=2)
-
-            The tools perform real web scraping to get current hotel and accommodation information, including:
-            - Real prices and availability
-            - Actual hotel/accommodation names
-            - Current ratings and reviews
-            - Direct booking URLs
-            - Amenities and features
-
-            Always provide helpful travel recommendations and accommodation options based on the scraped data.
-            """
-)
+    # 構造化出力を使用するスケジューラーエージェント用のモデル
+    # scheduler_model = model.with_structured_output(ScheduleRequest)
 
-# レストランエージェント
-restaurant_agent = create_react_agent(
-    model=model,
-    tools=[search_hotpepper_restaurants, search_hotpepper_restaurants_by_name, get_hotpepper_master_data, search_google_maps_restaurants, check_restaurant_availability, generate_google_maps_url, generate_directions_url, get_current_time],
-    name="restaurant_expert",
-    prompt="""
-            You are a restaurant expert with access to comprehensive restaurant search and booking services.
-
-            When users ask about restaurants, you should:
-            1. Search for restaurants using search_hotpepper_restaurants() - uses real HotPepper Gourmet API with accurate area codes and genre codes
-            2. Search for specific restaurants by name using search_hotpepper_restaurants_by_name() - for exact restaurant searches
-            3. Get master data using get_hotpepper_master_data() - to get available genres, areas, budgets, and special features
-            4. Search for restaurants using search_google_maps_restaurants() - uses Google Places API for additional results
-            5. Check restaurant availability using check_restaurant_availability() - for booking information
-            6. Generate Google Maps URLs using generate_google_maps_url() for location access
-            7. Generate directions URLs using generate_directions_url() for route planning
-
-            Examples:
-            - User: "渋谷のイタリアンを探して" → search_hotpepper_restaurants(location="渋谷", cuisine="イタリアン")
-            - User: "新宿の3000円以下のレストランを探して" → search_hotpepper_restaurants(location="新宿", budget="3000円以下")
-            - User: "〇〇レストランの情報を教えて" → search_hotpepper_restaurants_by_name(restaurant_name="〇〇レストラン")
-            - User: "利用可能なジャンルを教えて" → get_hotpepper_master_data(master_type="genre")
-            - User: "東京のエリアを教えて" → get_hotpepper_master_data(master_type="large_area")
-            - User: "このレストランの予約状況を確認して" → check_restaurant_availability(restaurant_name="レストラン名", date="2024-12-20", time="19:00")
-            - User: "このレストランの場所を教えて" → generate_google_maps_url(location="東京都渋谷区1-1-1", restaurant_name="レストラン名")
-            - User: "東京駅からこのレストランへの行き方を教えて" → generate_directions_url(origin="東京駅", destination="レストラン名", mode="transit")
-
-            IMPORTANT: Always include Google Maps access URLs in your responses when presenting restaurant information. Each restaurant should have:
-            - google_maps_url: Direct link to the restaurant location on Google Maps
-            - directions_url: Route planning from the nearest station to the restaurant
-
-            This helps users easily navigate to the restaurants you recommend.
-
-            ERROR HANDLING: If the HotPepper API returns an error or no results:
-            1. The system automatically tries a fallback search using keyword-based search
-            2. If still no results, it provides helpful suggestions and alternative search methods
-            3. Always explain what happened and suggest alternative approaches (e.g., try different areas, cuisines, or use Google Maps search)
-
-            The HotPepper API provides comprehensive restaurant data including:
-            - Actual restaurant names and locations with precise area codes
-            - Real prices and ratings with accurate budget codes
-            - Current opening hours and contact information
-            - Direct booking URLs and coupon information
-            - Detailed amenities and features (Wi-Fi, parking, private rooms, etc.)
-            - Credit card acceptance information
-            - Special features and categories
-            - High-quality photos and logos
-
-            The API supports:
-            - Large area codes (Z011-Z050 for all prefectures)
-            - Middle area codes (Z011001-Z011152 for detailed Tokyo areas)
-            - Genre codes (G001-G012 for all cuisine types)
-            - Budget codes (B001-B014 for all price ranges)
-            - Special feature codes (LT0004-LT0086 for various occasions)
-            - Credit card codes (c01-c10 for different card types)
-
-            Always provide helpful restaurant recommendations and availability information based on the real API data, and use the appropriate search parameters for the best results.
-            """
-)
+    scheduler_agent = create_react_agent(
+        model=model,  # 通常のモデルを使用
+        tools=worker_tools((add_to_google_calendar, get_current_time, calculate_target_date), limits),
+        # name="scheduler_agent",
+        name="scheduler_expert",
+        prompt="""
+                You are a scheduler agent. Use Google Calendar to add events.
+
+                When a user asks to schedule something, you should:
+                1. FIRST, use get_current_time() to get the current time
+                2. Extract the event title and time from their request
+                3. If the user mentions relative dates (like "明日", "今日", "来週"), use calculate_target_date() to get the actual datetime
+                4. Use the calculated datetime with add_to_google_calendar tool
+
+                Examples:
+                - User: "明日の15時に会議を予定に入れて" 
+                → 1. get_current_time() to get current date
+                → 2. calculate_target_date(relative_date="明日", time_str="15時")
+                → 3. add_to_google_calendar(event="会議", time="[calculated_datetime]")
+
+                - User: "今日の14:30に歯医者の予約を入れて" 
+                → 1. get_current_time() to get current date
+                → 2. calculate_target_date(relative_date="今日", time_str="14:30")
+                → 3. add_to_google_calendar(event="歯医者の予約", time="[calculated_datetime]")
+
+                - User: "来週月曜日の10時に面接を予定に入れて" 
+                → 1. get_current_time() to get current date
+                → 2. calculate_target_date(relative_date="来週月曜日", time_str="10時")
+                → 3. add_to_google_calendar(event="面接", time="[calculated_datetime]")
+
+                ALWAYS start by calling get_current_time() to get the current date, then use calculate_target_date() for relative dates, and finally call add_to_google_calendar().
+                """
+    )
 
-# 構造化出力を使用するスーパーバイザー用のモデル
-# supervisor_model = model.with_structured_output(WorkflowState)
-
-# Create supervisor workflow
-workflow = create_supervisor(
-    agents=[research_agent, math_agent, scheduler_agent, music_agent, video_agent, travel_agent, restaurant_agent],
-    model=model,  # 通常のモデルを使用
-    tools=[get_current_time],
-    prompt=(
-        "You are a team supervisor managing multiple expert agents:\n"
-        "- research_agent: For current events and research\n"
-        "- math_agent: For mathematical calculations\n"
-        "- scheduler_agent: For scheduling and calendar management\n"
-        "- music_expert: For music recommendations and Spotify searches\n"
-        "- video_expert: For video recommendations and YouTube searches\n"
-        "- travel_expert: For travel accommodations (hotels, Airbnb)\n"
-        "- restaurant_expert: For restaurant searches and reservations\n\n"
-        
-        "You should get the current time first, then assign the appropriate agent based on the user's request:\n"
-        "- Music, songs, playlists → music_expert\n"
-        "- Videos, YouTube, streaming → video_expert\n"
-        "- Travel, hotels, accommodations → travel_expert\n"
-        "- Restaurants, dining, food → restaurant_expert\n"
-        "- Scheduling, calendar → scheduler_agent\n"
-        "- Math, calculations → math_agent\n"
-        "- News, research, information → research_agent"
-    ),
-    output_mode="full_history"
-)
+    math_agent = create_react_agent(
+        model=model,
+        tools=worker_tools((add, multiply), limits),
+        name="math_expert",
+        prompt="You are a math expert. Always use one tool at a time."
+    )
+
+    research_agent = create_react_agent(
+        model=model,
+        tools=worker_tools((web_search, get_current_time), limits),
+        name="research_expert",
+        prompt="You are a world class researcher with access to web search and current time. Do not do any math."
+    )
+
+    # 新しいエージェントの作成
+
+    # 音楽エージェント
+    music_agent = create_react_agent(
+        model=model,
+        tools=worker_tools((search_spotify_tracks, get_spotify_playlist, search_spotify_artists, get_current_time), limits),
+        name="music_expert",
+        prompt="""
+                You are a music expert with access to Spotify. You can search for tracks, artists, and playlists.
+
+                When users ask about music, you should:
+                1. Search for tracks using search_spotify_tracks()
+                2. Search for artists using search_spotify_artists()
+                3. Get playlist information using get_spotify_playlist()
+                4. Provide music recommendations and information
+
+                Examples:
+                - User: "ビートルズの曲を探して" → search_spotify_tracks(query="ビートルズ")
+                - User: "ビートルズのアーティスト情報を教えて" → search_spotify_artists(artist_name="ビートルズ")
+                - User: "人気のプレイリストを教えて" → get_spotify_playlist(playlist_id="37i9dQZEVXbMDoHDwVN2tF") # Global Top 50
+
+                Always provide helpful music recommendations and information. Include Spotify URLs when available.
+                """
+    )
 
-# Compile and run
-app = workflow.compile()
+    # 動画エージェント
+    video_agent = create_react_agent(
+        model=model,
+        tools=worker_tools((search_youtube_videos, get_video_info, get_current_time), limits),
+        name="video_expert",
+        prompt="""
+                You are a video expert with access to YouTube. You can search for videos and get detailed information.
+
+                When users ask about videos, you should:
+                1. Search for videos using search_youtube_videos()
+                2. Get detailed video information using get_video_info()
+                3. Provide video recommendations and information
+
+                Examples:
+                - User: "料理の動画を探して" → search_youtube_videos(query="料理 レシピ")
+                - User: "この動画の詳細を教えて" → get_video_info(video_id="video_id")
+
+                Always provide helpful video recommendations and information.
+                """
+    )
+
+    # 旅行エージェント
+    travel_agent = create_react_agent(
+        model=model,
+        tools=worker_tools((search_jalan_hotels, search_airbnb_accommodations, get_current_time), limits),
+        name="travel_expert",
+        prompt="""
+                You are a travel expert with access to hotel and accommodation booking services through web scraping.
+
+                When users ask about travel accommodations, you should:
+                1. Search for hotels using search_jalan_hotels() - scrapes Jalan.net for real hotel data
+                2. Search for Airbnb accommodations using search_airbnb_accommodations() - scrapes Airbnb.com for real accommodation data
+                3. Provide travel recommendations and booking information
+
+                Examples:
+                - User: "東京のホテルを明日から2泊で探して" 
+                → search_jalan_hotels(location="東京", check_in="2024-12-20", check_out="2024-12-22", guests=2)
+                - User: "大阪のAirbnbを来週から3泊で探して" 
+                → search_airbnb_accommodations(location="大阪", check_in="2024-12-25", check_out="2024-12-28", guests=2)
+
+                The tools perform real web scraping to get current hotel and accommodation information, including:
+                - Real prices and availability
+                - Actual hotel/accommodation names
+                - Current ratings and reviews
+                - Direct booking URLs
+                - Amenities and features
+
+                Always provide helpful travel recommendations and accommodation options based on the scraped data.
+                """
+    )
+
+    # レストランエージェント
+    restaurant_agent = create_react_agent(
+        model=model,
+        tools=worker_tools((search_hotpepper_restaurants, search_hotpepper_restaurants_by_name, get_hotpepper_master_data, search_google_maps_restaurants, check_restaurant_availability, generate_google_maps_url, generate_directions_url, get_current_time), limits),
+        name="restaurant_expert",
+        prompt="""
+                You are a restaurant expert with access to comprehensive restaurant search and booking services.
+
+                When users ask about restaurants, you should:
+                1. Search for restaurants using search_hotpepper_restaurants() - uses real HotPepper Gourmet API with accurate area codes and genre codes
+                2. Search for specific restaurants by name using search_hotpepper_restaurants_by_name() - for exact restaurant searches
+                3. Get master data using get_hotpepper_master_data() - to get available genres, areas, budgets, and special features
+                4. Search for restaurants using search_google_maps_restaurants() - uses Google Places API for additional results
+                5. Check restaurant availability using check_restaurant_availability() - for booking information
+                6. Generate Google Maps URLs using generate_google_maps_url() for location access
+                7. Generate directions URLs using generate_directions_url() for route planning
+
+                Examples:
+                - User: "渋谷のイタリアンを探して" → search_hotpepper_restaurants(location="渋谷", cuisine="イタリアン")
+                - User: "新宿の3000円以下のレストランを探して" → search_hotpepper_restaurants(location="新宿", budget="3000円以下")
+                - User: "〇〇レストランの情報を教えて" → search_hotpepper_restaurants_by_name(restaurant_name="〇〇レストラン")
+                - User: "利用可能なジャンルを教えて" → get_hotpepper_master_data(master_type="genre")
+                - User: "東京のエリアを教えて" → get_hotpepper_master_data(master_type="large_area")
+                - User: "このレストランの予約状況を確認して" → check_restaurant_availability(restaurant_name="レストラン名", date="2024-12-20", time="19:00")
+                - User: "このレストランの場所を教えて" → generate_google_maps_url(location="東京都渋谷区1-1-1", restaurant_name="レストラン名")
+                - User: "東京駅からこのレストランへの行き方を教えて" → generate_directions_url(origin="東京駅", destination="レストラン名", mode="transit")
+
+                IMPORTANT: Always include Google Maps access URLs in your responses when presenting restaurant information. Each restaurant should have:
+                - google_maps_url: Direct link to the restaurant location on Google Maps
+                - directions_url: Route planning from the nearest station to the restaurant
+
+                This helps users easily navigate to the restaurants you recommend.
+
+                ERROR HANDLING: If the HotPepper API returns an error or no results:
+                1. The system automatically tries a fallback search using keyword-based search
+                2. If still no results, it provides helpful suggestions and alternative search methods
+                3. Always explain what happened and suggest alternative approaches (e.g., try different areas, cuisines, or use Google Maps search)
+
+                The HotPepper API provides comprehensive restaurant data including:
+                - Actual restaurant names and locations with precise area codes
+                - Real prices and ratings with accurate budget codes
+                - Current opening hours and contact information
+                - Direct booking URLs and coupon information
+                - Detailed amenities and features (Wi-Fi, parking, private rooms, etc.)
+                - Credit card acceptance information
+                - Special features and categories
+                - High-quality photos and logos
+
+                The API supports:
+                - Large area codes (Z011-Z050 for all prefectures)
+                - Middle area codes (Z011001-Z011152 for detailed Tokyo areas)
+                - Genre codes (G001-G012 for all cuisine types)
+                - Budget codes (B001-B014 for all price ranges)
+                - Special feature codes (LT0004-LT0086 for various occasions)
+                - Credit card codes (c01-c10 for different card types)
+
+                Always provide helpful restaurant recommendations and availability information based on the real API data, and use the appropriate search parameters for the best results.
+                """
+    )
+
+    return {
+        "research_expert": research_agent,
+        "math_expert": math_agent,
+        "scheduler_expert": scheduler_agent,
+        "music_expert": music_agent,
+        "video_expert": video_agent,
+        "travel_expert": travel_agent,
+        "restaurant_expert": restaurant_agent,
+    }
 
-graph_image = app.get_graph(xray=True).draw_mermaid_png()
-with open("workflow.png", "wb") as f:
-    f.write(graph_image)
+def build_app(model=None, agents=None):
+    """
+    スーパーバイザーを構築し、コンパイル済みグラフを返す
+
+    Args:
+        model: 使用するチャットモデル（省略時は get_model()）
+        agents: build_agents() の結果（省略時は新たに構築）
+    Returns:
+        コンパイル済みのLangGraphアプリ
+    """
+    from langgraph_supervisor import create_supervisor
+
+    if model is None:
+        model = get_model()
+    if agents is None:
+        agents = build_agents(model)
+
+    # 構造化出力を使用するスーパーバイザー用のモデル
+    # supervisor_model = model.with_structured_output(WorkflowState)
+
+    # Create supervisor workflow
+    workflow = create_supervisor(
+        agents=list(agents.values()),
+        model=model,  # 通常のモデルを使用
+        tools=[get_current_time],
+        prompt=(
+            "You are a team supervisor managing multiple expert agents:\n"
+            "- research_agent: For current events and research\n"
+            "- math_agent: For mathematical calculations\n"
+            "- scheduler_agent: For scheduling and calendar management\n"
+            "- music_expert: For music recommendations and Spotify searches\n"
+            "- video_expert: For video recommendations and YouTube searches\n"
+            "- travel_expert: For travel accommodations (hotels, Airbnb)\n"
+            "- restaurant_expert: For restaurant searches and reservations\n\n"
+        
+            "You should get the current time first, then assign the appropriate agent based on the user's request:\n"
+            "- Music, songs, playlists → music_expert\n"
+            "- Videos, YouTube, streaming → video_expert\n"
+            "- Travel, hotels, accommodations → travel_expert\n"
+            "- Restaurants, dining, food → restaurant_expert\n"
+            "- Scheduling, calendar → scheduler_agent\n"
+            "- Math, calculations → math_agent\n"
+            "- News, research, information → research_agent"
+        ),
+        output_mode="full_history"
+    )
+
+    return workflow.compile()
+
+def get_agents():
+    """ワーカーエージェントを初回使用時に構築し、以降は再利用する"""
+    global _agents
+    if _agents is None:
+        model = get_model()
+        with _agents_lock:
+            if _agents is None:
+                _agents = build_agents(model)
+    return _agents
+
+def get_app():
+    """コンパイル済みスーパーバイザーグラフを初回使用時に構築し、以降は再利用する"""
+    global _app
+    if _app is None:
+        model = get_model()
+        agents = get_agents()
+        with _app_lock:
+            if _app is None:
+                _app = build_app(model, agents)
+    return _app
+
+# 事前ルーターの意図 → ワーカーエージェント名
+WORKER_AGENTS = {
+    "music": "music_expert",
+    "video": "video_expert",
+    "travel": "travel_expert",
+    "restaurant": "restaurant_expert",
+    "scheduler": "scheduler_expert",
+    "math": "math_expert",
+    "research": "research_expert",
+}
+
+def _last_user_text(messages):
+    for msg in reversed(messages):
+        role = msg.get("role") if isinstance(msg, dict) else getattr(msg, "type", None)
+        if role in ("user", "human"):
+            content = msg.get("content") if isinstance(msg, dict) else msg.content
+            if isinstance(content, list):
+                return "".join(c.get("text", "") if isinstance(c, dict) else str(c) for c in content)
+            return str(content or "")
+    return ""
+
+# プランナーに示すワーカーエージェントの担当範囲
+AGENT_DESCRIPTIONS = {
+    "research_expert": "ニュース・調べもの（Web検索）",
+    "math_expert": "計算",
+    "scheduler_expert": "Googleカレンダーへの予定登録",
+    "music_expert": "音楽・曲・プレイリスト（Spotify）",
+    "video_expert": "動画（YouTube）",
+    "travel_expert": "ホテル・民泊などの宿泊先（じゃらん・Airbnb）",
+    "restaurant_expert": "レストラン・飲食店（ホットペッパー・Googleマップ）",
+}
+
+PLANNER_PROMPT = """あなたはユーザーの依頼を、専門エージェントに並行して任せられる独立したサブタスクに分割するプランナーです。
+
+利用できるエージェント:
+{agents}
+
+ルール:
+- 依頼に含まれる独立した要件ごとに1つのサブタスクを作り、最も適したエージェントを1つ割り当てる
+- 各サブタスクの依頼文には、場所・日付・人数など元の依頼の文脈を補い、単独で理解できるようにする（例:「近くのホテル」→「渋谷周辺のホテル」）
+- あるサブタスクが別のサブタスクの結果を必要とする場合や、要件が1つだけの場合は subtasks を空にする
+"""
+
+SYNTHESIZER_PROMPT = """ユーザーの依頼に対して、複数の専門エージェントが分担して回答しました。
+各エージェントの回答を統合し、依頼の順序に沿った1つの回答にまとめてください。
+URLや店名・曲名などの具体的な情報は省略せずに残し、エラーになった部分はその旨を簡潔に伝えてください。
+"""
+
+def _message_text(message):
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+    if isinstance(content, list):
+        return "".join(c.get("text", "") if isinstance(c, dict) else str(c) for c in content)
+    return str(content or "")
+
+def make_planner(model, agent_names):
+    """
+    複合的な依頼を独立したサブタスクに分割するプランナーを作成する
+
+    Args:
+        model: 使用するチャットモデル
+        agent_names: 割り当て可能なエージェント名
+    Returns:
+        request → [{"agent": ..., "task": ...}, ...] の関数（分割しない場合は空リスト）
+    """
+    planner_model = model.with_structured_output(TaskPlan)
+    prompt = PLANNER_PROMPT.format(
+        agents="\n".join(f"- {name}: {AGENT_DESCRIPTIONS.get(name, name)}" for name in agent_names)
+    )
+
+    def plan(request):
+        result = planner_model.invoke([
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": request},
+        ])
+        return [
+            {"agent": subtask.agent, "task": subtask.task}
+            for subtask in result.subtasks
+            if subtask.agent in agent_names
+        ]
+
+    return plan
+
+def make_synthesizer(model):
+    """
+    サブタスクの結果を1つの回答に統合する関数を作成する
+
+    Args:
+        model: 使用するチャットモデル
+    Returns:
+        (request, results) → 回答テキスト の関数
+    """
+    def synthesize(request, results):
+        answers = "\n\n".join(
+            f"## {result['agent']}\n依頼: {result['task']}\n回答:\n{result['answer']}" for result in results
+        )
+        response = model.invoke([
+            {"role": "system", "content": SYNTHESIZER_PROMPT},
+            {"role": "user", "content": f"依頼: {request}\n\n{answers}"},
+        ])
+        return _message_text(response)
+
+    return synthesize
+
+def build_parallel_app(model=None, agents=None, supervisor=None, planner=None, synthesizer=None):
+    """
+    プランナー/並行実行モードのグラフを構築する
+
+    plan → (Sendで各サブタスクを並行ブランチとして) run_subtask → synthesize の順に実行する。
+    サブタスクが2つ未満の依頼は従来のスーパーバイザーに任せる。
+
+    Args:
+        model: 使用するチャットモデル（省略時は get_model()）
+        agents: build_agents() の結果（省略時は get_agents()）
+        supervisor: 分割しない依頼を処理するグラフ（省略時は get_app()）
+        planner: request → サブタスクのリスト（省略時は make_planner()）
+        synthesizer: (request, results) → 回答（省略時は make_synthesizer()）
+    Returns:
+        コンパイル済みのLangGraphアプリ
+    """
+    import operator
+    from typing import Annotated, TypedDict
+
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import END, START, StateGraph
+    from langgraph.graph.message import add_messages
+    from langgraph.types import Send
+
+    if agents is None:
+        agents = get_agents()
+    if supervisor is None:
+        supervisor = get_app()
+    if planner is None or synthesizer is None:
+        if model is None:
+            model = get_model()
+        planner = planner or make_planner(model, list(agents))
+        synthesizer = synthesizer or make_synthesizer(model)
+
+    class ParallelState(TypedDict, total=False):
+        messages: Annotated[list, add_messages]
+        subtasks: list
+        # 並行ブランチの結果は完了順に追加されるため、統合時にindexで並べ直す
+        results: Annotated[list, operator.add]
+
+    def plan(state):
+        return {"subtasks": planner(_last_user_text(state["messages"]))}
+
+    def dispatch(state):
+        subtasks = state.get("subtasks") or []
+        if len(subtasks) < 2:
+            return "supervisor"
+        return [
+            Send("run_subtask", {"index": index, **subtask})
+            for index, subtask in enumerate(subtasks)
+        ]
+
+    def _subtask_config(payload, config):
+        # 並行ブランチの名前空間にはエージェント名が含まれないため、ストリーミング用にメタデータで渡す
+        return {**config, "metadata": {**(config.get("metadata") or {}), "worker_agent": payload["agent"]}}
+
+    def _subtask_result(payload, output=None, error=None):
+        answer = _message_text(output["messages"][-1]) if output else f"エラー: {error}"
+        return {"results": [{**payload, "answer": answer}]}
+
+    def run_subtask(payload, config):
+        try:
+            output = agents[payload["agent"]].invoke(
+                {"messages": [{"role": "user", "content": payload["task"]}]}, _subtask_config(payload, config)
+            )
+        except Exception as e:
+            return _subtask_result(payload, error=e)
+        return _subtask_result(payload, output)
+
+    async def arun_subtask(payload, config):
+        try:
+            output = await agents[payload["agent"]].ainvoke(
+                {"messages": [{"role": "user", "content": payload["task"]}]}, _subtask_config(payload, config)
+            )
+        except Exception as e:
+            return _subtask_result(payload, error=e)
+        return _subtask_result(payload, output)
+
+    def synthesize(state):
+        results = sorted(state["results"], key=lambda result: result["index"])
+        answer = synthesizer(_last_user_text(state["messages"]), results)
+        return {"messages": [{"role": "assistant", "content": answer, "name": "synthesizer"}]}
+
+    graph = StateGraph(ParallelState)
+    graph.add_node("plan", plan)
+    graph.add_node("run_subtask", RunnableLambda(run_subtask, afunc=arun_subtask))
+    graph.add_node("synthesize", synthesize)
+    graph.add_node("supervisor", supervisor)
+    graph.add_edge(START, "plan")
+    graph.add_conditional_edges("plan", dispatch, ["run_subtask", "supervisor"])
+    graph.add_edge("run_subtask", "synthesize")
+    graph.add_edge("synthesize", END)
+    graph.add_edge("supervisor", END)
+    return graph.compile()
+
+def get_parallel_app():
+    """プランナー/並行実行モードのグラフを初回使用時に構築し、以降は再利用する"""
+    global _parallel_app
+    if _parallel_app is None:
+        model = get_model()
+        agents = get_agents()
+        supervisor = get_app()
+        with _parallel_app_lock:
+            if _parallel_app is None:
+                _parallel_app = build_parallel_app(model, agents, supervisor)
+    return _parallel_app
+
+def parallel_mode_enabled():
+    """SUPERVISOR_MODE=parallel のとき、複合的に見える依頼をプランナー/並行実行モードで処理する"""
+    return os.getenv("SUPERVISOR_MODE", "sequential").lower() == "parallel"
+
+def _select_app(messages):
+    """
+    事前ルーターの判定に従って、依頼を処理するグラフ（またはワーカーエージェント）を選ぶ
+
+    プランナーはLLMを1往復余分に呼ぶため、キーワード規則が複数の意図を検出した依頼だけに使い、
+    単一の意図や挨拶などはそのままスーパーバイザーに任せる。
+    """
+    text = _last_user_text(messages)
+    decision = get_pre_router().route(text) if pre_router_enabled() else None
+    if decision is not None and decision.bypass:
+        return get_agents()[WORKER_AGENTS[decision.intent]], decision
+    if parallel_mode_enabled() and (decision or get_pre_router().route(text)).compound:
+        return get_parallel_app(), decision
+    return get_app(), decision
+
+def invoke_agent(messages):
+    """
+    事前ルーターで意図が明らかな依頼はワーカーエージェントへ直接送り、
+    それ以外はスーパーバイザー（LLMによるルーティング）で処理する
+    （SUPERVISOR_MODE=parallel のときは複合的な依頼をサブタスクに分割して並行実行する）
+
+    Args:
+        messages: [{'role': 'user', 'content': '...'}, ...] のリスト
+    Returns:
+        エージェントの実行結果（"pre_route" に振り分け結果を付与）
+    """
+    app, decision = _select_app(messages)
+    result = app.invoke({"messages": messages})
+    if isinstance(result, dict) and decision is not None:
+        result["pre_route"] = decision._asdict()
+    return result
+
+async def ainvoke_agent(messages):
+    """
+    invoke_agent() の非同期版（ネットワークツールはイベントループ上で並行に実行される）
+
+    Args:
+        messages: [{'role': 'user', 'content': '...'}, ...] のリスト
+    Returns:
+        エージェントの実行結果（"pre_route" に振り分け結果を付与）
+    """
+    app, decision = _select_app(messages)
+    result = await app.ainvoke({"messages": messages})
+    if isinstance(result, dict) and decision is not None:
+        result["pre_route"] = decision._asdict()
+    return result
+
+def _namespace_agent(namespace, default="supervisor"):
+    # subgraphs=True の名前空間（("music_expert:<task_id>", ...)）からエージェント名を取り出す
+    for part in reversed(namespace):
+        name = part.split(":", 1)[0]
+        if name in AGENT_DESCRIPTIONS:
+            return name
+    return default
+
+class AgentStream:
+    """
+    app.stream/astream(stream_mode=["messages", "updates", "values"], subgraphs=True) のチャンクを
+    表示用のイベント（dict）に変換する
+
+    イベントの "type":
+        token: LLMのトークン（"agent", "text"）
+        handoff: エージェント間の引き継ぎ（"agent" は引き継ぎ先）
+        tool_result: ワーカーのツールの実行結果（"agent", "name", "content"）
+        plan / subtask_done: プランナー/並行実行モードの分割結果と各サブタスクの完了
+        done: 最終状態（"result"）、最初のトークンまでの時間（"ttft_ms"）、全体の時間
+    すべてのイベントに開始からの経過時間 "elapsed_ms" が付く
+    """
+
+    STREAM_MODE = ["messages", "updates", "values"]
+
+    def __init__(self, decision=None):
+        self.decision = decision
+        # 事前ルーターでワーカーへ直接送った場合は、最上位のグラフがそのワーカー
+        bypass = decision is not None and decision.bypass
+        self.root_agent = WORKER_AGENTS[decision.intent] if bypass else "supervisor"
+        self.started = time.perf_counter()
+        self.ttft_ms = None
+        self.result = None
+        self._seen = set()
+        # 名前空間の要素 → エージェント名（メタデータから分かったもの）
+        self._namespace_agents = {}
+
+    def _agent(self, namespace):
+        for part in reversed(namespace):
+            if part in self._namespace_agents:
+                return self._namespace_agents[part]
+        return _namespace_agent(namespace, self.root_agent)
+
+    def _event(self, type, **fields):
+        return {"type": type, "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1), **fields}
+
+    def feed(self, namespace, mode, chunk):
+        """1チャンクを0個以上のイベントに変換する"""
+        if mode == "values":
+            # 最上位グラフの最後の状態が invoke() の結果に相当する
+            if not namespace:
+                self.result = chunk
+            return []
+        if mode == "messages":
+            message, metadata = chunk
+            if getattr(message, "type", None) != "AIMessageChunk":
+                return []
+            named = metadata.get("worker_agent") or metadata.get("lc_agent_name")
+            if named and namespace:
+                self._namespace_agents[namespace[-1]] = named
+            text = _message_text(message)
+            if not text:
+                return []
+            agent = named or self._agent(namespace)
+            event = self._event("token", agent=agent, text=text)
+            if self.ttft_ms is None:
+                self.ttft_ms = event["elapsed_ms"]
+            return [event]
+        events = []
+        for node, update in (chunk or {}).items():
+            if not isinstance(update, dict):
+                continue
+            if node == "plan" and update.get("subtasks"):
+                events.append(self._event("plan", subtasks=update["subtasks"]))
+            elif node == "run_subtask":
+                for result in update.get("results", []):
+                    events.append(self._event("subtask_done", agent=result["agent"], task=result["task"]))
+            agent = self._agent(namespace)
+            for message in update.get("messages") or []:
+                # full_history の更新には以前のメッセージも含まれるため、ツール結果は最初の1回だけ扱う
+                if getattr(message, "type", None) != "tool" or message.tool_call_id in self._seen:
+                    continue
+                self._seen.add(message.tool_call_id)
+                name = message.name or ""
+                if name.startswith("transfer_back_to_"):
+                    events.append(self._event("handoff", agent=name[len("transfer_back_to_"):], source=node))
+                elif name.startswith("transfer_to_"):
+                    events.append(self._event("handoff", agent=name[len("transfer_to_"):], source=agent))
+                else:
+                    events.append(self._event("tool_result", agent=agent, name=name, content=_message_text(message)))
+        return events
+
+    def done(self):
+        """最後のイベント（最終状態と所要時間）"""
+        result = self.result if isinstance(self.result, dict) else {}
+        if self.decision is not None:
+            result["pre_route"] = self.decision._asdict()
+        return self._event("done", result=result, ttft_ms=self.ttft_ms)
+
+def stream_agent(messages):
+    """
+    invoke_agent() のストリーミング版。トークン・引き継ぎ・ツール結果を逐次イベントとして返す
+
+    Args:
+        messages: [{'role': 'user', 'content': '...'}, ...] のリスト
+    Yields:
+        AgentStream のイベント（最後は "done"）
+    """
+    app, decision = _select_app(messages)
+    stream = AgentStream(decision)
+    for namespace, mode, chunk in app.stream(
+        {"messages": messages}, stream_mode=AgentStream.STREAM_MODE, subgraphs=True
+    ):
+        yield from stream.feed(namespace, mode, chunk)
+    yield stream.done()
+
+async def astream_agent(messages):
+    """
+    stream_agent() の非同期版（app.astream を使用）
+
+    Args:
+        messages: [{'role': 'user', 'content': '...'}, ...] のリスト
+    Yields:
+        AgentStream のイベント（最後は "done"）
+    """
+    app, decision = _select_app(messages)
+    stream = AgentStream(decision)
+    async for namespace, mode, chunk in app.astream(
+        {"messages": messages}, stream_mode=AgentStream.STREAM_MODE, subgraphs=True
+    ):
+        for event in stream.feed(namespace, mode, chunk):
+            yield event
+    yield stream.done()
+
+def print_agent_stream(messages):
+    """
+    stream_agent() のイベントをターミナルに逐次表示し、最終結果を返す（CLI用）
+
+    Args:
+        messages: [{'role': 'user', 'content': '...'}, ...] のリスト
+    Returns:
+        invoke_agent() と同じ形式の最終結果
+    """
+    speaker = None
+    for event in stream_agent(messages):
+        kind = event["type"]
+        seconds = event["elapsed_ms"] / 1000
+        if kind == "token":
+            if event["agent"] != speaker:
+                if speaker is not None:
+                    print()
+                speaker = event["agent"]
+                print(f"[{speaker}] ", end="", flush=True)
+            print(event["text"], end="", flush=True)
+            continue
+        if speaker is not None:
+            # 表示中のトークン行を閉じる
+            print()
+            speaker = None
+        if kind == "handoff":
+            print(f"→ {event['source']} から {event['agent']} に引き継ぎ ({seconds:.1f}s)")
+        elif kind == "tool_result":
+            content = event["content"].replace("\n", " ")
+            print(f"  ツール {event['agent']}.{event['name']}: {content[:120]}{'…' if len(content) > 120 else ''} ({seconds:.1f}s)")
+        elif kind == "plan":
+            print("計画: " + " / ".join(f"{subtask['agent']}: {subtask['task']}" for subtask in event["subtasks"]))
+        elif kind == "subtask_done":
+            print(f"  {event['agent']} 完了 ({seconds:.1f}s)")
+        elif kind == "done":
+            ttft = "-" if event["ttft_ms"] is None else f"{event['ttft_ms'] / 1000:.2f}s"
+            print(f"\n最初のトークンまで: {ttft} / 全体: {seconds:.2f}s")
+            return event["result"]
+
+def __getattr__(name):
+    # 既存の `from supervisor_workers_multiagents import app` との互換（アクセス時に構築）
+    if name == "app":
+        return get_app()
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def draw_graph(path="workflow.png"):
+    """
+    スーパーバイザーグラフのMermaid図をPNGで書き出す（明示的に実行するコマンド用）
+
+    Args:
+        path: 出力先ファイルパス
+    Returns:
+        出力したファイルパス
+    """
+    graph_image = get_app().get_graph(xray=True).draw_mermaid_png()
+    with open(path, "wb") as f:
+        f.write(graph_image)
+    return path
 
 def visualize_restaurant_results_streamlit(restaurants, title="レストラン検索結果 可視化"):
     """
@@ -2269,6 +2575,10 @@ def visualize_restaurant_results_streamlit(restaurants, title="レストラン
     Returns:
         画像バイナリデータ
     """
+    import io
+    import matplotlib.pyplot as plt
+    import streamlit as st
+
     if not restaurants:
         st.warning("表示するレストランデータがありません。")
         return None
@@ -2294,6 +2604,10 @@ def visualize_restaurant_category_count_streamlit(restaurants, title="カテゴ
     """
     カテゴリ（ジャンル）別件数を可視化し、Streamlitで表示
     """
+    import io
+    import matplotlib.pyplot as plt
+    import streamlit as st
+
     genres = [r.get('cuisine', '不明') or '不明' for r in restaurants]
     counter = Counter(genres)
     labels, values = zip(*counter.items()) if counter else ([],[])
@@ -2315,6 +2629,10 @@ def visualize_restaurant_rating_streamlit(restaurants, title="評価分布グラ
     """
     レストランの評価（rating）が数値であればヒストグラムで可視化
     """
+    import io
+    import matplotlib.pyplot as plt
+    import streamlit as st
+
     ratings = []
     for r in restaurants:
         val = r.get('rating')
@@ -2343,6 +2661,10 @@ def visualize_restaurant_review_sentiment_streamlit(restaurants, title="口コ
     """
     口コミ（catch, shop_detail_memo等）を簡易的に感情分析し、ポジティブ/ネガティブ割合を可視化
     """
+    import io
+    import matplotlib.pyplot as plt
+    import streamlit as st
+
     from textblob import TextBlob
     pos, neg, neu = 0, 0, 0
     for r in restaurants:
@@ -2480,7 +2802,7 @@ def run_agent(messages):
         return str(content)
 
     try:
-        result = app.invoke({"messages": messages})
+        result = invoke_agent(messages)
         import streamlit as st
         st.write("【DEBUG: app.invoke result】", result)
         text = result.get("message")
@@ -2521,9 +2843,6 @@ def run_agent(messages):
             "results": [],
         }
 
-# Spotify検索専用のシングルエージェント
-music_model = ChatOpenAI(model="gpt-4o-mini")
-
 class SpotifyTrack(BaseModel):
     name: str = Field(..., description="曲名")
     artist: str = Field(..., description="アーティスト名")
@@ -2555,10 +2874,13 @@ def run_agent_music(query):
             except Exception:
                 return str(obj)
 
-    model = ChatOpenAI(model="gpt-4o-mini")
+    # Spotify検索専用のシングルエージェント
+    from langgraph.prebuilt import create_react_agent
+
+    model = get_model()
     music_agent = create_react_agent(
         model=model,
-        tools=[search_spotify_tracks],
+        tools=[as_tool(search_spotify_tracks)],
         name="music_expert",
         prompt="""
             あなたはSpotify楽曲検索の専門家です。
@@ -2588,26 +2910,36 @@ def run_agent_music(query):
         return {"results": []}
 
 if __name__ == "__main__":
+    # グラフ図の生成は明示的なコマンドで行う: python supervisor_workers_multiagents.py draw-graph [出力先]
+    if len(sys.argv) > 1 and sys.argv[1] == "draw-graph":
+        output_path = draw_graph(sys.argv[2] if len(sys.argv) > 2 else "workflow.png")
+        print(f"グラフ図を出力しました: {output_path}")
+        sys.exit(0)
+
+    # 既定ではトークン・引き継ぎ・ツール結果を逐次表示する（--no-stream で従来の一括実行）
+    use_stream = "--no-stream" not in sys.argv[1:]
+
     user_input = input("質問を入力してください: ")
     print("\n=== 処理開始 ===")
     
     try:
-        result = app.invoke({
-            "messages": [
-                {
-                    "role": "user",
-                    "content": user_input
-                }
-            ]
-        })
+        messages = [
+            {
+                "role": "user",
+                "content": user_input
+            }
+        ]
+        result = print_agent_stream(messages) if use_stream else invoke_agent(messages)
         
         print("\n=== 結果 ===")
+        if "pre_route" in result:
+            print(f"事前ルーティング: {result['pre_route']}")
         print(f"結果の型: {type(result)}")
         
         if hasattr(result, 'keys'):
             print(f"結果のキー: {list(result.keys())}")
         
-        if "messages" in result:
+        if "messages" in result and not use_stream:
             print(f"メッセージ数: {len(result['messages'])}")
             for i, msg in enumerate(result['messages']):
                 print(f"\n--- メッセージ {i} ---")
@@ -2629,5 +2961,6 @@ if __name__ == "__main__":
         print(f"エラーが発生しました: {e}")
         import traceback
         traceback.print_exc()    
+    print(f"検索キャッシュ: {get_result_cache_stats()['total']}")
     print("\n=== 処理完了 ===")
 
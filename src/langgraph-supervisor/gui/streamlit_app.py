@@ -19,10 +19,16 @@ import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
+# src/ をPythonパスに追加（共通モジュール agent_common を利用するため）
+src_dir = os.path.abspath(os.path.join(current_dir, "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agent_common.streaming_render import BufferedMarkdownRenderer
 
 # マルチエージェントシステムのインポート
 try:
-    from supervisor_workers_multiagents import app, run_agent, run_agent_music
+    from supervisor_workers_multiagents import run_agent_stream, run_agent_music
 except ImportError as e:
     st.error(f"インポートエラー: {e}")
     st.info("supervisor_workers_multiagents.pyファイルが見つかりません。")
@@ -552,23 +558,45 @@ def process_user_input(user_input):
         "timestamp": datetime.now()
     })
     
-    # プログレスバー
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    # 処理状況（引き継ぎ・ツール結果）と回答を逐次表示する
+    status = st.status("🤖 AIエージェントが処理中...", expanded=True)
+    answer_placeholder = st.empty()
     
     try:
-        status_text.text("🤖 AIエージェントが処理中...")
-        progress_bar.progress(25)
-        
         start_time = time.time()
+        result = None
+        ttft_ms = None
+        speaker = None
+        renderer = None
         
-        # エージェントの実行
+        # エージェントの実行（トークン・引き継ぎ・ツール結果を逐次受け取って表示）
         try:
-            if st.session_state.current_agent == "auto":
-                result = run_agent([{"role": "user", "content": user_input}])
-            else:
-                # 特定のエージェントを指定した場合
-                result = run_agent([{"role": "user", "content": user_input}])
+            for event in run_agent_stream([{"role": "user", "content": user_input}]):
+                kind = event["type"]
+                if kind == "token":
+                    if event["agent"] != speaker:
+                        # 前の話者の未描画トークンを描画してから切り替える
+                        if renderer is not None:
+                            renderer.flush()
+                        speaker = event["agent"]
+                        # トークン毎に全文を再描画せず、50ms / 200文字ごとにまとめて描画する
+                        renderer = BufferedMarkdownRenderer(
+                            lambda text, speaker=speaker: answer_placeholder.markdown(f"**{speaker}**\n\n{text}▌")
+                        )
+                        status.update(label=f"🤖 {speaker} が回答中...")
+                    renderer.append(event["text"])
+                elif kind == "handoff":
+                    status.write(f"➡️ {event['source']} → {event['agent']}")
+                    status.update(label=f"🤖 {event['agent']} が処理中...")
+                elif kind == "tool_result":
+                    status.write(f"🔧 {event['agent']}: {event['name']}")
+                elif kind == "plan":
+                    status.write("🗂️ " + " / ".join(subtask["agent"] for subtask in event["subtasks"]))
+                elif kind == "subtask_done":
+                    status.write(f"✔️ {event['agent']}")
+                elif kind == "done":
+                    result = event["response"]
+                    ttft_ms = event["ttft_ms"]
         except Exception as agent_error:
             st.warning(f"エージェント実行エラー: {str(agent_error)}")
             # フォールバック: シンプルな応答を生成
@@ -576,11 +604,17 @@ def process_user_input(user_input):
                 "text": f"申し訳ございません。現在エージェントシステムに問題があります。\n\nリクエスト: {user_input}\n\nエラー: {str(agent_error)}\n\nしばらく時間をおいてから再度お試しください。",
                 "results": []
             }
+        finally:
+            # 正常終了・中断のどちらでも、まだ描画していないトークンを表示する
+            if renderer is not None:
+                renderer.flush()
         
         processing_time = time.time() - start_time
         
-        progress_bar.progress(100)
-        status_text.text("✅ 完了!")
+        done_label = "✅ 完了!"
+        if ttft_ms is not None:
+            done_label += f"（最初の応答まで {ttft_ms / 1000:.1f}秒）"
+        status.update(label=done_label, state="complete", expanded=False)
         
         # Add result to history
         response_text = result.get("text", "回答を生成できませんでした。")
@@ -636,8 +670,7 @@ def process_user_input(user_input):
         })
     finally:
         st.session_state.processing = False
-        progress_bar.empty()
-        status_text.empty()
+        answer_placeholder.empty()
 
 def display_results(results):
     """Display results appropriately"""
@@ -19,10 +19,16 @@ import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
+# Add src/ to the Python path (for the shared agent_common modules)
+src_dir = os.path.abspath(os.path.join(current_dir, "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agent_common.streaming_render import BufferedMarkdownRenderer
 
 # Import multi-agent system
 try:
-    from supervisor_workers_multiagents import app, run_agent, run_agent_music
+    from supervisor_workers_multiagents import run_agent_stream, run_agent_music
 except ImportError as e:
     st.error(f"Import Error: {e}")
     st.info("supervisor_workers_multiagents.py file not found.")
@@ -330,23 +336,45 @@ def process_user_input(user_input):
         "timestamp": datetime.now()
     })
     
-    # Progress bar
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    # Show progress (handoffs, tool results) and the answer as they arrive
+    status = st.status("🤖 AI Agent is processing...", expanded=True)
+    answer_placeholder = st.empty()
     
     try:
-        status_text.text("🤖 AI Agent is processing...")
-        progress_bar.progress(25)
-        
         start_time = time.time()
+        result = None
+        ttft_ms = None
+        speaker = None
+        renderer = None
         
-        # Agent execution
+        # Agent execution (tokens, handoffs and tool results are rendered as they arrive)
         try:
-            if st.session_state.current_agent == "auto":
-                result = run_agent([{"role": "user", "content": user_input}])
-            else:
-                # Specific agent specified
-                result = run_agent([{"role": "user", "content": user_input}])
+            for event in run_agent_stream([{"role": "user", "content": user_input}]):
+                kind = event["type"]
+                if kind == "token":
+                    if event["agent"] != speaker:
+                        # Render the previous speaker's pending tokens before switching
+                        if renderer is not None:
+                            renderer.flush()
+                        speaker = event["agent"]
+                        # Tokens are coalesced into frames (50 ms / 200 chars) instead of re-rendering per token
+                        renderer = BufferedMarkdownRenderer(
+                            lambda text, speaker=speaker: answer_placeholder.markdown(f"**{speaker}**\n\n{text}▌")
+                        )
+                        status.update(label=f"🤖 {speaker} is answering...")
+                    renderer.append(event["text"])
+                elif kind == "handoff":
+                    status.write(f"➡️ {event['source']} → {event['agent']}")
+                    status.update(label=f"🤖 {event['agent']} is working...")
+                elif kind == "tool_result":
+                    status.write(f"🔧 {event['agent']}: {event['name']}")
+                elif kind == "plan":
+                    status.write("🗂️ " + " / ".join(subtask["agent"] for subtask in event["subtasks"]))
+                elif kind == "subtask_done":
+                    status.write(f"✔️ {event['agent']}")
+                elif kind == "done":
+                    result = event["response"]
+                    ttft_ms = event["ttft_ms"]
         except Exception as agent_error:
             st.warning(f"Agent execution error: {str(agent_error)}")
             # Fallback: generate simple response
@@ -354,11 +382,17 @@ def process_user_input(user_input):
                 "text": f"Sorry. There is currently an issue with the agent system.\n\nRequest: {user_input}\n\nError: {str(agent_error)}\n\nPlease try again later.",
                 "results": []
             }
+        finally:
+            # Render tokens not yet shown, whether the stream finished or was cut off
+            if renderer is not None:
+                renderer.flush()
         
         processing_time = time.time() - start_time
         
-        progress_bar.progress(100)
-        status_text.text("✅ Complete!")
+        done_label = "✅ Complete!"
+        if ttft_ms is not None:
+            done_label += f" (first token after {ttft_ms / 1000:.1f}s)"
+        status.update(label=done_label, state="complete", expanded=False)
         
         # Add result to history
         response_text = result.get("text", "Could not generate answer.")
@@ -410,8 +444,7 @@ def process_user_input(user_input):
         })
     finally:
         st.session_state.processing = False
-        progress_bar.empty()
-        status_text.empty()
+        answer_placeholder.empty()
 
 def display_results(results):
     """Display results appropriately"""
@@ -4,6 +4,7 @@ import nest_asyncio
 import json
 import os
 import platform
+import sys
 
 if platform.system() == "Windows":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
@@ -22,13 +23,20 @@ from langchain_anthropic import ChatAnthropic
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from dotenv import load_dotenv
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from utils import astream_graph, random_uuid
+from utils import BufferedExpanderRenderer, BufferedMarkdownRenderer, astream_graph, random_uuid
 from langchain_core.messages.ai import AIMessageChunk
 from langchain_core.messages.tool import ToolMessage
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.runnables import RunnableConfig
 
+# src/ をPythonパスに追加（共通モジュール agent_common を利用するため）
+src_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agent_common.conversation_memory import ConversationMemory, llm_summarizer
+from agent_common.mcp_manager import get_mcp_manager
+
 # Load environment variables (get API keys and settings from .env file)
 load_dotenv(override=True)
 
@@ -214,14 +222,14 @@ if "thread_id" not in st.session_state:
 
 async def cleanup_mcp_client():
     """
-    Safely terminates the existing MCP client.
+    Releases this session's reference to the MCP servers.
 
-    Properly releases resources if an existing client exists.
+    The server processes are shared process-wide by the MCP connection
+    manager and stay warm across reruns and browser sessions; they are
+    stopped when idle or at process exit.
     """
     if "mcp_client" in st.session_state and st.session_state.mcp_client is not None:
         try:
-
-            await st.session_state.mcp_client.__aexit__(None, None, None)
             st.session_state.mcp_client = None
         except Exception as e:
             import traceback
@@ -284,9 +292,20 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
     """
     accumulated_text = []
     accumulated_tool = []
+    # Tokens are coalesced into frames (50 ms / 200 chars) instead of re-rendering per token
+    text_renderer = BufferedMarkdownRenderer(text_placeholder.markdown)
+    tool_renderer = BufferedExpanderRenderer(tool_placeholder, "🔧 Tool Call Information")
+
+    def add_text(text):
+        accumulated_text.append(text)
+        text_renderer.append(text)
+
+    def add_tool(text, label="🔧 Tool Call Information"):
+        accumulated_tool.append(text)
+        tool_renderer.set_label(label)
+        tool_renderer.append(text)
 
     def callback_func(message: dict):
-        nonlocal accumulated_text, accumulated_tool
         message_content = message.get("content", None)
 
         if isinstance(message_content, AIMessageChunk):
@@ -296,22 +315,15 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
                 message_chunk = content[0]
                 # Process text type
                 if message_chunk["type"] == "text":
-                    accumulated_text.append(message_chunk["text"])
-                    text_placeholder.markdown("".join(accumulated_text))
+                    add_text(message_chunk["text"])
                 # Process tool use type
                 elif message_chunk["type"] == "tool_use":
                     if "partial_json" in message_chunk:
-                        accumulated_tool.append(message_chunk["partial_json"])
+                        add_tool(message_chunk["partial_json"])
                     else:
                         tool_call_chunks = message_content.tool_call_chunks
                         tool_call_chunk = tool_call_chunks[0]
-                        accumulated_tool.append(
-                            "\n```json\n" + str(tool_call_chunk) + "\n```\n"
-                        )
-                    with tool_placeholder.expander(
-                        "🔧 Tool Call Information", expanded=True
-                    ):
-                        st.markdown("".join(accumulated_tool))
+                        add_tool("\n```json\n" + str(tool_call_chunk) + "\n```\n")
             # Process if tool_calls attribute exists (mainly occurs in OpenAI models)
             elif (
                 hasattr(message_content, "tool_calls")
@@ -319,59 +331,45 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
                 and len(message_content.tool_calls[0]["name"]) > 0
             ):
                 tool_call_info = message_content.tool_calls[0]
-                accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-                with tool_placeholder.expander(
-                    "🔧 Tool Call Information", expanded=True
-                ):
-                    st.markdown("".join(accumulated_tool))
+                add_tool("\n```json\n" + str(tool_call_info) + "\n```\n")
             # Process if content is a simple string
             elif isinstance(content, str):
-                accumulated_text.append(content)
-                text_placeholder.markdown("".join(accumulated_text))
+                add_text(content)
             # Process if invalid tool call information exists
             elif (
                 hasattr(message_content, "invalid_tool_calls")
                 and message_content.invalid_tool_calls
             ):
                 tool_call_info = message_content.invalid_tool_calls[0]
-                accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-                with tool_placeholder.expander(
-                    "🔧 Tool Call Information (Invalid)", expanded=True
-                ):
-                    st.markdown("".join(accumulated_tool))
+                add_tool(
+                    "\n```json\n" + str(tool_call_info) + "\n```\n",
+                    label="🔧 Tool Call Information (Invalid)",
+                )
             # Process if tool_call_chunks attribute exists
             elif (
                 hasattr(message_content, "tool_call_chunks")
                 and message_content.tool_call_chunks
             ):
                 tool_call_chunk = message_content.tool_call_chunks[0]
-                accumulated_tool.append(
-                    "\n```json\n" + str(tool_call_chunk) + "\n```\n"
-                )
-                with tool_placeholder.expander(
-                    "🔧 Tool Call Information", expanded=True
-                ):
-                    st.markdown("".join(accumulated_tool))
+                add_tool("\n```json\n" + str(tool_call_chunk) + "\n```\n")
             # Process if tool_calls exists in additional_kwargs (supports various model compatibility)
             elif (
                 hasattr(message_content, "additional_kwargs")
                 and "tool_calls" in message_content.additional_kwargs
             ):
                 tool_call_info = message_content.additional_kwargs["tool_calls"][0]
-                accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-                with tool_placeholder.expander(
-                    "🔧 Tool Call Information", expanded=True
-                ):
-                    st.markdown("".join(accumulated_tool))
+                add_tool("\n```json\n" + str(tool_call_info) + "\n```\n")
         # Process if it's a tool message (tool response)
         elif isinstance(message_content, ToolMessage):
-            accumulated_tool.append(
-                "\n```json\n" + str(message_content.content) + "\n```\n"
-            )
-            with tool_placeholder.expander("🔧 Tool Call Information", expanded=True):
-                st.markdown("".join(accumulated_tool))
+            add_tool("\n```json\n" + str(message_content.content) + "\n```\n")
         return None
 
+    def flush():
+        # Render whatever is still buffered once the stream has ended
+        text_renderer.flush()
+        tool_renderer.flush()
+
+    callback_func.flush = flush
     return callback_func, accumulated_text, accumulated_tool
 
 
@@ -414,6 +412,9 @@ async def process_query(query, text_placeholder, tool_placeholder, timeout_secon
             except asyncio.TimeoutError:
                 error_msg = f"⏱️ Request time exceeded {timeout_seconds} seconds. Please try again later."
                 return {"error": error_msg}, error_msg, ""
+            finally:
+                # タイムアウト・エラー時も、まだ描画していないトークンを表示する
+                streaming_callback.flush()
 
             final_text = "".join(accumulated_text_obj)
             final_tool = "".join(accumulated_tool_obj)
@@ -448,11 +449,15 @@ async def initialize_session(mcp_config=None):
         if mcp_config is None:
             # Load settings from config.json file
             mcp_config = load_config_from_json()
-        client = MultiServerMCPClient(mcp_config)
-        await client.__aenter__()
-        tools = client.get_tools()
+        # Servers are shared process-wide and reused when already running
+        manager = get_mcp_manager()
+        tools = await manager.aget_tools(mcp_config)
         st.session_state.tool_count = len(tools)
-        st.session_state.mcp_client = client
+        st.session_state.mcp_client = manager
+
+        # Servers that failed or are still starting are left out
+        for server_name, reason in manager.unavailable(mcp_config).items():
+            st.warning(f"⚠️ MCP server '{server_name}' is unavailable: {reason}")
 
         # Initialize appropriate model based on selection
         selected_model = st.session_state.selected_model
@@ -473,10 +478,15 @@ async def initialize_session(mcp_config=None):
                 temperature=0.1,
                 max_tokens=OUTPUT_TOKEN_INFO[selected_model]["max_tokens"],
             )
+        # LLMに送る会話履歴を予算内（MEMORY_MAX_TOKENS）に抑え、溢れた古いターンはバックグラウンドで要約する
+        # Bound the history sent to the LLM; older turns are summarised in the background
+        memory_policy = ConversationMemory(summarizer=llm_summarizer(model))
+        st.session_state.memory_policy = memory_policy
         agent = create_react_agent(
             model,
             tools,
             checkpointer=MemorySaver(),
+            pre_model_hook=memory_policy.pre_model_hook,
             prompt=SYSTEM_PROMPT,
         )
         st.session_state.agent = agent
@@ -0,0 +1,144 @@
+"""
+Benchmark for MCP tool access: per-rerun MultiServerMCPClient vs the
+process-wide MCPConnectionManager.
+
+Loads the tools of the configured servers (all of config.json by default)
+and calls one tool, reporting the time until the tools are available (the
+agent can be built), the time-to-first-tool-call and the latency of further
+calls:
+
+- legacy: what initialize_session() used to do on every (re)initialisation
+  — build a MultiServerMCPClient and get_tools(); each tool call then opens
+  a new session, i.e. spawns a new server process. One failing server fails
+  the whole initialisation;
+- cold:   first use of the manager with an empty schema cache (servers
+  start concurrently, slow/broken ones are left out after their timeout);
+- cached: a new process with the schema cache filled — the tools are
+  returned before the servers have finished starting;
+- warm:   a later Streamlit session / rerun of the same process, the
+  servers are already running and only the shared session is used.
+
+MCPツールの取得・初回呼び出しまでの時間を、従来のクライアント再作成と
+常駐サーバー（コールド/スキーマキャッシュ/ウォーム）で比較する。
+
+Usage:
+    python benchmark_mcp_startup.py
+    python benchmark_mcp_startup.py --servers get_current_time --tool get_current_time
+    python benchmark_mcp_startup.py --servers retriever --tool retrieve --args '{"query": "..."}'
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from langchain_mcp_adapters.client import MultiServerMCPClient
+
+# src/ をPythonパスに追加（共通モジュール agent_common を利用するため）
+src_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agent_common.mcp_manager import MCPConnectionManager, ToolSchemaCache
+
+MODES = ("legacy", "cold", "cached", "warm")
+
+
+def find_tool(tools, name):
+    for tool in tools:
+        if tool.name == name:
+            return tool
+    raise RuntimeError(f"tool {name!r} not found in {[tool.name for tool in tools]}")
+
+
+async def measure(load_tools, tool_name, tool_args, calls):
+    start = time.perf_counter()
+    tools = await load_tools()
+    tools_s = time.perf_counter() - start
+    tool = find_tool(tools, tool_name)
+    await tool.ainvoke(tool_args)
+    first_s = time.perf_counter() - start
+    latencies = []
+    for _ in range(calls):
+        call_start = time.perf_counter()
+        await tool.ainvoke(tool_args)
+        latencies.append(time.perf_counter() - call_start)
+    return {"tools": tools_s, "first": first_s, "next": latencies, "count": len(tools)}
+
+
+async def run(args, config):
+    tool_args = json.loads(args.args)
+    samples = {mode: [] for mode in MODES}
+    unavailable = {}
+    # 従来のクライアントは "startup_timeout" を知らないため取り除く
+    legacy_config = {
+        name: {key: value for key, value in connection.items() if key != "startup_timeout"}
+        for name, connection in config.items()
+    }
+
+    for _ in range(args.repeat):
+        try:
+            samples["legacy"].append(
+                await measure(lambda: MultiServerMCPClient(legacy_config).get_tools(), args.tool, tool_args, args.calls)
+            )
+        except Exception as e:
+            print(f"legacy failed: {type(e).__name__}: {e}")
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache_path = os.path.join(cache_dir, "schemas.json")
+            # コールド: プロセス起動直後の最初のセッション（スキーマキャッシュなし）
+            manager = MCPConnectionManager(schema_cache=ToolSchemaCache(cache_path))
+            try:
+                samples["cold"].append(await measure(lambda: manager.aget_tools(config), args.tool, tool_args, args.calls))
+                unavailable = manager.unavailable(config)
+                # ウォーム: 同じプロセスの別セッション・再実行（サーバーは起動済み）
+                samples["warm"].append(await measure(lambda: manager.aget_tools(config), args.tool, tool_args, args.calls))
+            finally:
+                manager.shutdown()
+
+            # キャッシュ済み: 再起動したプロセス（スキーマはディスクから、サーバーは起動中）
+            manager = MCPConnectionManager(schema_cache=ToolSchemaCache(cache_path))
+            try:
+                samples["cached"].append(await measure(lambda: manager.aget_tools(config), args.tool, tool_args, args.calls))
+            finally:
+                manager.shutdown()
+    return samples, unavailable
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="config.json", help="MCP server config (MultiServerMCPClient format)")
+    parser.add_argument("--servers", help="comma-separated servers of the config to load (default: all)")
+    parser.add_argument("--tool", default="get_current_time", help="tool to call")
+    parser.add_argument("--args", default="{}", help="JSON arguments of the tool call")
+    parser.add_argument("--calls", type=int, default=5, help="further calls after the first one")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.config, encoding="utf-8") as f:
+        config = json.load(f)
+    if args.servers:
+        config = {name: config[name] for name in args.servers.split(",")}
+
+    samples, unavailable = asyncio.run(run(args, config))
+    print(f"servers: {', '.join(config)}  tool: {args.tool}  repeat: {args.repeat}")
+    for name, reason in unavailable.items():
+        print(f"  unavailable: {name}: {reason}")
+    print(f"{'mode':<8}{'tools':>7}{'tools ms':>10}{'first call ms':>15}{'next calls ms':>15}")
+    for mode in MODES:
+        rows = samples[mode]
+        if not rows:
+            print(f"{mode:<8}{'failed':>7}")
+            continue
+        tools_ms = statistics.median(row["tools"] for row in rows) * 1000
+        first_ms = statistics.median(row["first"] for row in rows) * 1000
+        next_ms = statistics.median(latency for row in rows for latency in row["next"]) * 1000
+        print(f"{mode:<8}{rows[-1]['count']:>7}{tools_ms:>10.0f}{first_ms:>15.0f}{next_ms:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
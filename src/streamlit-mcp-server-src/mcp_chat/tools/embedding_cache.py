@@ -0,0 +1,165 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# Default location of the on-disk embedding store
+# 埋め込みキャッシュの保存先
+DEFAULT_CACHE_PATH = "data/.embedding_cache.sqlite"
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_MAX_PARAMS = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed cache in front of an embedding model.
+
+    Document embeddings are stored in SQLite as float32 blobs keyed by
+    ``sha256(model + chunk text)``; only cache misses are sent to the
+    underlying model, as a single bulk ``embed_documents`` call. Query
+    embeddings are kept in an in-memory LRU so a repeated question skips
+    the embedding round trip entirely.
+
+    チャンク内容とモデル名のハッシュをキーに埋め込みをSQLiteへ保存し、
+    キャッシュミス分だけをまとめて埋め込みモデルに問い合わせる。
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        query_cache_size: int = 1024,
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.query_cache_size = query_cache_size
+        self._model_hash = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:16]
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {"document_hits": 0, "document_misses": 0, "query_hits": 0, "query_misses": 0}
+
+    # --- Storage ---
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.cache_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.cache_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self._model_hash}\0{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _encode(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _decode(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        conn = self._connection()
+        found: Dict[str, List[float]] = {}
+        for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+            chunk = keys[start:start + SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            )
+            for key, blob in rows:
+                found[key] = self._decode(blob)
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)",
+                [(key, len(vector), self._encode(vector)) for key, vector in items.items()],
+            )
+
+    # --- Embeddings interface ---
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds documents, reusing cached vectors for chunks seen before.
+
+        Args:
+            texts (List[str]): Chunk texts to embed
+
+        Returns:
+            List[List[float]]: One embedding per input text, in input order
+        """
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            cached = self._lookup(list(dict.fromkeys(keys)))
+
+        # キャッシュミスした（重複を除いた）テキストだけを1回の一括呼び出しで埋め込む
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        fresh: Dict[str, List[float]] = {}
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            cached.update(fresh)
+
+        with self._lock:
+            if fresh:
+                self._store(fresh)
+            self.stats["document_hits"] += len(texts) - len(missing)
+            self.stats["document_misses"] += len(missing)
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embeds a query, serving repeated questions from the in-memory LRU.
+
+        Args:
+            text (str): Query text
+
+        Returns:
+            List[float]: Query embedding
+        """
+        with self._lock:
+            if text in self._query_cache:
+                self._query_cache.move_to_end(text)
+                self.stats["query_hits"] += 1
+                return self._query_cache[text]
+
+        vector = self.underlying.embed_query(text)
+        with self._lock:
+            self.stats["query_misses"] += 1
+            self._query_cache[text] = vector
+            self._query_cache.move_to_end(text)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def close(self) -> None:
+        """Closes the SQLite connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
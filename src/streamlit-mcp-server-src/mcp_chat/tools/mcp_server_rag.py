@@ -1,62 +1,63 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_community.vectorstores import FAISS
+import asyncio
 from langchain_openai import OpenAIEmbeddings
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
 from typing import Any
+from rag_index import RAGIndex
+from embedding_cache import CachedEmbeddings
 
 # Load environment variables from .env file (contains API keys)
 load_dotenv(override=True)
 
+# Process-wide index manager: every PDF in the data folder is ingested
+# incrementally (only new or changed files are embedded) and the FAISS
+# index is reused for every query
+# プロセス全体で共有するインデックス管理（data/配下のPDFを差分で取り込み）
+# Embeddings go through a content-addressed cache so chunks and repeated
+# questions that were embedded before are never sent to OpenAI again
+# 埋め込みはチャンク内容ハッシュのキャッシュ経由（既出のチャンク・質問は再計算しない）
+embeddings = CachedEmbeddings(
+    OpenAIEmbeddings(model="text-embedding-3-small"),
+    model_name="text-embedding-3-small",
+)
+rag_index = RAGIndex(
+    embeddings=embeddings,
+    source_dir="data",
+    chunk_size=1000,
+    chunk_overlap=50,
+    model_name="text-embedding-3-small",
+)
+
 
 def create_retriever() -> Any:
     """
-    Creates and returns a document retriever based on FAISS vector store.
+    Returns a document retriever based on the cached FAISS vector store.
 
     This function performs the following steps:
-    1. Loads a PDF document(place your PDF file in the data folder)
-    2. Splits the document into manageable chunks
-    3. Creates embeddings for each chunk
-    4. Builds a FAISS vector store from the embeddings
-    5. Returns a retriever interface to the vector store
+    1. Compares the PDFs in the data folder with the index manifest
+       (place your PDF files in the data folder)
+    2. Loads the saved index if nothing changed
+    3. Otherwise streams new or changed files through load -> split -> embed
+       in bounded batches and upserts/deletes their vectors in place
+    4. Returns a retriever interface to the vector store
 
     Returns:
         Any: A retriever object that can be used to query the document database
     """
     try:
-        # Step 1: Load Documents
-        # PyMuPDFLoader is used to extract text from PDF files
-        # PDFファイルを読み込む（ファイルが存在しない・壊れている場合は例外が発生）
-        loader = PyMuPDFLoader("data/sakamoto_paper.pdf")
-        docs = loader.load()
+        # Step 1-3: Load or incrementally update the vector store
+        # 変更がなければディスクから読み込み、追加・変更されたPDFのみ埋め込み
+        # （ファイルが存在しない・壊れている場合は例外が発生）
+        vectorstore = rag_index.load_or_build()
     except Exception as e:
         # 例外発生時はエラー内容を返す（呼び出し元でそのまま返される）
         return f"PDFの読み込みでエラーが発生しました: {str(e)}"
 
-    # Step 2: Split Documents
-    # Recursive splitter divides documents into chunks with some overlap to maintain context
-    # ドキュメントをチャンクに分割（文脈保持のため一部重複あり）
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=50)
-    split_documents = text_splitter.split_documents(docs)
-
-    # Step 3: Create Embeddings
-    # OpenAI's text-embedding-3-small model is used to convert text chunks into vector embeddings
-    # OpenAIの埋め込みモデルでテキストをベクトル化
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-
-    # Step 4: Create Vector Database
-    # FAISS is an efficient similarity search library that stores vector embeddings
-    # and allows for fast retrieval of similar vectors
-    # FAISSでベクトルストアを作成（類似検索用）
-    vectorstore = FAISS.from_documents(documents=split_documents, embedding=embeddings)
-
-    # Step 5: Create Retriever
+    # Step 4: Create Retriever
     # The retriever provides an interface to search the vector database
     # and retrieve documents relevant to a query
     # ベクトルストアから検索するためのリトリーバーを作成
-    retriever = vectorstore.as_retriever()
-    return retriever
+    return vectorstore.as_retriever()
 
 
 # Initialize FastMCP server with configuration
@@ -73,7 +74,7 @@ async def retrieve(query: str) -> str:
     """
     Retrieves information from the document database based on the query.
 
-    This function creates a retriever, queries it with the provided input,
+    This function queries the cached retriever with the provided input
     and returns the concatenated content of all retrieved documents.
 
     Args:
@@ -82,9 +83,10 @@ async def retrieve(query: str) -> str:
     Returns:
         str: Concatenated text content from all retrieved documents
     """
-    # Create a new retriever instance for each query
-    # Note: In production, consider caching the retriever for better performance
-    retriever = create_retriever()
+    # The index is built once and cached; only new or changed PDFs are re-embedded
+    # インデックスはキャッシュ済み（追加・変更されたPDFのみ再埋め込み）
+    # 定期的な再スキャン・ハッシュ計算・埋め込みはブロッキングのため、イベントループを塞がないようスレッドで実行
+    retriever = await asyncio.to_thread(create_retriever)
 
     # Use the invoke() method to get relevant documents based on the query
     # retrieverがエラーメッセージ（str型）の場合はそのまま返す
@@ -92,7 +94,8 @@ async def retrieve(query: str) -> str:
         return retriever
 
     # クエリに基づいて関連ドキュメントを取得
-    retrieved_docs = retriever.invoke(query)
+    # （クエリの埋め込みもブロッキングのHTTP呼び出しのためスレッドで実行）
+    retrieved_docs = await asyncio.to_thread(retriever.invoke, query)
 
     # 検索結果が空の場合の処理
     if not retrieved_docs:
@@ -103,5 +106,9 @@ async def retrieve(query: str) -> str:
 
 
 if __name__ == "__main__":
+    # Build (or load) the index at startup so the first query does not pay for it
+    # 起動時にインデックスを準備し、最初のクエリの待ち時間をなくす
+    create_retriever()
+
     # Run the MCP server with stdio transport for integration with MCP clients
     mcp.run(transport="stdio")
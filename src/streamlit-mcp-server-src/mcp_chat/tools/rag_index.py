@@ -0,0 +1,365 @@
+import hashlib
+import json
+import pickle
+import shutil
+import threading
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_community.document_loaders import PyMuPDFLoader
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Default location of the source documents and the on-disk index
+# 元ドキュメントとインデックスの保存先
+DEFAULT_SOURCE_DIR = "data"
+DEFAULT_INDEX_DIR = "data/.faiss_index"
+MANIFEST_FILE = "manifest.json"
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """
+    Computes the SHA-256 hash of a file without loading it into memory at once.
+
+    Args:
+        path (str): Path of the file to hash
+        block_size (int): Number of bytes read per iteration
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentLoadError(Exception):
+    """Raised when a source file cannot be read or split (corrupt or unreadable PDF)."""
+
+
+def load_pdf_documents(path: str) -> Iterator[Document]:
+    """Lazily loads a PDF file with PyMuPDF, yielding one Document per page."""
+    return PyMuPDFLoader(path).lazy_load()
+
+
+def batched(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yields lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class RAGIndex:
+    """
+    Incremental FAISS index over every PDF in ``source_dir``.
+
+    A manifest keeps the content hash and vector ids of each ingested file.
+    On refresh only new or changed files are loaded, split and embedded
+    (streamed in bounded batches so memory use does not depend on corpus
+    size), vectors of changed or removed files are deleted in place, and the
+    index is saved back to ``index_dir``. Changing the splitter settings or
+    the embedding model triggers a full rebuild. When nothing changed the
+    saved index is loaded from disk without embedding anything.
+
+    A file that cannot be read is logged and skipped (its previous vectors,
+    if any, stay in the index) until its content changes again, and a
+    refresh that fails as a whole keeps serving the previous index.
+
+    data/配下のPDFをマニフェスト（ファイル毎のハッシュとベクトルID）で管理し、
+    追加・変更・削除されたファイルだけを差分でインデックスに反映する。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        source_dir: str = DEFAULT_SOURCE_DIR,
+        index_dir: str = DEFAULT_INDEX_DIR,
+        pattern: str = "**/*.pdf",
+        chunk_size: int = 1000,
+        chunk_overlap: int = 50,
+        model_name: str = "text-embedding-3-small",
+        loader: Callable[[str], Iterable[Document]] = load_pdf_documents,
+        batch_size: int = 64,
+        refresh_interval: float = 30.0,
+    ):
+        self.embeddings = embeddings
+        self.source_dir = Path(source_dir)
+        self.index_dir = Path(index_dir)
+        self.pattern = pattern
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.model_name = model_name
+        self.loader = loader
+        self.batch_size = batch_size
+        self.refresh_interval = refresh_interval
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        self._vectorstore: Optional[FAISS] = None
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    # --- Manifest ---
+
+    def _settings(self) -> Dict[str, Any]:
+        return {
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "model": self.model_name,
+        }
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        path = self.index_dir / MANIFEST_FILE
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("settings") == self._settings():
+                return manifest
+        # 設定が変わった場合・初回は空のマニフェストから全件構築
+        return {"settings": self._settings(), "files": {}}
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp = self.index_dir / f".{MANIFEST_FILE}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        tmp.replace(self.index_dir / MANIFEST_FILE)
+
+    def _scan(self, manifest: Dict[str, Any]) -> Tuple[Dict[str, Dict[str, Any]], List[str], List[str]]:
+        """
+        Compares the source directory with the manifest.
+
+        Files whose size and mtime match the manifest are not re-hashed.
+
+        Returns:
+            Tuple of (current file entries, changed or new files, removed files)
+        """
+        known = manifest["files"]
+        current: Dict[str, Dict[str, Any]] = {}
+        changed: List[str] = []
+
+        for path in sorted(self.source_dir.glob(self.pattern)):
+            if not path.is_file() or self.index_dir in path.parents:
+                continue
+            rel = path.relative_to(self.source_dir).as_posix()
+            stat = path.stat()
+            entry = known.get(rel)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                current[rel] = entry
+                continue
+
+            sha256 = file_sha256(str(path))
+            if entry and entry["sha256"] == sha256:
+                # 内容は同じ（タイムスタンプのみ変更）
+                current[rel] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                continue
+
+            current[rel] = {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "ids": []}
+            changed.append(rel)
+
+        removed = [rel for rel in known if rel not in current]
+        return current, changed, removed
+
+    # --- Streaming ingestion pipeline ---
+
+    def _iter_chunks(self, rel: str, sha256: str) -> Iterator[Tuple[str, Document]]:
+        """Loads one file page by page and yields (vector id, chunk) pairs."""
+        # ファイルパスと内容ハッシュから決定的なIDを作る（同一内容の別ファイルとも衝突しない）
+        prefix = hashlib.sha256(f"{rel}:{sha256}".encode("utf-8")).hexdigest()[:16]
+        n = 0
+        pages = self.loader(str(self.source_dir / rel))
+        while True:
+            try:
+                # 読み込み・分割のエラーはファイルの問題（埋め込みAPIのエラーとは区別する）
+                page = next(pages, None)
+                chunks = self._splitter.split_documents([page]) if page is not None else []
+            except Exception as e:
+                raise DocumentLoadError(f"{rel}: {e}") from e
+            if page is None:
+                return
+            for chunk in chunks:
+                chunk.metadata["source_file"] = rel
+                yield f"{prefix}:{n}", chunk
+                n += 1
+
+    def _ingest(self, vectorstore: Optional[FAISS], rel: str, entry: Dict[str, Any]) -> Tuple[Optional[FAISS], bool]:
+        """
+        Embeds one file in bounded batches and upserts its vectors.
+
+        Returns:
+            Tuple of (vector store, whether the file was ingested). When the
+            file cannot be read, the vectors added for it are removed again.
+        """
+        ids: List[str] = []
+        try:
+            for batch in batched(self._iter_chunks(rel, entry["sha256"]), self.batch_size):
+                batch_ids = [chunk_id for chunk_id, _ in batch]
+                texts = [chunk.page_content for _, chunk in batch]
+                metadatas = [chunk.metadata for _, chunk in batch]
+                vectors = self.embeddings.embed_documents(texts)
+                text_embeddings = list(zip(texts, vectors))
+
+                if vectorstore is None:
+                    vectorstore = FAISS.from_embeddings(
+                        text_embeddings, self.embeddings, metadatas=metadatas, ids=batch_ids
+                    )
+                else:
+                    vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=batch_ids)
+                ids.extend(batch_ids)
+        except DocumentLoadError as e:
+            print(f"読み込めないファイルをスキップしました: {e}")
+            if vectorstore is not None and ids:
+                vectorstore.delete(ids)
+            entry["error"] = str(e)
+            return vectorstore, False
+
+        entry["ids"] = ids
+        return vectorstore, True
+
+    # --- Persistence ---
+
+    def _index_files_exist(self) -> bool:
+        return (self.index_dir / "index.faiss").exists() and (self.index_dir / "index.pkl").exists()
+
+    def _load(self) -> Optional[FAISS]:
+        if not self._index_files_exist():
+            return None
+
+        import faiss
+
+        # LangChainのFAISSが保存するのはIndexFlat（IO_FLAG_MMAPの対象外）のため、通常どおりメモリに読み込む
+        index = faiss.read_index(str(self.index_dir / "index.faiss"))
+
+        with open(self.index_dir / "index.pkl", "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+
+    def _save(self, vectorstore: Optional[FAISS], manifest: Dict[str, Any]) -> None:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        if vectorstore is None:
+            for name in ("index.faiss", "index.pkl"):
+                (self.index_dir / name).unlink(missing_ok=True)
+        else:
+            # Write to a temporary directory first so a crash never leaves a half-written index
+            # 書き込み途中のインデックスが残らないよう一時ディレクトリ経由で保存
+            tmp = self.index_dir / ".tmp"
+            if tmp.exists():
+                shutil.rmtree(tmp)
+            vectorstore.save_local(str(tmp))
+            for name in ("index.faiss", "index.pkl"):
+                (tmp / name).replace(self.index_dir / name)
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._write_manifest(manifest)
+
+    # --- Public API ---
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Synchronises the index with the source directory.
+
+        Returns:
+            Dict[str, Any]: Number of added/changed, removed and unchanged files
+        """
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> Dict[str, Any]:
+        manifest = self._manifest if self._manifest is not None else self._read_manifest()
+        if any(entry["ids"] for entry in manifest["files"].values()) and not self._index_files_exist():
+            # マニフェストはあるがインデックスファイルが無い場合は全件構築し直す
+            print(f"{self.index_dir} にインデックスファイルが無いため、全件を取り込み直します")
+            manifest = {"settings": self._settings(), "files": {}}
+        current, changed, removed = self._scan(manifest)
+        self._last_refresh = time.monotonic()
+
+        if not changed and not removed:
+            if self._vectorstore is None and current:
+                self._vectorstore = self._load()
+            self._manifest = dict(manifest, files=current)
+            return {"changed": 0, "removed": 0, "unchanged": len(current), "failed": 0}
+
+        # 変更がある場合は保存済みのインデックスを読み込み、差分のみ反映
+        vectorstore = self._load() if manifest["files"] else None
+
+        failed: List[str] = []
+        for rel in changed:
+            vectorstore, ingested = self._ingest(vectorstore, rel, current[rel])
+            if not ingested:
+                # 以前の内容のベクトルは残す（ファイルが再び変更されるまで再試行しない）
+                current[rel]["ids"] = manifest["files"].get(rel, {}).get("ids", [])
+                failed.append(rel)
+
+        # 新しいIDは内容ハッシュから作るため、取り込み後に古いベクトルを削除しても衝突しない
+        stale_ids = [
+            chunk_id
+            for rel in removed + [rel for rel in changed if rel not in failed]
+            for chunk_id in manifest["files"].get(rel, {}).get("ids", [])
+        ]
+        if vectorstore is not None and stale_ids:
+            vectorstore.delete(stale_ids)
+
+        if vectorstore is not None and vectorstore.index.ntotal == 0:
+            vectorstore = None
+
+        manifest = {"settings": self._settings(), "files": current}
+        self._save(vectorstore, manifest)
+        self._vectorstore = vectorstore
+        self._manifest = manifest
+        return {
+            "changed": len(changed) - len(failed),
+            "removed": len(removed),
+            "unchanged": len(current) - len(changed),
+            "failed": len(failed),
+        }
+
+    def load_or_build(self) -> FAISS:
+        """
+        Returns the vector store, ingesting new or changed files first.
+
+        The source directory is re-scanned at most once per
+        ``refresh_interval`` seconds so queries stay cheap.
+
+        Returns:
+            FAISS: Vector store covering every document in the source directory
+        """
+        with self._lock:
+            due = time.monotonic() - self._last_refresh >= self.refresh_interval
+            if self._vectorstore is None or due:
+                try:
+                    self._refresh_locked()
+                except Exception as e:
+                    if self._vectorstore is None:
+                        raise
+                    # 更新に失敗しても、前回のインデックスで検索を続ける
+                    print(f"インデックスの更新に失敗したため、前回のインデックスを使用します: {e}")
+            if self._vectorstore is None:
+                raise FileNotFoundError(f"{self.source_dir} に取り込み可能なドキュメントがありません")
+            return self._vectorstore
+
+    def as_retriever(self, **kwargs: Any) -> Any:
+        """Returns a retriever over the (cached) vector store."""
+        return self.load_or_build().as_retriever(**kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns a small summary of the currently loaded index."""
+        files = self._manifest["files"] if self._manifest else {}
+        return {
+            "files": len(files),
+            "loaded": self._vectorstore is not None,
+            "vectors": self._vectorstore.index.ntotal if self._vectorstore else 0,
+        }
@@ -2,8 +2,18 @@ from typing import Any, Dict, List, Callable, Optional
 from langchain_core.messages import BaseMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph.state import CompiledStateGraph
+import os
+import sys
 import uuid
 
+# src/ をPythonパスに追加（共通モジュール agent_common を利用するため）
+src_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+# ストリーミング表示のレンダラーは langgraph-supervisor のGUIと共通
+from agent_common.streaming_render import BufferedExpanderRenderer, BufferedMarkdownRenderer  # noqa: F401
+
 
 def random_uuid():
     return str(uuid.uuid4())
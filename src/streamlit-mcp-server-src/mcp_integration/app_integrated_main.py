@@ -4,6 +4,7 @@ import nest_asyncio
 import json
 import os
 import platform
+import sys
 import requests
 from urllib.parse import quote
 import re
@@ -25,13 +26,25 @@ from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from dotenv import load_dotenv
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from utils import astream_graph, random_uuid
+from utils import BufferedExpanderRenderer, BufferedMarkdownRenderer, astream_graph, random_uuid
 from langchain_core.messages.ai import AIMessageChunk
 from langchain_core.messages.tool import ToolMessage
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
+from restaurant_fanout import fan_out, run_sync
+from restaurant_dedup import merge_restaurants
+from semantic_router import get_semantic_router
+
+# src/ をPythonパスに追加（共通モジュール agent_common を利用するため）
+src_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agent_common.spotify_auth import SpotifyAuthError, get_token_manager
+from agent_common.area_resolver import resolve_area
+from agent_common.conversation_memory import ConversationMemory, llm_summarizer
+from agent_common.mcp_manager import get_mcp_manager
 
 # Load environment variables
 load_dotenv(override=True)
@@ -72,30 +85,14 @@ def search_restaurants_tool(location: str, cuisine: str = "", budget: str = "",
 def search_spotify_tracks_func(query: str, limit: int = 10) -> dict:
     """Spotifyで楽曲を検索する関数（UI用）"""
     try:
-        client_id = os.getenv("SPOTIFY_USER_ID")
-        client_secret = os.getenv("SPOTIFY_TOKEN")
-        
-        if not client_id or not client_secret:
-            return {"error": "Spotify API credentials not configured. Please set SPOTIFY_USER_ID and SPOTIFY_TOKEN in your .env file."}
-        
-        # Get access token
-        auth_response = requests.post('https://accounts.spotify.com/api/token', {
-            'grant_type': 'client_credentials',
-            'client_id': client_id,
-            'client_secret': client_secret,
-        })
-        
-        if auth_response.status_code != 200:
-            return {"error": "Failed to authenticate with Spotify API"}
-        
-        access_token = auth_response.json()['access_token']
+        # トークンはプロセス内で共有し、有効期限の少し前まで再利用
+        try:
+            spotify = get_token_manager()
+        except SpotifyAuthError as e:
+            return {"error": str(e)}
         
         # Search for tracks
-        headers = {'Authorization': f'Bearer {access_token}'}
-        search_response = requests.get(
-            f'https://api.spotify.com/v1/search?q={quote(query)}&type=track&limit={limit}',
-            headers=headers
-        )
+        search_response = spotify.get('/search', params={'q': query, 'type': 'track', 'limit': limit})
         
         if search_response.status_code != 200:
             return {"error": "Failed to search Spotify API"}
@@ -119,19 +116,34 @@ def search_spotify_tracks_func(query: str, limit: int = 10) -> dict:
             "tracks": results
         }
         
+    except SpotifyAuthError:
+        return {"error": "Failed to authenticate with Spotify API"}
     except Exception as e:
         return {"error": f"Spotify search error: {str(e)}"}
 
-def search_restaurants_func(location: str, cuisine: str = "", budget: str = "", count: int = 20) -> dict:
-    """レストランを検索する関数（UI用）"""
+def search_restaurants_func(location: str, cuisine: str = "", budget: str = "", count: int = 20, on_result=None) -> dict:
+    """レストランを検索する関数（UI用）
+    
+    HotPepperとGoogle Mapsを並列に検索し、締め切りに間に合った結果だけで統合します。
+    
+    Args:
+        location: 検索する場所
+        cuisine: 料理ジャンル
+        budget: 予算
+        count: 取得する件数
+        on_result: プロバイダー毎の結果が届いた時点で呼ばれるコールバック (name, outcome)
+    """
     try:
-        # HotPepperで検索
-        hp_result = search_hotpepper_restaurants(location, cuisine, budget)
-        hp_restaurants = hp_result.get("restaurants", []) if "error" not in hp_result else []
-        
-        # Google Mapsで検索
-        gm_result = search_google_maps_restaurants(location, cuisine)
-        gm_restaurants = gm_result.get("restaurants", []) if "error" not in gm_result else []
+        # HotPepper・Google Mapsを同時に検索（プロバイダー毎の締め切り付き）
+        outcomes = run_sync(fan_out(
+            {
+                "hotpepper": lambda: search_hotpepper_restaurants(location, cuisine, budget),
+                "google_maps": lambda: search_google_maps_restaurants(location, cuisine),
+            },
+            on_result=on_result,
+        ))
+        hp_restaurants = provider_restaurants(outcomes["hotpepper"])
+        gm_restaurants = provider_restaurants(outcomes["google_maps"])
         
         # 結果を統合
         merged_restaurants = merge_restaurant_info(hp_restaurants, gm_restaurants)
@@ -143,13 +155,25 @@ def search_restaurants_func(location: str, cuisine: str = "", budget: str = "",
             "message": f"{len(merged_restaurants)}件のレストランが見つかりました",
             "restaurants": merged_restaurants,
             "hotpepper_count": len(hp_restaurants),
-            "google_maps_count": len(gm_restaurants)
+            "google_maps_count": len(gm_restaurants),
+            "provider_latency_ms": {name: outcome["latency_ms"] for name, outcome in outcomes.items()},
+            "provider_status": {name: outcome["status"] for name, outcome in outcomes.items()},
+            # いずれかのプロバイダーが失敗・タイムアウトした場合は部分的な結果
+            "partial": any(outcome["status"] != "ok" for outcome in outcomes.values())
         }
         
     except Exception as e:
         return {"error": f"Restaurant search error: {str(e)}"}
 
+def provider_restaurants(outcome: dict) -> list:
+    """ファンアウト結果からレストラン一覧を取り出す（失敗・タイムアウト時は空）"""
+    if outcome["status"] != "ok":
+        return []
+    return outcome["result"].get("restaurants", [])
+
 # --- Helper Functions ---
+PROVIDER_LABELS = {"hotpepper": "HotPepper", "google_maps": "Google Maps"}
+
 def search_hotpepper_restaurants(location: str, cuisine: str = "", budget: str = "") -> dict:
     """HotPepperでレストランを検索する"""
     try:
@@ -187,7 +211,9 @@ def search_hotpepper_restaurants(location: str, cuisine: str = "", budget: str =
                 'cuisine': shop['genre']['name'],
                 'budget': shop['budget']['name'],
                 'rating': shop.get('rating', '評価なし'),
-                'url': shop['urls']['pc']
+                'url': shop['urls']['pc'],
+                'lat': shop.get('lat'),
+                'lng': shop.get('lng')
             }
             restaurants.append(restaurant_info)
         
@@ -234,7 +260,9 @@ def search_google_maps_restaurants(location: str, cuisine: str = "", radius: int
                 'address': place.get('formatted_address', '住所不明'),
                 'rating': place.get('rating', '評価なし'),
                 'price_level': place.get('price_level', '価格不明'),
-                'google_maps_url': f"https://www.google.com/maps/place/?q=place_id:{place['place_id']}"
+                'google_maps_url': f"https://www.google.com/maps/place/?q=place_id:{place['place_id']}",
+                'lat': place.get('geometry', {}).get('location', {}).get('lat'),
+                'lng': place.get('geometry', {}).get('location', {}).get('lng')
             }
             restaurants.append(restaurant_info)
         
@@ -247,31 +275,8 @@ def search_google_maps_restaurants(location: str, cuisine: str = "", radius: int
         return {"error": f"Google Maps search error: {str(e)}"}
 
 def merge_restaurant_info(hp_list, gm_list):
-    """HotPepperとGoogle Mapsの結果を統合する"""
-    merged = []
-    for hp in hp_list:
-        best_match = None
-        for gm in gm_list:
-            if (hp['name'] and gm['name'] and 
-                (hp['name'] in gm['name'] or gm['name'] in hp['name'])):
-                best_match = gm
-                break
-        
-        merged_info = hp.copy()
-        if best_match:
-            if not merged_info.get('rating') or merged_info['rating'] == '評価なし':
-                merged_info['rating'] = best_match.get('rating', merged_info.get('rating'))
-            merged_info['google_rating'] = best_match.get('rating')
-            merged_info['google_maps_url'] = best_match.get('google_maps_url')
-        merged.append(merged_info)
-    
-    # Add Google-only restaurants
-    hp_names = set([r['name'] for r in hp_list])
-    for gm in gm_list:
-        if gm['name'] not in hp_names:
-            merged.append(gm)
-    
-    return merged
+    """HotPepperとGoogle Mapsの結果を統合する（正規化した店名・住所・座標で名寄せ）"""
+    return merge_restaurants(hp_list, gm_list)
 
 def show_spotify_embeds_streamlit(tracks, title="Spotify埋め込みプレイヤー"):
     """Spotify埋め込みプレイヤーを表示"""
@@ -524,9 +529,11 @@ if "mcp_config_text" not in st.session_state:
 # --- MCP Functions ---
 async def cleanup_mcp_client():
     """
-    Safely terminates the existing MCP client.
+    Releases this session's reference to the MCP servers.
 
-    Properly releases resources if an existing client exists.
+    The server processes are shared process-wide by the MCP connection
+    manager and stay warm across reruns and browser sessions; they are
+    stopped when idle or at process exit.
     """
     if "mcp_client" in st.session_state and st.session_state.mcp_client is not None:
         try:
@@ -560,16 +567,17 @@ async def initialize_session(mcp_config=None):
             # config.jsonファイルから設定を読み込む
             mcp_config = load_config_from_json()
         
-        # MCPクライアントの初期化
-        # Initialize MCP client
-        # このクライアントはconfig.jsonで定義された各MCPサーバーに接続します
-        client = MultiServerMCPClient(mcp_config)
-        
         # 各MCPサーバーからツールを取得
         # Get tools from each MCP server
         # 例：get_current_time, tavily_search, spotify_searchなどのツール
-        mcp_tools = await client.get_tools()
-        st.session_state.mcp_client = client
+        # サーバーはプロセス全体で共有され、起動済みなら再利用される（再実行のたびに起動しない）
+        manager = get_mcp_manager()
+        mcp_tools = await manager.aget_tools(mcp_config)
+        st.session_state.mcp_client = manager
+
+        # 起動に失敗した・時間内に起動しなかったサーバーは除外して続行する
+        for server_name, reason in manager.unavailable(mcp_config).items():
+            st.warning(f"⚠️ MCP server '{server_name}' is unavailable: {reason}")
 
         # カスタムツールを定義
         custom_tools = [
@@ -593,6 +601,11 @@ async def initialize_session(mcp_config=None):
             max_tokens=16000,  # Default for OpenAI models
         )
 
+        # LLMに送る会話履歴を予算内（MEMORY_MAX_TOKENS）に抑え、溢れた古いターンはバックグラウンドで要約する
+        # Bound the history sent to the LLM; older turns are summarised in the background
+        memory_policy = ConversationMemory(summarizer=llm_summarizer(model))
+        st.session_state.memory_policy = memory_policy
+
         # React Agentの作成
         # Create React Agent
         # このエージェントは以下の要素で構成されます：
@@ -607,6 +620,7 @@ async def initialize_session(mcp_config=None):
             model,        # 使用するLLMモデル / LLM model to use
             all_tools,    # MCPサーバーから取得したツール + カスタムツール / Tools obtained from MCP servers + custom tools
             checkpointer=MemorySaver(),  # 会話の状態を保存するチェックポイント / Checkpoint to save conversation state
+            pre_model_hook=memory_policy.pre_model_hook,  # 会話履歴の予算・要約 / Token-budgeted history with rolling summary
         )
         
         # セッション状態の更新
@@ -962,9 +976,27 @@ with tab2:
         restaurant_submitted = st.form_submit_button("検索")
     
     if restaurant_submitted:
+        # プロバイダー毎の結果を届いた順に表示（遅いプロバイダーを待たずに行を出す）
+        stream_placeholder = st.empty()
+        provider_lines = []
+        streamed_rows = []
+        
+        def show_provider_result(provider_name, outcome):
+            label = PROVIDER_LABELS.get(provider_name, provider_name)
+            if outcome["status"] == "ok":
+                provider_restaurant_list = outcome["result"].get("restaurants", [])
+                provider_lines.append(f"✅ **{label}**: {len(provider_restaurant_list)}件（{outcome['latency_ms']:.0f} ms）")
+                for restaurant in provider_restaurant_list[:10]:
+                    streamed_rows.append(f"| {label} | {restaurant.get('name', '')} | {restaurant.get('address', '')} |")
+            else:
+                provider_lines.append(f"⚠️ **{label}**: {outcome.get('error', outcome['status'])}（{outcome['latency_ms']:.0f} ms）")
+            table = "| 提供元 | 店名 | 住所 |\n|---|---|---|\n" + "\n".join(streamed_rows) if streamed_rows else ""
+            stream_placeholder.markdown("  \n".join(provider_lines) + "\n\n" + table)
+        
         with st.spinner("HotPepper・Google両方から検索中..."):
             # Tool関数を直接呼び出す代わりに、通常の関数として呼び出す
-            result = search_restaurants_func(location, cuisine, budget)
+            result = search_restaurants_func(location, cuisine, budget, on_result=show_provider_result)
+        stream_placeholder.empty()
         
         if 'error' in result:
             st.error(f"エラー: {result['error']}")
@@ -984,6 +1016,16 @@ with tab2:
                 with col3:
                     st.metric("Google Maps", result.get('google_maps_count', 0))
                 
+                # プロバイダー毎の応答時間
+                latency = result.get('provider_latency_ms', {})
+                status = result.get('provider_status', {})
+                st.caption(" / ".join(
+                    f"{PROVIDER_LABELS.get(name, name)}: {ms:.0f} ms" + ("" if status.get(name) == "ok" else f"（{status.get(name)}）")
+                    for name, ms in latency.items()
+                ))
+                if result.get('partial'):
+                    st.warning("一部のプロバイダーから結果を取得できなかったため、取得できた結果のみを表示しています。")
+                
                 st.divider()
                 
                 for i, restaurant in enumerate(restaurants[:10], 1):
@@ -1048,9 +1090,20 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
     """Creates a streaming callback function."""
     accumulated_text = []
     accumulated_tool = []
+    # Tokens are coalesced into frames (50 ms / 200 chars) instead of re-rendering per token
+    text_renderer = BufferedMarkdownRenderer(text_placeholder.markdown)
+    tool_renderer = BufferedExpanderRenderer(tool_placeholder, "🔧 Tool Call Information")
+
+    def add_text(text):
+        accumulated_text.append(text)
+        text_renderer.append(text)
+
+    def add_tool(text, label="🔧 Tool Call Information"):
+        accumulated_tool.append(text)
+        tool_renderer.set_label(label)
+        tool_renderer.append(text)
 
     def callback_func(message: dict):
-        nonlocal accumulated_text, accumulated_tool
         message_content = message.get("content", None)
 
         if isinstance(message_content, AIMessageChunk):
@@ -1060,22 +1113,15 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
                 message_chunk = content[0]
                 # Process text type
                 if message_chunk["type"] == "text":
-                    accumulated_text.append(message_chunk["text"])
-                    text_placeholder.markdown("".join(accumulated_text))
+                    add_text(message_chunk["text"])
                 # Process tool use type
                 elif message_chunk["type"] == "tool_use":
                     if "partial_json" in message_chunk:
-                        accumulated_tool.append(message_chunk["partial_json"])
+                        add_tool(message_chunk["partial_json"])
                     else:
                         tool_call_chunks = message_content.tool_call_chunks
                         tool_call_chunk = tool_call_chunks[0]
-                        accumulated_tool.append(
-                            "\n```json\n" + str(tool_call_chunk) + "\n```\n"
-                        )
-                    with tool_placeholder.expander(
-                        "🔧 Tool Call Information", expanded=True
-                    ):
-                        st.markdown("".join(accumulated_tool))
+                        add_tool("\n```json\n" + str(tool_call_chunk) + "\n```\n")
             # Process if tool_calls attribute exists (mainly occurs in OpenAI models)
             elif (
                 hasattr(message_content, "tool_calls")
@@ -1083,59 +1129,45 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
                 and len(message_content.tool_calls[0]["name"]) > 0
             ):
                 tool_call_info = message_content.tool_calls[0]
-                accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-                with tool_placeholder.expander(
-                    "🔧 Tool Call Information", expanded=True
-                ):
-                    st.markdown("".join(accumulated_tool))
+                add_tool("\n```json\n" + str(tool_call_info) + "\n```\n")
             # Process if content is a simple string
             elif isinstance(content, str):
-                accumulated_text.append(content)
-                text_placeholder.markdown("".join(accumulated_text))
+                add_text(content)
             # Process if invalid tool call information exists
             elif (
                 hasattr(message_content, "invalid_tool_calls")
                 and message_content.invalid_tool_calls
             ):
                 tool_call_info = message_content.invalid_tool_calls[0]
-                accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-                with tool_placeholder.expander(
-                    "🔧 Tool Call Information (Invalid)", expanded=True
-                ):
-                    st.markdown("".join(accumulated_tool))
+                add_tool(
+                    "\n```json\n" + str(tool_call_info) + "\n```\n",
+                    label="🔧 Tool Call Information (Invalid)",
+                )
             # Process if tool_call_chunks attribute exists
             elif (
                 hasattr(message_content, "tool_call_chunks")
                 and message_content.tool_call_chunks
             ):
                 tool_call_chunk = message_content.tool_call_chunks[0]
-                accumulated_tool.append(
-                    "\n```json\n" + str(tool_call_chunk) + "\n```\n"
-                )
-                with tool_placeholder.expander(
-                    "🔧 Tool Call Information", expanded=True
-                ):
-                    st.markdown("".join(accumulated_tool))
+                add_tool("\n```json\n" + str(tool_call_chunk) + "\n```\n")
             # Process if tool_calls exists in additional_kwargs (supports various model compatibility)
             elif (
                 hasattr(message_content, "additional_kwargs")
                 and "tool_calls" in message_content.additional_kwargs
             ):
                 tool_call_info = message_content.additional_kwargs["tool_calls"][0]
-                accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-                with tool_placeholder.expander(
-                    "🔧 Tool Call Information", expanded=True
-                ):
-                    st.markdown("".join(accumulated_tool))
+                add_tool("\n```json\n" + str(tool_call_info) + "\n```\n")
         # Process if it's a tool message (tool response)
         elif isinstance(message_content, ToolMessage):
-            accumulated_tool.append(
-                "\n```json\n" + str(message_content.content) + "\n```\n"
-            )
-            with tool_placeholder.expander("🔧 Tool Call Information", expanded=True):
-                st.markdown("".join(accumulated_tool))
+            add_tool("\n```json\n" + str(message_content.content) + "\n```\n")
         return None
 
+    def flush():
+        # Render whatever is still buffered once the stream has ended
+        text_renderer.flush()
+        tool_renderer.flush()
+
+    callback_func.flush = flush
     return callback_func, accumulated_text, accumulated_tool
 
 async def process_query(query, text_placeholder, tool_placeholder, timeout_seconds=60):
@@ -1161,6 +1193,9 @@ async def process_query(query, text_placeholder, tool_placeholder, timeout_secon
             except asyncio.TimeoutError:
                 error_msg = f"⏱️ Request time exceeded {timeout_seconds} seconds. Please try again later."
                 return {"error": error_msg}, error_msg, ""
+            finally:
+                # タイムアウト・エラー時も、まだ描画していないトークンを表示する
+                streaming_callback.flush()
 
             final_text = "".join(accumulated_text_obj)
             final_tool = "".join(accumulated_tool_obj)
@@ -1395,6 +1430,34 @@ with tab3:
                 "⚠️ MCP server and agent are not initialized. Please click the 'Apply Settings' button in the left sidebar to initialize."
             )
 
+def _music_route(query: str) -> dict:
+    music_query = extract_music_query(query)
+    if music_query:
+        return {
+            "type": "music",
+            "query": music_query,
+            "tool_name": "search_tracks",
+            "tool_args": {"query": music_query, "limit": 10}
+        }
+    return None
+
+def _restaurant_route(query: str, infer_location: bool = False) -> dict:
+    location, cuisine, budget = extract_restaurant_params(query)
+    if not location and infer_location:
+        # 「〇〇のレストラン」形式でない言い換えは、文中の既知のエリア名を使う
+        area = resolve_area(query)
+        location = area.name if area else ""
+    if location:
+        return {
+            "type": "restaurant",
+            "location": location,
+            "cuisine": cuisine,
+            "budget": budget,
+            "tool_name": "search_restaurants",
+            "tool_args": {"location": location, "cuisine": cuisine, "budget": budget, "count": 20}
+        }
+    return None
+
 def process_chat_query(query: str) -> dict:
     """チャットクエリを処理し、適切な機能を呼び出す"""
     query_lower = query.lower()
@@ -1403,29 +1466,32 @@ def process_chat_query(query: str) -> dict:
     music_keywords = ['音楽', '楽曲', '曲', '歌', 'アーティスト', 'ミュージック', 'spotify', '音楽を教えて', '曲を教えて']
     if any(keyword in query_lower for keyword in music_keywords):
         # 音楽検索のクエリを抽出
-        music_query = extract_music_query(query)
-        if music_query:
-            return {
-                "type": "music",
-                "query": music_query,
-                "tool_name": "search_tracks",
-                "tool_args": {"query": music_query, "limit": 10}
-            }
+        route = _music_route(query)
+        if route:
+            return route
     
     # レストラン検索のキーワードをチェック
     restaurant_keywords = ['レストラン', '食事', 'お店', '店', '食べ', 'ご飯', 'グルメ', 'hotpepper', 'レストランを教えて', 'お店を教えて']
     if any(keyword in query_lower for keyword in restaurant_keywords):
         # レストラン検索のパラメータを抽出
-        location, cuisine, budget = extract_restaurant_params(query)
-        if location:
-            return {
-                "type": "restaurant",
-                "location": location,
-                "cuisine": cuisine,
-                "budget": budget,
-                "tool_name": "search_restaurants",
-                "tool_args": {"location": location, "cuisine": cuisine, "budget": budget, "count": 20}
-            }
+        route = _restaurant_route(query)
+        if route:
+            return route
+    
+    # キーワードに一致しない言い換えは例文との意味的な類似度で判定（しきい値未満は一般応答）
+    try:
+        match = get_semantic_router().route(query)
+    except Exception as e:
+        print(f"Semantic router error: {e}")
+        match = None
+    if match is not None and match.intent == "music":
+        route = _music_route(query)
+        if route:
+            return {**route, "routed_by": "semantic", "similarity": match.score}
+    if match is not None and match.intent == "restaurant":
+        route = _restaurant_route(query, infer_location=True)
+        if route:
+            return {**route, "routed_by": "semantic", "similarity": match.score}
     
     # その他の質問の場合は一般的な応答
     return {
@@ -0,0 +1,156 @@
+"""
+Benchmark for the restaurant merge / dedup engine.
+
+Generates synthetic HotPepper / Google Maps result lists where the same
+shop is written differently by each provider (full-width characters,
+spaces, katakana vs hiragana, "店" suffixes, address formats), then compares
+the previous nested-loop substring merge with restaurant_dedup on time,
+precision and recall.
+
+レストラン名寄せ処理のベンチマーク（合成データ、APIキー不要）。
+
+Usage:
+    python benchmark_restaurant_dedup.py --sizes 100 1000 5000
+"""
+
+import argparse
+import random
+import time
+import unicodedata
+from typing import Any, Dict, List, Set, Tuple
+
+from restaurant_dedup import match_restaurants
+
+KATAKANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワ"
+GENRES = ["焼肉", "寿司", "ラーメン", "居酒屋", "ビストロ", "カフェ", "中華", "そば", "鉄板焼", "バル"]
+WARDS = ["品川区大崎", "渋谷区道玄坂", "新宿区西新宿", "港区六本木", "中央区銀座"]
+
+
+def to_hiragana(text: str) -> str:
+    return "".join(chr(ord(c) - 0x60) if "ァ" <= c <= "ヶ" else c for c in text)
+
+
+def to_fullwidth(text: str) -> str:
+    return "".join(chr(ord(c) + 0xFEE0) if "!" <= c <= "~" else ("　" if c == " " else c) for c in text)
+
+
+def make_dataset(size: int, overlap: float, seed: int = 0) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Set[Tuple[int, int]]]:
+    """Returns (hotpepper rows, google rows, true (hp index, gm index) pairs)."""
+    rng = random.Random(seed)
+    hp, gm, truth = [], [], set()
+    shared = int(size * overlap)
+
+    def shop(i: int) -> Dict[str, Any]:
+        name = "".join(rng.choice(KATAKANA) for _ in range(rng.randint(3, 6)))
+        ward = rng.choice(WARDS)
+        chome, ban, go = rng.randint(1, 9), rng.randint(1, 30), rng.randint(1, 20)
+        return {
+            "base": f"{rng.choice(GENRES)} {name}",
+            "branch": ward[-2:],
+            "ward": ward,
+            "addr": (chome, ban, go),
+            "lat": 35.60 + rng.random() * 0.1,
+            "lng": 139.65 + rng.random() * 0.1,
+        }
+
+    def hp_row(s: Dict[str, Any]) -> Dict[str, Any]:
+        chome, ban, go = s["addr"]
+        return {
+            "name": f"{s['base']} {s['branch']}店",
+            "address": f"東京都{s['ward']}{chome}-{ban}-{go}",
+            "lat": f"{s['lat']:.6f}",
+            "lng": f"{s['lng']:.6f}",
+            "rating": "評価なし",
+        }
+
+    def gm_row(s: Dict[str, Any]) -> Dict[str, Any]:
+        chome, ban, go = s["addr"]
+        name = s["base"].replace(" ", "")
+        if rng.random() < 0.5:
+            name = to_hiragana(name)
+        if rng.random() < 0.3:
+            name = to_fullwidth(name)
+        return {
+            "name": name + (s["branch"] if rng.random() < 0.5 else ""),
+            "address": f"日本、〒141-0032 東京都{s['ward']}{chome}丁目{ban}−{go}",
+            # 数メートルの位置ずれ
+            "lat": s["lat"] + rng.uniform(-0.0002, 0.0002),
+            "lng": s["lng"] + rng.uniform(-0.0002, 0.0002),
+            "rating": round(rng.uniform(3.0, 4.8), 1),
+            "google_maps_url": f"https://www.google.com/maps/place/?q=place_id:{i}",
+        }
+
+    for i in range(shared):
+        s = shop(i)
+        truth.add((len(hp), len(gm)))
+        hp.append(hp_row(s))
+        gm.append(gm_row(s))
+    for i in range(shared, size):
+        hp.append(hp_row(shop(i)))
+        gm.append(gm_row(shop(i)))
+
+    order = list(range(len(gm)))
+    rng.shuffle(order)
+    position = {old: new for new, old in enumerate(order)}
+    gm = [gm[old] for old in order]
+    truth = {(i, position[j]) for i, j in truth}
+    return hp, gm, truth
+
+
+def legacy_match(hp_list: List[Dict[str, Any]], gm_list: List[Dict[str, Any]]) -> Set[Tuple[int, int]]:
+    """The previous merge_restaurant_info matching: nested loop, raw substring test."""
+    pairs = set()
+    for i, hp in enumerate(hp_list):
+        for j, gm in enumerate(gm_list):
+            if hp["name"] and gm["name"] and (hp["name"] in gm["name"] or gm["name"] in hp["name"]):
+                pairs.add((i, j))
+                break
+    return pairs
+
+
+def quality(found: Set[Tuple[int, int]], truth: Set[Tuple[int, int]]) -> Tuple[float, float]:
+    hits = len(found & truth)
+    precision = hits / len(found) if found else 1.0
+    recall = hits / len(truth) if truth else 1.0
+    return precision, recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--overlap", type=float, default=0.6, help="share of shops listed by both providers")
+    parser.add_argument("--legacy-max", type=int, default=2000, help="skip the O(n*m) baseline above this size")
+    args = parser.parse_args()
+
+    print(f"{'rows/side':>9} | {'legacy ms':>10} {'P':>5} {'R':>5} | {'dedup ms':>10} {'P':>5} {'R':>5}")
+    for size in args.sizes:
+        hp, gm, truth = make_dataset(size, args.overlap)
+
+        if size <= args.legacy_max:
+            start = time.perf_counter()
+            legacy = legacy_match(hp, gm)
+            legacy_ms = (time.perf_counter() - start) * 1000
+            lp, lr = quality(legacy, truth)
+            legacy_cols = f"{legacy_ms:10.1f} {lp:5.2f} {lr:5.2f}"
+        else:
+            legacy_cols = f"{'skipped':>10} {'-':>5} {'-':>5}"
+
+        start = time.perf_counter()
+        found = {(i, j) for i, j, _ in match_restaurants(hp, gm)}
+        dedup_ms = (time.perf_counter() - start) * 1000
+        p, r = quality(found, truth)
+        print(f"{size:>9} | {legacy_cols} | {dedup_ms:10.1f} {p:5.2f} {r:5.2f}")
+
+        # 座標なし（名前インデックスのみ）の場合
+        for row in hp + gm:
+            row.pop("lat", None)
+            row.pop("lng", None)
+        start = time.perf_counter()
+        found = {(i, j) for i, j, _ in match_restaurants(hp, gm)}
+        dedup_ms = (time.perf_counter() - start) * 1000
+        p, r = quality(found, truth)
+        print(f"{'(no geo)':>9} | {'':>10} {'':>5} {'':>5} | {dedup_ms:10.1f} {p:5.2f} {r:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
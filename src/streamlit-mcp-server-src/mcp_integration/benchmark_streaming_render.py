@@ -0,0 +1,161 @@
+"""
+Benchmark for the Streamlit streaming callback: per-token re-rendering vs
+BufferedMarkdownRenderer.
+
+Replays a recorded token stream (by default a synthetic 5k-token answer
+preceded by streamed tool-call JSON) through:
+
+- legacy: what get_streaming_callback() used to do — join all text and
+  re-render the markdown on every token, re-create the tool expander and
+  re-join the tool log on every tool chunk;
+- buffered: BufferedMarkdownRenderer / BufferedExpanderRenderer with a time
+  and size budget (--interval, --max-chars).
+
+The stream is replayed on a virtual clock using the recorded inter-token
+delays, so the frame budget behaves as in a live stream without sleeping.
+The placeholders serialise every rendered text (like Streamlit sending the
+element to the browser) and count renders, bytes and expander creations.
+
+ストリーミング表示のコールバックを、毎トークン全文再描画と時間・文字数予算での
+まとめ描画で比較する（記録済みストリームを仮想時計で再生）。
+
+Usage:
+    python benchmark_streaming_render.py --tokens 5000
+    python benchmark_streaming_render.py --recording stream.json
+    python benchmark_streaming_render.py --save stream.json   # write the synthetic recording
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import List, Tuple
+
+from utils import BufferedExpanderRenderer, BufferedMarkdownRenderer
+
+WORDS = [
+    "渋谷", "駅", "から", "徒歩", "5分", "の", "イタリアン", "は", "、", "ランチ", "が", "人気", "です", "。",
+    " **おすすめ**", "\n- ", "予算", "3000円", "前後", " pasta", " pizza", " and", " wine", "\n\n",
+    "営業時間", "：", "11:00", "〜", "22:00", "（", "定休日", "なし", "）", " [地図](https://maps.google.com/?q=shibuya)",
+]
+
+# (delay since previous chunk in ms, "text" | "tool", chunk)
+Recording = List[Tuple[float, str, str]]
+
+
+def synthesize(tokens: int, tool_chunks: int = 200, seed: int = 0) -> Recording:
+    rng = random.Random(seed)
+    recording: Recording = []
+    args = json.dumps({"location": "渋谷", "cuisine": "イタリアン", "budget": "3000円"}, ensure_ascii=False)
+    for i in range(tool_chunks):
+        recording.append((rng.uniform(5, 25), "tool", args[i % len(args)]))
+    for _ in range(tokens):
+        recording.append((rng.uniform(8, 40), "text", rng.choice(WORDS)))
+    return recording
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Placeholder:
+    """Stand-in for st.empty(): serialises what it renders, counts renders."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def markdown(self, text):
+        self.stats["renders"] += 1
+        self.stats["bytes"] += len(text.encode("utf-8"))
+
+    def expander(self, label, expanded=False):
+        self.stats["expanders"] += 1
+        return Expander(self.stats)
+
+    def empty(self):
+        return Placeholder(self.stats)
+
+
+class Expander(Placeholder):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def replay_legacy(recording: Recording, clock: VirtualClock):
+    stats = {"renders": 0, "bytes": 0, "expanders": 0}
+    text_placeholder, tool_placeholder = Placeholder(stats), Placeholder(stats)
+    accumulated_text, accumulated_tool = [], []
+    for delay_ms, kind, chunk in recording:
+        clock.now += delay_ms / 1000
+        if kind == "text":
+            accumulated_text.append(chunk)
+            text_placeholder.markdown("".join(accumulated_text))
+        else:
+            accumulated_tool.append(chunk)
+            with tool_placeholder.expander("🔧 Tool Call Information", expanded=True) as expander:
+                expander.markdown("".join(accumulated_tool))
+    return "".join(accumulated_text), stats
+
+
+def replay_buffered(recording: Recording, clock: VirtualClock, interval: float, max_chars: int):
+    stats = {"renders": 0, "bytes": 0, "expanders": 0}
+    text_placeholder, tool_placeholder = Placeholder(stats), Placeholder(stats)
+    text_renderer = BufferedMarkdownRenderer(text_placeholder.markdown, interval, max_chars, clock=clock)
+    tool_renderer = BufferedExpanderRenderer(
+        tool_placeholder, "🔧 Tool Call Information", interval=interval, max_chars=max_chars, clock=clock
+    )
+    for delay_ms, kind, chunk in recording:
+        clock.now += delay_ms / 1000
+        (text_renderer if kind == "text" else tool_renderer).append(chunk)
+    text_renderer.flush()
+    tool_renderer.flush()
+    return text_renderer.text, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=5000, help="text tokens in the synthetic recording")
+    parser.add_argument("--recording", help="JSON list of [delay_ms, kind, chunk] to replay")
+    parser.add_argument("--save", help="write the synthetic recording to this path and exit")
+    parser.add_argument("--interval", type=float, default=0.05, help="frame interval in seconds")
+    parser.add_argument("--max-chars", type=int, default=200, help="pending characters that force a frame")
+    args = parser.parse_args()
+
+    if args.recording:
+        with open(args.recording, encoding="utf-8") as f:
+            recording = [tuple(entry) for entry in json.load(f)]
+    else:
+        recording = synthesize(args.tokens)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(recording, f, ensure_ascii=False)
+        print(f"saved {len(recording)} chunks to {args.save}")
+        return
+
+    results = {}
+    for name, replay in (
+        ("legacy", lambda clock: replay_legacy(recording, clock)),
+        ("buffered", lambda clock: replay_buffered(recording, clock, args.interval, args.max_chars)),
+    ):
+        start = time.perf_counter()
+        text, stats = replay(VirtualClock())
+        results[name] = (text, stats, (time.perf_counter() - start) * 1000)
+
+    stream_seconds = sum(delay for delay, _, _ in recording) / 1000
+    print(f"chunks: {len(recording)}  ({stream_seconds:.0f} s of recorded stream, "
+          f"frame budget {args.interval * 1000:.0f} ms / {args.max_chars} chars)")
+    print(f"{'callback':<10}{'cpu ms':>10}{'renders':>10}{'MB rendered':>13}{'expanders':>11}")
+    for name, (text, stats, elapsed_ms) in results.items():
+        print(f"{name:<10}{elapsed_ms:>10.1f}{stats['renders']:>10}{stats['bytes'] / 1e6:>13.2f}{stats['expanders']:>11}")
+    print(f"same final text: {results['legacy'][0] == results['buffered'][0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Restaurant merge / dedup engine for HotPepper and Google Maps results.
+
+Names are normalised (NFKC, katakana folded to hiragana, spaces,
+punctuation and branch suffixes such as "店" removed) so the same shop
+matches even when the providers format its name differently. Candidate
+pairs are blocked instead of comparing every pair:
+
+- by geohash cell (plus the 8 neighbouring cells) when both rows have coordinates
+- by a character-bigram index over normalised names otherwise
+
+Each candidate is scored on name similarity plus address similarity (and
+rejected when the coordinates are too far apart), and pairs are assigned
+one-to-one, best score first.
+
+HotPepperとGoogle Mapsの検索結果を名寄せする。名前の正規化、ジオハッシュ／
+名前バイグラムによる候補の絞り込み、名前＋住所のスコアで対応付けを行う。
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+GEOHASH_PRECISION = 7  # 約150m四方のセル
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+MATCH_THRESHOLD = 0.6
+# 座標がこれ以上離れていれば別の店とみなす（メートル）
+MAX_DISTANCE_M = 300.0
+# 名前インデックスで1行あたりに評価する候補数の上限
+MAX_NAME_CANDIDATES = 20
+# 候補を引くのに使うバイグラム数（出現頻度の低い順）
+NAME_PROBE_GRAMS = 4
+
+# 店名末尾の支店表記など（長いものから除去）
+NAME_SUFFIXES = ("本店", "支店", "別館", "本館", "店")
+_BRACKETS = re.compile(r"[\(（\[【〔「『].*?[\)）\]】〕」』]")
+_NOT_WORD = re.compile(r"[\s\W_]+")
+_POSTAL = re.compile(r"〒?\d{3}-\d{4}")
+_CHOME = re.compile(r"(\d+)(?:丁目|番地|番|号)")
+_SEPARATORS = re.compile(r"[\s、,]+")
+_DASHES = re.compile(r"(?<=\d)[‐‑‒–—―−ー](?=\d)")
+
+
+# --- Normalisation ---
+
+def fold_kana(text: str) -> str:
+    """Folds katakana to hiragana so "ラーメン" and "らーめん" compare equal."""
+    return "".join(
+        chr(ord(char) - 0x60) if "ァ" <= char <= "ヶ" else char
+        for char in text
+    )
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalises a restaurant name for matching.
+
+    Args:
+        name (str): Raw name from a provider
+
+    Returns:
+        str: NFKC-normalised, lower-cased, kana-folded name without spaces,
+        punctuation, bracketed notes or a trailing branch suffix
+    """
+    text = unicodedata.normalize("NFKC", name or "").lower()
+    text = _BRACKETS.sub("", text)
+    text = fold_kana(_NOT_WORD.sub("", text))
+    for suffix in NAME_SUFFIXES:
+        if text.endswith(suffix) and len(text) > len(suffix):
+            text = text[: -len(suffix)]
+            break
+    return text
+
+
+def normalize_address(address: str) -> str:
+    """
+    Normalises an address for matching.
+
+    Strips the country prefix and postal code that Google Maps adds and
+    writes 丁目/番/号 as hyphenated numbers.
+    """
+    text = unicodedata.normalize("NFKC", address or "")
+    text = _POSTAL.sub("", text)
+    if text.startswith("日本"):
+        text = text[len("日本"):]
+    text = _CHOME.sub(r"\1-", text)
+    text = _DASHES.sub("-", text)
+    text = _SEPARATORS.sub("", text)
+    return text.rstrip("-")
+
+
+def bigrams(text: str) -> Set[str]:
+    """Returns the character bigrams of ``text`` (the text itself if shorter)."""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def dice(a: Set[str], b: Set[str]) -> float:
+    """Dice coefficient of two bigram sets."""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+# --- Geohash ---
+
+def _cell_size(precision: int) -> Tuple[float, float]:
+    lat_bits = 5 * precision // 2
+    lng_bits = (5 * precision + 1) // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def geohash_cell(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> Tuple[int, int]:
+    """
+    Returns the (row, column) index of the geohash cell containing the coordinates.
+
+    Blocking compares these integer cells directly; they identify exactly
+    the same grid as the geohash strings without the bit interleaving.
+    """
+    dlat, dlng = _cell_size(precision)
+    lat_cells, lng_cells = round(180.0 / dlat), round(360.0 / dlng)
+    return min(int((lat + 90.0) / dlat), lat_cells - 1), min(int((lng + 180.0) / dlng), lng_cells - 1)
+
+
+def geohash_encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encodes coordinates as a geohash string."""
+    lat_index, lng_index = geohash_cell(lat, lng, precision)
+    lat_bits = 5 * precision // 2
+    lng_bits = (5 * precision + 1) // 2
+    value = 0
+    # 経度→緯度の順にビットを交互に並べる
+    for k in range(5 * precision):
+        if k % 2 == 0:
+            lng_bits -= 1
+            value = (value << 1) | ((lng_index >> lng_bits) & 1)
+        else:
+            lat_bits -= 1
+            value = (value << 1) | ((lat_index >> lat_bits) & 1)
+    return "".join(GEOHASH_ALPHABET[(value >> (5 * (precision - 1 - i))) & 31] for i in range(precision))
+
+
+def geohash_neighbors(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> Set[Tuple[int, int]]:
+    """Returns the geohash cell of the coordinates and its 8 neighbours."""
+    lat_index, lng_index = geohash_cell(lat, lng, precision)
+    lng_cells = round(360.0 / _cell_size(precision)[1])
+    return {
+        (lat_index + i, (lng_index + j) % lng_cells)
+        for i in (-1, 0, 1)
+        for j in (-1, 0, 1)
+    }
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * 6371000.0 * math.asin(math.sqrt(a))
+
+
+def coordinates(row: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """Returns (lat, lng) of a result row, or None if missing or invalid."""
+    try:
+        lat, lng = float(row.get("lat")), float(row.get("lng"))
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0) or (lat == 0.0 and lng == 0.0):
+        return None
+    return lat, lng
+
+
+# --- Matching ---
+
+class _Prepared:
+    __slots__ = ("name", "name_grams", "address_grams", "coords")
+
+    def __init__(self, row: Dict[str, Any]):
+        self.name = normalize_name(row.get("name", ""))
+        self.name_grams = bigrams(self.name)
+        address = normalize_address(row.get("address", ""))
+        self.address_grams = bigrams(address) if address and address != "住所不明" else set()
+        self.coords = coordinates(row)
+
+
+def score_pair(a: "_Prepared", b: "_Prepared") -> float:
+    """
+    Scores how likely two prepared rows describe the same restaurant (0..1).
+
+    Name similarity is the bigram Dice coefficient (1.0 when one normalised
+    name contains the other); address similarity is blended in when both
+    rows have an address, and distant coordinates veto the match.
+    """
+    if not a.name or not b.name:
+        return 0.0
+    if a.coords and b.coords:
+        distance = haversine_m(*a.coords, *b.coords)
+        if distance > MAX_DISTANCE_M:
+            return 0.0
+    name_score = 1.0 if (a.name in b.name or b.name in a.name) else dice(a.name_grams, b.name_grams)
+    if a.address_grams and b.address_grams:
+        return 0.7 * name_score + 0.3 * dice(a.address_grams, b.address_grams)
+    return name_score
+
+
+class _Blocker:
+    """Candidate index over the right-hand rows (geohash cells and name bigrams)."""
+
+    def __init__(self, rows: List["_Prepared"]):
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        # 名前バイグラム索引は全行分と座標なしの行分を別に持つ
+        self.grams: Dict[str, List[int]] = defaultdict(list)
+        self.grams_without_coords: Dict[str, List[int]] = defaultdict(list)
+        for index, row in enumerate(rows):
+            if row.coords:
+                self.cells[geohash_cell(*row.coords)].append(index)
+            for gram in row.name_grams:
+                self.grams[gram].append(index)
+                if not row.coords:
+                    self.grams_without_coords[gram].append(index)
+
+    @staticmethod
+    def _by_name(row: "_Prepared", grams: Dict[str, List[int]]) -> Iterable[int]:
+        # よく出るバイグラム（"焼肉" など）は候補が膨らむので、出現数の少ないものから数個だけ引く
+        postings = sorted((grams[gram] for gram in row.name_grams if gram in grams), key=len)
+        counts = Counter(index for posting in postings[:NAME_PROBE_GRAMS] for index in posting)
+        return [index for index, _ in counts.most_common(MAX_NAME_CANDIDATES)]
+
+    def candidates(self, row: "_Prepared") -> Set[int]:
+        if not row.coords:
+            return set(self._by_name(row, self.grams))
+        found: Set[int] = set()
+        for cell in geohash_neighbors(*row.coords):
+            found.update(self.cells.get(cell, ()))
+        # 座標のある行同士は近傍セルで十分。座標のない相手だけ名前で引く
+        found.update(self._by_name(row, self.grams_without_coords))
+        return found
+
+
+def match_restaurants(
+    left: List[Dict[str, Any]],
+    right: List[Dict[str, Any]],
+    threshold: float = MATCH_THRESHOLD,
+) -> List[Tuple[int, int, float]]:
+    """
+    Finds one-to-one matches between two result lists.
+
+    Args:
+        left (List[Dict[str, Any]]): Rows of the first provider
+        right (List[Dict[str, Any]]): Rows of the second provider
+        threshold (float): Minimum score for a pair to match
+
+    Returns:
+        List[Tuple[int, int, float]]: (left index, right index, score), best score first
+    """
+    left_rows = [_Prepared(row) for row in left]
+    right_rows = [_Prepared(row) for row in right]
+    blocker = _Blocker(right_rows)
+
+    pairs = []
+    for i, row in enumerate(left_rows):
+        for j in blocker.candidates(row):
+            score = score_pair(row, right_rows[j])
+            if score >= threshold:
+                pairs.append((score, i, j))
+
+    # スコアの高い順に1対1で割り当て
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+    used_left: Set[int] = set()
+    used_right: Set[int] = set()
+    matches = []
+    for score, i, j in pairs:
+        if i in used_left or j in used_right:
+            continue
+        used_left.add(i)
+        used_right.add(j)
+        matches.append((i, j, score))
+    return matches
+
+
+def merge_restaurants(hp_list: List[Dict[str, Any]], gm_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merges HotPepper and Google Maps rows into one deduplicated list.
+
+    HotPepper rows come first, enriched with the Google rating and Maps URL
+    of their match; Google rows without a match are appended afterwards.
+
+    Args:
+        hp_list (List[Dict[str, Any]]): HotPepper restaurants
+        gm_list (List[Dict[str, Any]]): Google Maps restaurants
+
+    Returns:
+        List[Dict[str, Any]]: Merged restaurants
+    """
+    match_by_hp = {i: j for i, j, _ in match_restaurants(hp_list, gm_list)}
+
+    merged = []
+    for i, hp in enumerate(hp_list):
+        merged_info = hp.copy()
+        if i in match_by_hp:
+            best_match = gm_list[match_by_hp[i]]
+            if not merged_info.get("rating") or merged_info["rating"] == "評価なし":
+                merged_info["rating"] = best_match.get("rating", merged_info.get("rating"))
+            merged_info["google_rating"] = best_match.get("rating")
+            merged_info["google_maps_url"] = best_match.get("google_maps_url")
+        merged.append(merged_info)
+
+    # Googleのみに存在するレストランを追加
+    matched_gm = set(match_by_hp.values())
+    merged.extend(gm for j, gm in enumerate(gm_list) if j not in matched_gm)
+    return merged
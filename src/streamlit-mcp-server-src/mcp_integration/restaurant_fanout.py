@@ -0,0 +1,103 @@
+"""
+Async fan-out for restaurant providers.
+
+Runs every provider (HotPepper, Google Maps, ...) at the same time with its
+own deadline, hands each answer to a callback as soon as it arrives (so the
+UI can render rows progressively) and returns whatever finished in time
+together with the per-provider latency.
+
+複数のレストラン検索プロバイダーを並列に呼び出し、プロバイダー毎の締め切りで
+打ち切った上で、届いた順にコールバックへ渡すファンアウト処理。
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# プロバイダー毎の締め切り（秒）
+DEFAULT_DEADLINES: Dict[str, float] = {
+    "hotpepper": 5.0,
+    "google_maps": 5.0,
+}
+DEFAULT_DEADLINE = 5.0
+
+# プロバイダー呼び出し専用のスレッドプール（締め切り超過したスレッドが asyncio.run の終了を待たせないよう、
+# イベントループのデフォルトエグゼキューターとは分ける）
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="restaurant-provider")
+
+Provider = Callable[[], Dict[str, Any]]
+ResultCallback = Callable[[str, Dict[str, Any]], None]
+
+
+async def _call_provider(name: str, provider: Provider, deadline: float) -> Tuple[str, Dict[str, Any]]:
+    start = time.perf_counter()
+    try:
+        # ブロッキングなHTTP呼び出しはスレッドで実行（締め切りを過ぎた結果は破棄）
+        loop = asyncio.get_running_loop()
+        result = await asyncio.wait_for(loop.run_in_executor(_EXECUTOR, provider), timeout=deadline)
+        status = "error" if "error" in result else "ok"
+        outcome = {"status": status, "result": result}
+        if status == "error":
+            outcome["error"] = result["error"]
+    except asyncio.TimeoutError:
+        outcome = {"status": "timeout", "result": None, "error": f"{deadline:.1f}秒以内に応答がありませんでした"}
+    except Exception as e:
+        outcome = {"status": "error", "result": None, "error": str(e)}
+    outcome["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return name, outcome
+
+
+async def fan_out(
+    providers: Dict[str, Provider],
+    deadlines: Optional[Dict[str, float]] = None,
+    on_result: Optional[ResultCallback] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Calls every provider concurrently and collects their outcomes.
+
+    Args:
+        providers (Dict[str, Provider]): Provider name → zero-argument function returning a result dict
+        deadlines (Optional[Dict[str, float]]): Per-provider deadline in seconds (DEFAULT_DEADLINES otherwise)
+        on_result (Optional[ResultCallback]): Called with (name, outcome) as each provider finishes
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Provider name → {"status": "ok" | "error" | "timeout",
+        "result": dict or None, "latency_ms": float, "error": str (on failure)}
+    """
+    deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+    tasks = [
+        asyncio.ensure_future(_call_provider(name, provider, deadlines.get(name, DEFAULT_DEADLINE)))
+        for name, provider in providers.items()
+    ]
+
+    outcomes: Dict[str, Dict[str, Any]] = {}
+    for finished in asyncio.as_completed(tasks):
+        name, outcome = await finished
+        outcomes[name] = outcome
+        if on_result is not None:
+            try:
+                on_result(name, outcome)
+            except Exception as e:
+                # 表示側の失敗で検索結果を失わないようにする
+                print(f"on_result callback error ({name}): {e}")
+
+    # 呼び出し順（プロバイダーの登録順）で返す
+    return {name: outcomes[name] for name in providers}
+
+
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """
+    Runs a coroutine from synchronous code.
+
+    Uses the current thread's event loop when there is one (nest_asyncio is
+    applied in the Streamlit app, so this also works inside a running loop)
+    and a fresh loop otherwise, e.g. in tool worker threads.
+    """
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    if loop.is_closed():
+        return asyncio.run(coro)
+    return loop.run_until_complete(coro)
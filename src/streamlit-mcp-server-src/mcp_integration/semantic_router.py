@@ -0,0 +1,233 @@
+"""
+Embedding-based intent router for the integrated chat.
+
+``process_chat_query()`` routes with fixed keyword lists, so paraphrases
+("何か聴けるものある？", "お腹すいた、どこかいい所ない？") fall through to the
+general answer. This router keeps a few exemplar utterances per intent,
+embeds them once into a row-normalised NumPy matrix and classifies queries
+with one batched matmul (cosine similarity). The best exemplar per intent
+is that intent's score; queries whose best score is below the threshold,
+or too close to the runner-up, abstain.
+
+The embedding backend is pluggable: ``HashingEmbedder`` is a local
+character n-gram feature hasher (no network, deterministic, used in tests)
+and ``LangChainEmbedder`` wraps any LangChain ``Embeddings`` such as
+``OpenAIEmbeddings``.
+
+意図ごとの例文を一度だけ埋め込んだ正規化済み行列と、1回の行列積による
+コサイン類似度で言い換えにも対応する意図ルーター（しきい値未満は保留）。
+
+Environment variables:
+    SEMANTIC_ROUTER_BACKEND: "hashing" (default) or "openai"
+    SEMANTIC_ROUTER_EMBEDDING_MODEL: OpenAI embedding model (default "text-embedding-3-small")
+    SEMANTIC_ROUTER_THRESHOLD: Minimum cosine similarity (default depends on the backend)
+"""
+
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# 意図ごとの例文
+EXEMPLARS: Dict[str, Sequence[str]] = {
+    "music": (
+        "米津玄師の曲を教えて",
+        "YOASOBIの人気の歌",
+        "何か聴けるものある？",
+        "作業中に流すBGMを探して",
+        "ドライブで聴きたい洋楽",
+        "最近流行っている邦楽",
+        "このアーティストの代表作は？",
+        "落ち着いたジャズが聴きたい",
+        "カラオケで歌えるアニソン",
+        "Spotifyでおすすめのプレイリスト",
+        "recommend some songs to listen to",
+    ),
+    "restaurant": (
+        "渋谷のレストランを教えて",
+        "新宿で食事できるお店",
+        "お腹すいた、どこかいい所ない？",
+        "大崎でランチできるところ",
+        "池袋のおいしいラーメン屋",
+        "銀座で寿司を食べたい",
+        "恵比寿の居酒屋を探して",
+        "記念日に使えるディナーの店",
+        "安く飲めるところを探している",
+        "駅の近くのカフェ",
+        "find a place to eat near Shinjuku",
+    ),
+}
+
+# バックエンド毎のコサイン類似度のしきい値
+DEFAULT_THRESHOLDS = {"hashing": 0.25, "openai": 0.45}
+# 1位と2位の差がこれ未満なら保留
+DEFAULT_MARGIN = 0.02
+
+
+class SemanticMatch(NamedTuple):
+    """Routing result (``intent`` is None when the router abstains)."""
+
+    intent: Optional[str]
+    score: float
+    scores: Dict[str, float]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class HashingEmbedder:
+    """
+    Local embedding backend: signed feature hashing of character n-grams.
+
+    Args:
+        dim (int): Vector size
+        ngram_range (tuple): Character n-gram sizes
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 1024, ngram_range: tuple = (1, 3)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        low, high = self.ngram_range
+        for row, text in enumerate(texts):
+            normalized = re.sub(r"\s+", "", unicodedata.normalize("NFKC", text or "")).casefold()
+            for n in range(low, high + 1):
+                for i in range(len(normalized) - n + 1):
+                    h = zlib.crc32(normalized[i:i + n].encode("utf-8"))
+                    matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return matrix
+
+
+class LangChainEmbedder:
+    """
+    Embedding backend wrapping a LangChain ``Embeddings`` object.
+
+    Args:
+        embeddings: e.g. ``OpenAIEmbeddings(model="text-embedding-3-small")``
+    """
+
+    name = "openai"
+
+    def __init__(self, embeddings: Any):
+        self.embeddings = embeddings
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        # 1回のAPI呼び出しでまとめて埋め込む
+        return np.asarray(self.embeddings.embed_documents(list(texts)), dtype=np.float32)
+
+
+class SemanticRouter:
+    """
+    Nearest-exemplar intent router over a normalised embedding matrix.
+
+    Args:
+        exemplars (Mapping[str, Sequence[str]]): Example utterances per intent
+        embedder: Backend with ``embed(texts) -> np.ndarray``
+        threshold (float): Minimum cosine similarity to accept an intent
+        margin (float): Minimum gap between the best and second-best intent
+    """
+
+    def __init__(
+        self,
+        exemplars: Mapping[str, Sequence[str]],
+        embedder: Any,
+        threshold: float = DEFAULT_THRESHOLDS["hashing"],
+        margin: float = DEFAULT_MARGIN,
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.margin = margin
+        self.intents: List[str] = [intent for intent, texts in exemplars.items() if texts]
+        texts: List[str] = []
+        starts: List[int] = []
+        for intent in self.intents:
+            starts.append(len(texts))
+            texts.extend(exemplars[intent])
+        # 例文は意図ごとに連続して並べ、reduceatで意図別の最大値を取る
+        self._starts = np.asarray(starts, dtype=np.intp)
+        self.matrix = _normalize_rows(embedder.embed(texts))
+
+    def scores(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        Returns the (queries × intents) matrix of best exemplar similarities.
+        """
+        query_matrix = _normalize_rows(self.embedder.embed(queries))
+        similarities = query_matrix @ self.matrix.T
+        return np.maximum.reduceat(similarities, self._starts, axis=1)
+
+    def classify(self, queries: Sequence[str]) -> List[SemanticMatch]:
+        """
+        Classifies a batch of queries with a single matmul.
+
+        Returns:
+            List[SemanticMatch]: One result per query, intent None when abstaining
+        """
+        if not queries:
+            return []
+        per_intent = self.scores(queries)
+        results = []
+        for row in per_intent:
+            order = np.argsort(row)[::-1]
+            best = float(row[order[0]])
+            runner_up = float(row[order[1]]) if len(order) > 1 else -1.0
+            scores = {intent: round(float(score), 4) for intent, score in zip(self.intents, row)}
+            if best < self.threshold or best - runner_up < self.margin:
+                results.append(SemanticMatch(None, best, scores))
+            else:
+                results.append(SemanticMatch(self.intents[order[0]], best, scores))
+        return results
+
+    def route(self, query: str) -> SemanticMatch:
+        return self.classify([query])[0]
+
+
+def build_embedder(backend: Optional[str] = None) -> Any:
+    """
+    Creates the embedding backend selected by name or environment.
+
+    Args:
+        backend (Optional[str]): "hashing" or "openai" (SEMANTIC_ROUTER_BACKEND, "hashing" by default)
+    """
+    if backend is None:
+        # OpenAIはクエリ毎に同期の埋め込みAPI呼び出しが入るため、明示的に指定した場合のみ使う
+        backend = os.getenv("SEMANTIC_ROUTER_BACKEND") or "hashing"
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        model = os.getenv("SEMANTIC_ROUTER_EMBEDDING_MODEL", "text-embedding-3-small")
+        return LangChainEmbedder(OpenAIEmbeddings(model=model))
+    if backend == "hashing":
+        return HashingEmbedder()
+    raise ValueError(f"Unknown semantic router backend: {backend}")
+
+
+_router: Optional[SemanticRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_semantic_router() -> SemanticRouter:
+    """Returns the process-wide router (exemplars are embedded on first use)."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                embedder = build_embedder()
+                threshold = os.getenv("SEMANTIC_ROUTER_THRESHOLD")
+                _router = SemanticRouter(
+                    EXEMPLARS,
+                    embedder,
+                    threshold=float(threshold) if threshold else DEFAULT_THRESHOLDS.get(embedder.name, 0.4),
+                )
+    return _router
@@ -1,9 +1,17 @@
 from mcp.server.fastmcp import FastMCP
 import os
+import sys
 import requests
 from dotenv import load_dotenv
 import json
 
+# src/ をPythonパスに追加（共通のエリア・ジャンル・予算リゾルバを利用するため）
+src_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agent_common.area_resolver import resolve_budget, resolve_genre
+
 # 環境変数の読み込み
 load_dotenv()
 
@@ -32,12 +40,20 @@ async def search_restaurants(location: str, cuisine: str = "", budget: str = "",
             'count': count
         }
         
+        # エリアは住所検索のまま渡す（静的表のコードはHotPepperのマスターで検証されていないため）。
+        # ジャンル・予算は名前をコードに変換する
         if location:
             params['address'] = location
         if cuisine:
-            params['genre'] = cuisine
+            genre_match = resolve_genre(cuisine)
+            if genre_match:
+                params['genre'] = genre_match.code
+            else:
+                params['keyword'] = cuisine
         if budget:
-            params['budget'] = budget
+            budget_match = resolve_budget(budget)
+            if budget_match:
+                params['budget'] = budget_match.code
         
         response = requests.get('https://webservice.recruit.co.jp/hotpepper/gourmet/v1/', params=params)
         
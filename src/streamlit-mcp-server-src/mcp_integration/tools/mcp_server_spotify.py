@@ -1,10 +1,16 @@
 from mcp.server.fastmcp import FastMCP
 import os
-import requests
-from urllib.parse import quote
+import sys
 from dotenv import load_dotenv
 import json
 
+# src/ をPythonパスに追加（共通のSpotifyトークンマネージャーを利用するため）
+src_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agent_common.spotify_auth import SpotifyAuthError, get_token_manager
+
 # 環境変数の読み込み
 load_dotenv()
 
@@ -20,30 +26,14 @@ async def search_tracks(query: str, limit: int = 10) -> str:
         limit: 取得する楽曲数（デフォルト: 10）
     """
     try:
-        client_id = os.getenv("SPOTIFY_USER_ID")
-        client_secret = os.getenv("SPOTIFY_TOKEN")
-        
-        if not client_id or not client_secret:
+        # トークンはキャッシュ済みのものを再利用（期限切れ前に自動更新）
+        try:
+            spotify = get_token_manager()
+        except SpotifyAuthError:
             return "エラー: Spotify API credentials not configured. Please set SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET in your .env file."
         
-        # Get access token
-        auth_response = requests.post('https://accounts.spotify.com/api/token', {
-            'grant_type': 'client_credentials',
-            'client_id': client_id,
-            'client_secret': client_secret,
-        })
-        
-        if auth_response.status_code != 200:
-            return "エラー: Failed to authenticate with Spotify API"
-        
-        access_token = auth_response.json()['access_token']
-        
         # Search for tracks
-        headers = {'Authorization': f'Bearer {access_token}'}
-        search_response = requests.get(
-            f'https://api.spotify.com/v1/search?q={quote(query)}&type=track&limit={limit}',
-            headers=headers
-        )
+        search_response = spotify.get('/search', params={'q': query, 'type': 'track', 'limit': limit})
         
         if search_response.status_code != 200:
             return "エラー: Failed to search Spotify API"
@@ -68,6 +58,8 @@ async def search_tracks(query: str, limit: int = 10) -> str:
             "results": results
         }, ensure_ascii=False, indent=2)
         
+    except SpotifyAuthError:
+        return "エラー: Failed to authenticate with Spotify API"
     except Exception as e:
         return f"エラー: Spotify search error: {str(e)}"
 
@@ -80,30 +72,14 @@ async def search_artists(artist_name: str, limit: int = 5) -> str:
         limit: 取得するアーティスト数（デフォルト: 5）
     """
     try:
-        client_id = os.getenv("SPOTIFY_CLIENT_ID")
-        client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-        
-        if not client_id or not client_secret:
+        # トークンはキャッシュ済みのものを再利用（期限切れ前に自動更新）
+        try:
+            spotify = get_token_manager()
+        except SpotifyAuthError:
             return "エラー: Spotify API credentials not configured."
         
-        # Get access token
-        auth_response = requests.post('https://accounts.spotify.com/api/token', {
-            'grant_type': 'client_credentials',
-            'client_id': client_id,
-            'client_secret': client_secret,
-        })
-        
-        if auth_response.status_code != 200:
-            return "エラー: Failed to authenticate with Spotify API"
-        
-        access_token = auth_response.json()['access_token']
-        
         # Search for artists
-        headers = {'Authorization': f'Bearer {access_token}'}
-        search_response = requests.get(
-            f'https://api.spotify.com/v1/search?q={quote(artist_name)}&type=artist&limit={limit}',
-            headers=headers
-        )
+        search_response = spotify.get('/search', params={'q': artist_name, 'type': 'artist', 'limit': limit})
         
         if search_response.status_code != 200:
             return "エラー: Failed to search Spotify API"
@@ -126,6 +102,8 @@ async def search_artists(artist_name: str, limit: int = 5) -> str:
             "results": results
         }, ensure_ascii=False, indent=2)
         
+    except SpotifyAuthError:
+        return "エラー: Failed to authenticate with Spotify API"
     except Exception as e:
         return f"エラー: Spotify artist search error: {str(e)}"
 
@@ -137,30 +115,14 @@ async def get_playlist(playlist_id: str) -> str:
         playlist_id: プレイリストID
     """
     try:
-        client_id = os.getenv("SPOTIFY_CLIENT_ID")
-        client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-        
-        if not client_id or not client_secret:
+        # トークンはキャッシュ済みのものを再利用（期限切れ前に自動更新）
+        try:
+            spotify = get_token_manager()
+        except SpotifyAuthError:
             return "エラー: Spotify API credentials not configured."
         
-        # Get access token
-        auth_response = requests.post('https://accounts.spotify.com/api/token', {
-            'grant_type': 'client_credentials',
-            'client_id': client_id,
-            'client_secret': client_secret,
-        })
-        
-        if auth_response.status_code != 200:
-            return "エラー: Failed to authenticate with Spotify API"
-        
-        access_token = auth_response.json()['access_token']
-        
         # Get playlist
-        headers = {'Authorization': f'Bearer {access_token}'}
-        playlist_response = requests.get(
-            f'https://api.spotify.com/v1/playlists/{playlist_id}',
-            headers=headers
-        )
+        playlist_response = spotify.get(f'/playlists/{playlist_id}')
         
         if playlist_response.status_code != 200:
             return "エラー: Failed to get playlist from Spotify API"
@@ -181,6 +143,8 @@ async def get_playlist(playlist_id: str) -> str:
             "playlist": playlist_info
         }, ensure_ascii=False, indent=2)
         
+    except SpotifyAuthError:
+        return "エラー: Failed to authenticate with Spotify API"
     except Exception as e:
         return f"エラー: Spotify playlist error: {str(e)}"
 
@@ -0,0 +1,93 @@
+"""
+Load test of the /ask agent node against a stub LLM: per-request agent
+construction vs the process-wide agent.
+
+- per-request: what agent_node() used to do — a new ChatOpenAI (and OpenAI
+  client), new tools and a new create_react_agent graph for every request;
+- shared: agent_node() with the cached LLM client, search wrapper and
+  compiled agent (built once by warm_up()).
+
+Both run against stub_llm_server (fixed --llm-ms latency), so the
+difference is the per-request overhead of the service itself.
+
+スタブLLMに対して、リクエスト毎のエージェント作成とプロセス共有のエージェントを比較する。
+
+Usage:
+    python benchmark_agent_reuse.py --requests 200 --concurrency 4 --llm-ms 50
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_llm_server import start_stub_server
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def per_request_node(state):
+    # 変更前の agent_node と同じく、リクエスト毎にLLM・ツール・エージェントを作り直す
+    from langchain_core.messages import HumanMessage
+    from langchain_openai import ChatOpenAI
+    from langgraph.prebuilt import create_react_agent
+
+    import uv_api_agent
+
+    agent = create_react_agent(ChatOpenAI(temperature=0.7), uv_api_agent.create_tools())
+    result = agent.invoke({"messages": [HumanMessage(content=state["input"])]})
+    return result["messages"][-1].content
+
+
+def shared_node(state):
+    import uv_api_agent
+
+    return uv_api_agent.agent_node(state, {})["result"]
+
+
+def run(node, requests, concurrency):
+    state = {"input": "東京の天気を教えて", "result": "", "chat_history": []}
+
+    def one(_):
+        start = time.perf_counter()
+        node(dict(state))
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-ms", type=float, default=50.0, help="stub LLM latency")
+    args = parser.parse_args()
+
+    _, base_url = start_stub_server(latency_ms=args.llm_ms)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    import uv_api_agent
+
+    warm_ms = uv_api_agent.warm_up()
+    print(f"stub LLM {args.llm_ms:.0f} ms, {args.requests} requests, concurrency {args.concurrency}, warm-up {warm_ms:.0f} ms")
+    print(f"{'agent':<12}{'p50 ms':>9}{'p95 ms':>9}{'overhead ms':>13}{'req/s':>8}")
+    for name, node in (("per-request", per_request_node), ("shared", shared_node)):
+        run(node, min(10, args.requests), 1)  # インポート・初回接続の影響を除く
+        latencies, elapsed = run(node, args.requests, args.concurrency)
+        p50 = percentile(latencies, 0.5) * 1000
+        print(
+            f"{name:<12}{p50:>9.1f}{percentile(latencies, 0.95) * 1000:>9.1f}"
+            f"{statistics.mean(latencies) * 1000 - args.llm_ms:>13.1f}{args.requests / elapsed:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Load test of the /ask endpoint against a stub LLM at 1 / 10 / 100
+concurrent clients.
+
+Starts stub_llm_server (fixed --llm-ms latency) and the FastAPI app under
+uvicorn in this process, then drives POST /ask with closed-loop clients
+(each sends its next request as soon as the previous one answered) and
+reports p50/p95/p99 latency, time to first byte, throughput and the number
+of 429 (backpressure) and other error responses per level.
+
+With --compare-blocking, the old handler (synchronous graph.invoke inside
+``async def``) is mounted at /ask-blocking and measured as well. With
+--stream, /ask/stream (server-sent events) is measured too; there the first
+byte is the first token, while /ask sends nothing until the whole answer is
+ready. --token-ms spaces the stub's streamed chunks so the difference shows.
+
+スタブLLMに対して /ask を同時接続数 1 / 10 / 100 で負荷試験し、p50/p95/p99 とスループットを表示する。
+
+Usage:
+    python benchmark_ask_load.py --llm-ms 200 --requests 200 --clients 1 10 100 --compare-blocking
+    python benchmark_ask_load.py --llm-ms 200 --token-ms 20 --answer-chars 120 --clients 1 10 --stream
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from stub_llm_server import DEFAULT_ANSWER, start_stub_server
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+ERROR_EVENT = b"event: error\ndata: "
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api(app, port):
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def mount_blocking_route(app):
+    # 変更前の /ask と同じく、async def の中で同期の graph.invoke を呼ぶ（イベントループを塞ぐ）
+    from uv_api_agent import graph, session_config
+    import uv_api_main
+
+    @app.post("/ask-blocking")
+    async def ask_blocking(query: uv_api_main.Query):
+        result = graph.invoke({"input": query.input}, config=session_config(query.session_id))
+        return {"response": result["result"]}
+
+
+async def run_level(base_url, path, clients, requests):
+    import httpx
+
+    latencies = []
+    first_bytes = []
+    statuses = {}
+    remaining = iter(range(requests))
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+
+        async def worker():
+            # クライアント毎に別のセッション（会話）を使う
+            session_id = uuid.uuid4().hex
+            for _ in remaining:
+                start = time.perf_counter()
+                first_byte = None
+                payload = {"input": "東京の天気を教えて", "session_id": session_id}
+                body = b""
+                async with client.stream("POST", path, json=payload) as response:
+                    async for chunk in response.aiter_raw():
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - start
+                        body += chunk
+                elapsed = time.perf_counter() - start
+                status = response.status_code
+                if status == 200 and ERROR_EVENT in body:
+                    # ストリーム開始後のエラー（待ち行列のタイムアウトは429）はerrorイベントのstatusで数える
+                    status = json.loads(body.split(ERROR_EVENT, 1)[1].split(b"\n", 1)[0])["status"]
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+                    first_bytes.append(first_byte if first_byte is not None else elapsed)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        wall = time.perf_counter() - start
+    return latencies, first_bytes, statuses, wall
+
+
+async def run_all(base_url, paths, levels, requests):
+    print(
+        f"{'route':<14}{'clients':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'ttfb p50':>10}{'ttfb p95':>10}{'req/s':>8}{'429':>6}{'errors':>8}"
+    )
+    for path in paths:
+        await run_level(base_url, path, 1, 5)  # 初回接続の影響を除く
+        for clients in levels:
+            latencies, first_bytes, statuses, wall = await run_level(base_url, path, clients, max(requests, clients))
+            ok = statuses.get(200, 0)
+            rejected = statuses.get(429, 0)
+            errors = sum(statuses.values()) - ok - rejected
+            if latencies:
+                p50, p95, p99 = (percentile(latencies, q) * 1000 for q in (0.5, 0.95, 0.99))
+                ttfb50, ttfb95 = (percentile(first_bytes, q) * 1000 for q in (0.5, 0.95))
+            else:
+                p50 = p95 = p99 = ttfb50 = ttfb95 = float("nan")
+            print(
+                f"{path:<14}{clients:>8}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}"
+                f"{ttfb50:>10.1f}{ttfb95:>10.1f}{ok / wall:>8.1f}{rejected:>6}{errors:>8}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-ms", type=float, default=200.0, help="stub LLM latency")
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100], help="concurrency levels")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="stub delay between streamed chunks")
+    parser.add_argument("--answer-chars", type=int, default=len(DEFAULT_ANSWER), help="length of the stub answer")
+    parser.add_argument("--compare-blocking", action="store_true", help="also measure the old blocking handler")
+    parser.add_argument("--stream", action="store_true", help="also measure /ask/stream")
+    args = parser.parse_args()
+
+    answer = (DEFAULT_ANSWER * (args.answer_chars // len(DEFAULT_ANSWER) + 1))[:args.answer_chars]
+    _, llm_url = start_stub_server(latency_ms=args.llm_ms, answer=answer, token_ms=args.token_ms)
+    os.environ["OPENAI_BASE_URL"] = llm_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    import uv_api_main
+
+    paths = ["/ask"]
+    if args.stream:
+        paths.append("/ask/stream")
+    if args.compare_blocking:
+        mount_blocking_route(uv_api_main.app)
+        paths.append("/ask-blocking")
+
+    port = free_port()
+    server = start_api(uv_api_main.app, port)
+    print(
+        f"stub LLM {args.llm_ms:.0f} ms, {args.requests} requests per level, "
+        f"max in-flight {uv_api_main.MAX_CONCURRENCY}, queue {uv_api_main.MAX_QUEUE}"
+    )
+    try:
+        asyncio.run(run_all(f"http://127.0.0.1:{port}", paths, args.clients, args.requests))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
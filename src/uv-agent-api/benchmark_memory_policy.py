@@ -0,0 +1,74 @@
+"""
+Per-turn prompt tokens of one long conversation, with the full history vs
+the token-budgeted memory (agent_common.conversation_memory).
+
+Runs --turns turns of one session through the agent graph against
+stub_llm_server and prints, every --every turns, the prompt tokens the LLM
+reported for the turn (the stub counts about 4 characters per token), the
+estimated tokens of the window sent and of the full history.
+
+1つのセッションで長い会話を続け、全履歴を送る場合と予算付きメモリーの場合の
+ターン毎のプロンプトトークン数を比較する。
+
+Usage:
+    python benchmark_memory_policy.py --turns 40 --budget 2000
+"""
+
+import argparse
+import asyncio
+import os
+
+from stub_llm_server import start_stub_server
+
+# 実際の回答に近い長さ（約600文字）
+LONG_ANSWER = "これはスタブLLMからの回答です。" * 40
+
+
+async def conversation(graph, session_id, turns):
+    from uv_api_agent import session_config
+
+    rows = []
+    for turn in range(1, turns + 1):
+        result = await graph.ainvoke({"input": f"質問{turn}: 東京の天気を教えて"}, config=session_config(session_id))
+        rows.append(result["usage"])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--budget", type=int, default=2000, help="MEMORY_MAX_TOKENS of the bounded run")
+    parser.add_argument("--every", type=int, default=5, help="print every N turns")
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="stub LLM latency")
+    args = parser.parse_args()
+
+    _, base_url = start_stub_server(latency_ms=args.llm_ms, answer=LONG_ANSWER)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    import uv_api_agent
+
+    memory = uv_api_agent.conversation_memory
+    results = {}
+    for name, budget in (("full history", 10**9), (f"budget {args.budget}", args.budget)):
+        memory.max_tokens = budget
+        results[name] = asyncio.run(conversation(uv_api_agent.graph, name, args.turns))
+        memory.wait_for_summaries(timeout=30)
+
+    names = list(results)
+    print(f"{'turn':>5}" + "".join(f"{name + ' prompt':>24}{'window est.':>13}" for name in names))
+    totals = dict.fromkeys(names, 0)
+    for index in range(args.turns):
+        turn = index + 1
+        cells = ""
+        for name in names:
+            usage = results[name][index]
+            totals[name] += usage["prompt_tokens"]
+            cells += f"{usage['prompt_tokens']:>24}{usage['window_tokens']:>13}"
+        if turn == 1 or turn % args.every == 0:
+            print(f"{turn:>5}{cells}")
+    print(f"{'total':>5}" + "".join(f"{totals[name]:>24}{'':>13}" for name in names))
+
+
+if __name__ == "__main__":
+    main()
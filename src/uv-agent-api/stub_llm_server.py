@@ -0,0 +1,146 @@
+"""
+OpenAI-compatible stub chat-completions server for load tests.
+
+Answers every ``POST /v1/chat/completions`` after a fixed latency with a
+final answer (no tool calls), so the agent service can be load-tested
+without an API key, cost or network variance. Point the service at it with
+``OPENAI_BASE_URL``. Requests with ``"stream": true`` get the answer as
+server-sent chunks (a few characters each, ``token_ms`` apart), like the
+real API; non-streaming requests take the same total time.
+
+OpenAI互換のスタブLLMサーバー（負荷試験用）。一定の遅延後に固定の回答を返す。
+
+Usage:
+    python stub_llm_server.py --port 8900 --latency-ms 300 --token-ms 20
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=stub uvicorn uv_api_main:app --port 8001
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+DEFAULT_ANSWER = "これはスタブLLMからの回答です。"
+CHUNK_CHARS = 4  # ストリーミング時に1チャンクで返す文字数
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    # keep-alive（実際のAPIと同じくコネクションを再利用できるようにする）
+    protocol_version = "HTTP/1.1"
+    # ヘッダーと本文を別々に書くため、Nagleアルゴリズムによる遅延（約40ms）を避ける
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        answer = self.server.answer
+        chunks = [answer[i:i + CHUNK_CHARS] for i in range(0, len(answer), CHUNK_CHARS)]
+        prompt_chars = sum(len(str(message.get("content") or "")) for message in body.get("messages", []))
+        usage = {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(chunks), "total_tokens": prompt_chars // 4 + len(chunks)}
+        time.sleep(self.server.latency)
+        if body.get("stream"):
+            self._stream(body, chunks, usage)
+            return
+        time.sleep(self.server.token_interval * len(chunks))
+        payload = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage,
+        }
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body, chunks, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None, **extra):
+            return {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        events += [chunk({"content": text}) for text in chunks]
+        events.append(chunk({}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            events.append({**chunk({}), "choices": [], "usage": usage})
+        for index, event in enumerate(events):
+            if 1 < index <= len(chunks):
+                time.sleep(self.server.token_interval)
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(
+    port: int = 0, latency_ms: float = 0.0, answer: str = DEFAULT_ANSWER, token_ms: float = 0.0
+) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Starts the stub server in a daemon thread.
+
+    Args:
+        port (int): Port to listen on (0 picks a free one)
+        latency_ms (float): Delay before each answer (before the first streamed chunk)
+        answer (str): Content of every answer
+        token_ms (float): Delay between streamed chunks (added per chunk to non-streamed answers)
+
+    Returns:
+        Tuple[ThreadingHTTPServer, str]: The server and its OpenAI base URL
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.answer = answer
+    server.token_interval = token_ms / 1000
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="delay before each answer")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="delay between streamed chunks")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency_ms, token_ms=args.token_ms)
+    print(f"stub LLM listening on {base_url} (latency {args.latency_ms:.0f} ms, {args.token_ms:.0f} ms per chunk)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
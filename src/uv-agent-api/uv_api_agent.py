@@ -1,56 +1,214 @@
 # agent.py
+import asyncio
+from contextlib import asynccontextmanager
 from langgraph.graph import StateGraph, END
 from langchain_openai import ChatOpenAI
-from typing import Dict, Any, TypedDict, List
+from typing import Dict, Any, AsyncIterator, TypedDict, List
 from langchain_google_community import GoogleSearchAPIWrapper
 from langchain.agents import Tool
 from langgraph.prebuilt import create_react_agent
 import os
-from langchain.memory import ConversationBufferMemory
+import sys
+import threading
+import time
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver
 
-# メモリーの初期化
-memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+# src/ をPythonパスに追加（共通モジュール agent_common を利用するため）
+src_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
 
-class AgentState(TypedDict):
+from agent_common.conversation_memory import ConversationMemory, llm_summarizer
+
+# 会話履歴はチェックポインターにセッション（thread_id）毎に保存する
+# （graph.invoke / ainvoke の config に {"configurable": {"thread_id": セッションID}} を渡す）
+class AgentState(TypedDict, total=False):
     input: str
     result: str
     chat_history: List[Any]
+    # このターンのトークン数（prompt_tokens: LLMが報告した入力トークンの合計,
+    # window_tokens: 送った履歴の推定値, history_tokens: 全履歴を送った場合の推定値）
+    usage: Dict[str, int]
+
+# LLMクライアント・検索ラッパー・コンパイル済みエージェントはプロセス内で1つだけ作成して共有する
+# （リクエスト毎に作るとHTTPコネクションプールやグラフのコンパイルが毎回やり直しになる）
+_llm = None
+_search = None
+_agent = None
+_lock = threading.Lock()
+
+
+def _build_llm(http_async_client: Any = None) -> ChatOpenAI:
+    # stream_usage: ストリーミング時もトークン使用量を受け取る
+    return ChatOpenAI(temperature=0.7, stream_usage=True, http_async_client=http_async_client)
+
+
+def get_llm() -> ChatOpenAI:
+    """
+    Returns the process-wide LLM client.
+
+    The client keeps its HTTP connection pool, so requests reuse open
+    connections to the API instead of starting a new client each time.
+    While the API server runs, this is the client created by ``agent_lifespan``.
+    """
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                _llm = _build_llm()
+    return _llm
+
+
+def get_search() -> GoogleSearchAPIWrapper:
+    """
+    Returns the process-wide Google search wrapper.
+
+    Raises:
+        ValueError: If GOOGLE_API_KEY / GOOGLE_CSE_ID are not configured
+    """
+    global _search
+    if _search is None:
+        with _lock:
+            if _search is None:
+                _search = GoogleSearchAPIWrapper()
+    return _search
+
 
 def create_tools() -> List[Tool]:
     # Google検索ツールの作成
     def search_google(query: str) -> str:
         try:
-            search = GoogleSearchAPIWrapper()
-            return search.run(query)
+            return get_search().run(query)
         except Exception as e:
             return f"検索中にエラーが発生しました: {str(e)}"
 
+    async def asearch_google(query: str) -> str:
+        # Google APIクライアントはブロッキングのため、ワーカースレッドで実行してイベントループを塞がない
+        return await asyncio.to_thread(search_google, query)
+
     google_search_tool = Tool.from_function(
         func=search_google,
+        coroutine=asearch_google,
         name="Google_Search",
         description="インターネットで情報を検索します。"
     )
 
     return [google_search_tool]
 
-def agent_node(state: AgentState) -> AgentState:
+
+def get_agent():
+    """Returns the process-wide compiled ReAct agent."""
+    global _agent
+    if _agent is None:
+        llm = get_llm()
+        with _lock:
+            if _agent is None:
+                _agent = create_react_agent(llm, create_tools())
+    return _agent
+
+
+@asynccontextmanager
+async def agent_lifespan() -> AsyncIterator[None]:
+    """
+    Gives the running event loop its own LLM client and agent, closed on exit.
+
+    The async HTTP pool of the OpenAI client is bound to the event loop that
+    first uses it, and langchain_openai shares its default pool across the
+    process. A client kept after that loop has closed fails with "Event loop
+    is closed", so every server run (FastAPI lifespan) starts a new pool here.
+    """
+    from openai import DefaultAsyncHttpxClient
+
+    global _llm, _agent
+    http_async_client = DefaultAsyncHttpxClient()
+    with _lock:
+        _llm, _agent = _build_llm(http_async_client), None
+    try:
+        yield
+    finally:
+        with _lock:
+            _llm, _agent = None, None
+        await http_async_client.aclose()
+
+
+def warm_up(ping_llm: bool = False) -> float:
+    """
+    Builds the shared agent before the first request.
+
+    Args:
+        ping_llm (bool): Also send a one-token request so that the first
+            user request finds an open (TLS) connection in the pool
+
+    Returns:
+        float: Warm-up time in milliseconds
+    """
+    start = time.perf_counter()
+    get_agent()
+    try:
+        get_search()
+    except Exception as e:
+        # 検索APIが未設定でもエージェントは利用できる（検索ツールがエラーを返す）
+        print(f"検索ツールの初期化をスキップしました: {str(e)}")
+    if ping_llm:
+        get_llm().invoke("ping", max_tokens=1)
+    return (time.perf_counter() - start) * 1000
+
+
+def _summarize(previous: str, messages: List[Any]) -> str:
+    return llm_summarizer(get_llm())(previous, messages)
+
+
+# LLMに送る会話履歴の上限（MEMORY_MAX_TOKENS）。溢れた古いターンはバックグラウンドで要約する
+conversation_memory = ConversationMemory(summarizer=_summarize)
+
+
+def _session_id(config: RunnableConfig) -> str:
+    return (config or {}).get("configurable", {}).get("thread_id", "default")
+
+
+def _prompt(config: RunnableConfig, chat_history: List[Any], question: str) -> List[Any]:
+    # 全履歴ではなく、予算内の直近のターン（＋要約）だけを送る
+    return conversation_memory.window(_session_id(config), chat_history + [HumanMessage(content=question)])
+
+
+def _finish(config: RunnableConfig, question: str, chat_history: List[Any], messages: List[Any], result: Dict[str, Any]) -> AgentState:
+    answer = result["messages"][-1].content
+    # このターンでLLMが報告した入力トークン（ReActのループで複数回呼ばれた分の合計）
+    new_messages = result["messages"][len(messages):]
+    prompt_tokens = sum((getattr(m, "usage_metadata", None) or {}).get("input_tokens", 0) for m in new_messages)
+    stats = conversation_memory.last_stats(_session_id(config))
+
+    # 会話履歴を更新（チェックポインターがこのセッションの状態として保存する）
+    return {
+        "input": question,
+        "result": answer,
+        "chat_history": chat_history + [HumanMessage(content=question), AIMessage(content=answer)],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "window_tokens": stats.prompt_tokens if stats else 0,
+            "history_tokens": stats.history_tokens if stats else 0,
+        },
+    }
+
+
+def _log_failure(e: Exception) -> None:
+    # 失敗は回答として返さず呼び出し元へ送出する（ターンは履歴に保存されず、APIは5xxを返す）
+    print(f"エージェントの実行中にエラーが発生しました: {str(e)}")  # サーバー側のログに出力
+
+
+def agent_node(state: AgentState, config: RunnableConfig) -> AgentState:
     question = state["input"]
     chat_history = state.get("chat_history", [])
     
     try:
-        # LLMの初期化
-        llm = ChatOpenAI(temperature=0.7)
-        
-        # ツールの準備
-        tools = create_tools()
-        
-        # ReActエージェントの作成
-        agent = create_react_agent(llm, tools)
+        # 共有のReActエージェント（初回のみ作成）
+        agent = get_agent()
         
         # 会話履歴を含めたメッセージの作成
-        messages = chat_history + [HumanMessage(content=question)]
+        messages = _prompt(config, chat_history, question)
         
         # エージェントの実行
         result = agent.invoke(
@@ -72,32 +230,50 @@ def agent_node(state: AgentState) -> AgentState:
                 # ]
             }
         )
+        return _finish(config, question, chat_history, messages, result)
+    except Exception as e:
+        _log_failure(e)
+        raise
 
-        # 会話履歴を更新
-        memory.save_context(
-            {"input": question},
-            {"output": result["messages"][-1].content}
-        )
 
-        return {
-            "input": question,
-            "result": result["messages"][-1].content,
-            "chat_history": memory.chat_memory.messages
-        }
+async def aagent_node(state: AgentState, config: RunnableConfig) -> AgentState:
+    """Async version of agent_node (used by graph.ainvoke; does not block the event loop)."""
+    question = state["input"]
+    chat_history = state.get("chat_history", [])
+
+    try:
+        agent = get_agent()
+        messages = _prompt(config, chat_history, question)
+        result = await agent.ainvoke({"messages": messages})
+        return _finish(config, question, chat_history, messages, result)
     except Exception as e:
-        error_message = f"エージェントの実行中にエラーが発生しました: {str(e)}"
-        print(error_message)  # サーバー側のログに出力
-        return {
-            "input": question,
-            "result": error_message,
-            "chat_history": chat_history
-        }
-
-# LangGraph構築
-builder = StateGraph(AgentState)
-builder.add_node("agent", agent_node)
-builder.set_entry_point("agent")
-builder.set_finish_point("agent")
-
-# 実行グラフ作成
-graph = builder.compile()
\ No newline at end of file
+        _log_failure(e)
+        raise
+
+def session_config(session_id: str) -> Dict[str, Any]:
+    """Returns the graph config that selects the conversation thread of a session."""
+    return {"configurable": {"thread_id": session_id}}
+
+
+def build_graph(checkpointer: BaseCheckpointSaver):
+    """
+    Builds the agent graph on top of a checkpointer.
+
+    Args:
+        checkpointer (BaseCheckpointSaver): Stores each session's state
+            (chat_history) per thread_id, e.g. MemorySaver or AsyncSqliteSaver
+
+    Returns:
+        CompiledStateGraph: The executable graph
+    """
+    # LangGraph構築
+    builder = StateGraph(AgentState)
+    # graph.invoke は agent_node、graph.ainvoke は aagent_node を使う
+    builder.add_node("agent", RunnableLambda(agent_node, afunc=aagent_node))
+    builder.set_entry_point("agent")
+    builder.set_finish_point("agent")
+    return builder.compile(checkpointer=checkpointer)
+
+
+# 実行グラフ作成（既定はプロセス内メモリーに保存）
+graph = build_graph(MemorySaver())
\ No newline at end of file
@@ -1,10 +1,17 @@
+import argparse
 import requests
 import json
-from typing import Optional
+import time
+import uuid
+from typing import Any, Dict, Iterator, Optional
 
 class AgentClient:
-    def __init__(self, base_url: str = "http://127.0.0.1:8001"):
+    def __init__(self, base_url: str = "http://127.0.0.1:8001", session_id: Optional[str] = None):
         self.base_url = base_url
+        # 会話のセッションID（指定しなければクライアント毎に新しい会話になる）
+        self.session_id = session_id or uuid.uuid4().hex
+        # 直近の ask_stream で最初のイベントを受け取るまでの時間（ミリ秒）
+        self.last_ttfb_ms: Optional[float] = None
 
     def ask(self, question: str) -> Optional[str]:
         """
@@ -19,7 +26,7 @@ class AgentClient:
         try:
             response = requests.post(
                 f"{self.base_url}/ask",
-                json={"input": question},
+                json={"input": question, "session_id": self.session_id},
                 headers={"Content-Type": "application/json"}
             )
             response.raise_for_status()
@@ -28,8 +35,46 @@ class AgentClient:
             print(f"エラーが発生しました: {e}")
             return None
 
+    def ask_stream(self, question: str) -> Iterator[Dict[str, Any]]:
+        """
+        AIエージェントに質問を送信し、応答をイベントとして順に返します。
+
+        Args:
+            question (str): 質問内容
+
+        Yields:
+            Dict[str, Any]: {"event": "token" | "tool_start" | "tool_end" | "done" | "error", ...}
+                token は {"content"}, done は {"response", "session_id", "usage", "ttfb_ms"} を含む
+        """
+        self.last_ttfb_ms = None
+        start = time.perf_counter()
+        try:
+            with requests.post(
+                f"{self.base_url}/ask/stream",
+                json={"input": question, "session_id": self.session_id},
+                headers={"Content-Type": "application/json", "Accept": "text/event-stream"},
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+                event = "message"
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        if self.last_ttfb_ms is None:
+                            self.last_ttfb_ms = (time.perf_counter() - start) * 1000
+                        yield {"event": event, **json.loads(line[len("data:"):])}
+                        event = "message"
+        except requests.exceptions.RequestException as e:
+            yield {"event": "error", "detail": str(e)}
+
 def main():
-    client = AgentClient()
+    parser = argparse.ArgumentParser(description="AIエージェントAPIの対話クライアント")
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--stream", action="store_true", help="応答をストリーミングで表示する")
+    args = parser.parse_args()
+
+    client = AgentClient(args.url)
     
     print("AIエージェントとの対話を開始します。終了するには 'quit' または 'exit' と入力してください。")
     print("-" * 50)
@@ -45,6 +90,20 @@ def main():
             print("質問を入力してください。")
             continue
             
+        if args.stream:
+            print("\nAIの応答:")
+            for event in client.ask_stream(question):
+                if event["event"] == "token":
+                    print(event["content"], end="", flush=True)
+                elif event["event"] == "tool_start":
+                    print(f"\n[ツール呼び出し: {event['name']}]", flush=True)
+                elif event["event"] == "error":
+                    print(f"\nエラーが発生しました: {event.get('detail')}")
+            if client.last_ttfb_ms is not None:
+                print(f"\n(最初の応答まで {client.last_ttfb_ms:.0f} ms)")
+            print("-" * 50)
+            continue
+
         response = client.ask(question)
         if response:
             print("\nAIの応答:")
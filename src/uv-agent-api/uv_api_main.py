@@ -1,13 +1,154 @@
 # main.py
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import os
+import weakref
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from uv_api_agent import graph, memory
-from typing import List, Dict
+from uv_api_agent import agent_lifespan, build_graph, conversation_memory, graph, session_config, warm_up
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# 同時実行数・待ち行列・タイムアウトの設定
+# ASK_MAX_CONCURRENCY: 同時に実行する /ask の数, ASK_MAX_QUEUE: 空きを待てるリクエスト数
+# ASK_QUEUE_TIMEOUT: 空きを待つ秒数, ASK_TIMEOUT: 1リクエストのエージェント実行の上限秒数
+MAX_CONCURRENCY = int(os.getenv("ASK_MAX_CONCURRENCY", "32"))
+MAX_QUEUE = int(os.getenv("ASK_MAX_QUEUE", "100"))
+QUEUE_TIMEOUT = float(os.getenv("ASK_QUEUE_TIMEOUT", "30"))
+ASK_TIMEOUT = float(os.getenv("ASK_TIMEOUT", "120"))
+RETRY_AFTER_SECONDS = 1
+
+# 会話履歴の保存先
+# AGENT_CHECKPOINT_DB: SQLiteファイルのパス（未設定ならプロセス内メモリー。再起動で消える）
+CHECKPOINT_DB = os.getenv("AGENT_CHECKPOINT_DB", "")
+DEFAULT_SESSION_ID = "default"
+
+# /ask/stream の最初のイベント（トークンまたはツール呼び出し）までの時間（直近1000件）
+ttfb_samples = deque(maxlen=1000)
+
+
+class Overloaded(Exception):
+    """Raised when all slots are busy and the wait queue is full (or the wait timed out)."""
+
+
+class InflightLimiter:
+    """
+    Bounds the number of /ask requests executing at once.
+
+    Requests beyond the limit wait in a bounded queue; when the queue is
+    full or the wait exceeds ``queue_timeout``, ``Overloaded`` is raised
+    and the endpoint answers 429 so clients back off instead of piling up.
+
+    Args:
+        max_inflight (int): Requests executing at once
+        max_queue (int): Requests allowed to wait for a slot
+        queue_timeout (float): Seconds a request may wait for a slot
+    """
+
+    def __init__(self, max_inflight: int, max_queue: int, queue_timeout: float):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_inflight)
+
+    def check(self) -> None:
+        """Raises ``Overloaded`` if a new request would be rejected now (holds nothing)."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise Overloaded(f"同時実行数の上限（{self.max_inflight}件）と待ち行列（{self.max_queue}件）が埋まっています")
+
+    @asynccontextmanager
+    async def slot(self):
+        self.check()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded(f"{self.queue_timeout:g}秒以内に実行枠が空きませんでした")
+        finally:
+            self.waiting -= 1
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._semaphore.release()
+
+
+class SessionLocks:
+    """
+    One asyncio.Lock per session.
+
+    Turns of the same session run one at a time (each turn reads the
+    previous turn's checkpoint), while different sessions run in parallel.
+    Locks are held weakly, so idle sessions do not accumulate.
+    """
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+
+    def get(self, session_id: str) -> asyncio.Lock:
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        return lock
+
+
+session_locks = SessionLocks()
+
+
+def get_limiter(app: FastAPI) -> InflightLimiter:
+    # 起動時（lifespan）に作成済みでなければここで作る
+    if getattr(app.state, "limiter", None) is None:
+        app.state.limiter = InflightLimiter(MAX_CONCURRENCY, MAX_QUEUE, QUEUE_TIMEOUT)
+    return app.state.limiter
+
+
+def get_graph(app: FastAPI):
+    # 起動時（lifespan）にSQLiteのグラフを作成していなければ、メモリー保存のグラフを使う
+    return getattr(app.state, "graph", None) or graph
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 実行枠のセマフォとLLMクライアントの接続プールはイベントループに紐づくため、起動毎に作り直す
+    app.state.limiter = None
+    get_limiter(app)
+    async with AsyncExitStack() as stack:
+        await stack.enter_async_context(agent_lifespan())
+        if CHECKPOINT_DB:
+            # 会話履歴をSQLiteに保存（再起動後も残る）
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+            saver = await stack.enter_async_context(AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB))
+            app.state.graph = build_graph(saver)
+            print(f"会話履歴の保存先: {CHECKPOINT_DB}")
+        await _warm_up()
+        yield
+        # 保存先の接続はここで閉じられるため、以降はメモリー保存のグラフに戻す
+        app.state.graph = None
+
+
+async def _warm_up():
+    # 起動時にエージェントを作成しておき、最初のリクエストで待たせない
+    # AGENT_WARMUP: "build"（既定）/ "llm"（LLMへの接続も確立）/ "off"
+    mode = os.getenv("AGENT_WARMUP", "build")
+    if mode != "off":
+        try:
+            elapsed_ms = await asyncio.to_thread(warm_up, ping_llm=(mode == "llm"))
+            print(f"エージェントのウォームアップ完了: {elapsed_ms:.0f} ms")
+        except Exception as e:
+            print(f"エージェントのウォームアップに失敗しました: {str(e)}")
+
 
 app = FastAPI(
     title="AI Agent API",
     description="LangGraphを使用したAIエージェントのAPI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # class Request(BaseModel):
@@ -21,27 +162,28 @@ app = FastAPI(
 #         }
 class Query(BaseModel):
     input: str
+    # 会話のセッションID（セッション毎に会話履歴を分ける）
+    session_id: str = DEFAULT_SESSION_ID
+
+
+async def _run_turn(app: FastAPI, query: Query) -> dict:
+    # 同じセッションのターンは順番に実行する（前のターンの履歴を読んでから次を書く）
+    async with session_locks.get(query.session_id):
+        # エージェントを非同期で呼び出し（会話履歴はチェックポインターからセッション毎に読み込まれる）
+        return await get_graph(app).ainvoke({"input": query.input}, config=session_config(query.session_id))
 
-# 会話履歴を保持するためのグローバル変数
-current_state = {
-    "input": "",
-    "result": "",
-    "chat_history": []
-}
 
 @app.post("/ask", response_model=dict)
-async def ask_endpoint(query: Query):
+async def ask_endpoint(query: Query, request: Request):
     try:
-        # 現在の状態を更新
-        current_state["input"] = query.input
-        
-        # エージェントを呼び出し
-        result = graph.invoke(current_state)
-        
-        # 状態を更新
-        current_state.update(result)
-        
-        return {"response": result["result"]}
+        async with get_limiter(request.app).slot():
+            # 実行中もイベントループは他のリクエストを処理できる
+            result = await asyncio.wait_for(_run_turn(request.app, query), ASK_TIMEOUT)
+            return {"response": result["result"], "session_id": query.session_id, "usage": result.get("usage", {})}
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"エージェントの応答が{ASK_TIMEOUT:g}秒以内に完了しませんでした")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -49,12 +191,137 @@ async def ask_endpoint(query: Query):
 async def root():
     return {"message": "AI Agent API へようこそ！"}
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _stream_event(event: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    # LangGraphのイベントを、クライアントに送るイベント（token / tool_start / tool_end）に変換する
+    kind = event["event"]
+    if kind == "on_chat_model_stream":
+        content = event["data"]["chunk"].content
+        if isinstance(content, str) and content:
+            return "token", {"content": content}
+    elif kind == "on_tool_start":
+        return "tool_start", {"name": event["name"], "input": event["data"].get("input")}
+    elif kind == "on_tool_end":
+        output = event["data"].get("output")
+        return "tool_end", {"name": event["name"], "output": getattr(output, "content", output)}
+    return None
+
+
+async def _stream_turn(app: FastAPI, query: Query, started: float) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    deadline = started + ASK_TIMEOUT
+    first_event_ms = None
+    lock = session_locks.get(query.session_id)
+    try:
+        await asyncio.wait_for(lock.acquire(), max(deadline - loop.time(), 0))
+    except asyncio.TimeoutError:
+        yield _sse("error", {"status": 504, "detail": f"エージェントの応答が{ASK_TIMEOUT:g}秒以内に完了しませんでした"})
+        return
+    try:
+        events = get_graph(app).astream_events(
+            {"input": query.input}, config=session_config(query.session_id), version="v2"
+        )
+        result = {}
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.__anext__(), max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    break
+                # 親のないイベントはグラフ全体の実行（最終的な状態を持つ）
+                if event["event"] == "on_chain_end" and not event.get("parent_ids"):
+                    result = event["data"].get("output") or {}
+                    continue
+                converted = _stream_event(event)
+                if converted is None:
+                    continue
+                if first_event_ms is None:
+                    first_event_ms = (loop.time() - started) * 1000
+                    ttfb_samples.append(first_event_ms)
+                yield _sse(*converted)
+        finally:
+            await events.aclose()
+        yield _sse("done", {
+            "response": result.get("result", ""),
+            "session_id": query.session_id,
+            "usage": result.get("usage", {}),
+            "ttfb_ms": first_event_ms,
+        })
+    except asyncio.TimeoutError:
+        yield _sse("error", {"status": 504, "detail": f"エージェントの応答が{ASK_TIMEOUT:g}秒以内に完了しませんでした"})
+    except Exception as e:
+        yield _sse("error", {"status": 500, "detail": str(e)})
+    finally:
+        lock.release()
+
+
+@app.post("/ask/stream")
+async def ask_stream_endpoint(query: Query, request: Request):
+    """
+    Streams the answer as server-sent events while the agent runs.
+
+    Events: ``token`` (LLM output text), ``tool_start`` / ``tool_end`` (tool
+    calls and results), then ``done`` (final response, usage, ttfb_ms) or
+    ``error`` (status, detail). A full limiter answers 429 before the stream
+    starts; a request that then times out in the queue gets an ``error``
+    event with status 429.
+    """
+    started = asyncio.get_running_loop().time()
+    limiter = get_limiter(request.app)
+    # 空きも待ち行列の余裕もなければストリームを始めずに429を返す（実行枠はまだ確保しない）
+    try:
+        limiter.check()
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+    async def body():
+        # 実行枠はボディの中で確保する。ボディが実行されなければ確保せず、
+        # 切断・中断時もジェネレーターの終了とともに解放される
+        try:
+            async with limiter.slot():
+                async for chunk in _stream_turn(request.app, query, started):
+                    yield chunk
+        except Overloaded as e:
+            yield _sse("error", {"status": 429, "detail": str(e)})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _percentile(samples, q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+@app.get("/health")
+async def health(request: Request):
+    limiter = get_limiter(request.app)
+    return {
+        "status": "ok",
+        "inflight": limiter.inflight,
+        "queued": limiter.waiting,
+        "max_inflight": limiter.max_inflight,
+        "max_queue": limiter.max_queue,
+        "stream_ttfb_p50_ms": _percentile(ttfb_samples, 0.5),
+        "stream_ttfb_p95_ms": _percentile(ttfb_samples, 0.95),
+    }
+
 @app.get("/history")
-async def get_history():
-    return {"history": memory.chat_memory.messages}
+async def get_history(request: Request, session_id: str = DEFAULT_SESSION_ID):
+    snapshot = await get_graph(request.app).aget_state(session_config(session_id))
+    return {"session_id": session_id, "history": snapshot.values.get("chat_history", [])}
 
 @app.delete("/history")
-async def clear_history():
-    memory.chat_memory.clear()
-    current_state["chat_history"] = []
-    return {"message": "会話履歴をクリアしました"}
\ No newline at end of file
+async def clear_history(request: Request, session_id: str = DEFAULT_SESSION_ID):
+    async with session_locks.get(session_id):
+        await get_graph(request.app).checkpointer.adelete_thread(session_id)
+        conversation_memory.forget(session_id)
+    return {"message": "会話履歴をクリアしました", "session_id": session_id}
\ No newline at end of file
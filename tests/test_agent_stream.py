@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langgraph")
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.graph import START, MessagesState, StateGraph
+
+# GUI版のスーパーバイザーモジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "langgraph-supervisor", "gui"))
+
+supervisor = pytest.importorskip("supervisor_workers_multiagents")
+
+
+def _call(name, call_id):
+    return {"name": name, "args": {}, "id": call_id, "type": "tool_call"}
+
+
+def _fake_app():
+    # スーパーバイザー → music_expert（ツール実行後にフェイクモデルが回答）の最小構成
+    model = GenericFakeChatModel(messages=iter([AIMessage(content="Queen の 人気曲 です")]))
+
+    def tools(state):
+        return {"messages": [
+            AIMessage(content="", tool_calls=[_call("search_tracks", "t1")]),
+            ToolMessage(content='{"tracks": []}', name="search_tracks", tool_call_id="t1"),
+        ]}
+
+    def agent(state):
+        return {"messages": [model.invoke(state["messages"])]}
+
+    worker = StateGraph(MessagesState)
+    worker.add_node("tools", tools)
+    worker.add_node("agent", agent)
+    worker.add_edge(START, "tools")
+    worker.add_edge("tools", "agent")
+
+    def route(state):
+        return {"messages": [
+            AIMessage(content="", tool_calls=[_call("transfer_to_music_expert", "h1")]),
+            ToolMessage(content="Transferred", name="transfer_to_music_expert", tool_call_id="h1"),
+        ]}
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("supervisor", route)
+    graph.add_node("music_expert", worker.compile())
+    graph.add_edge(START, "supervisor")
+    graph.add_edge("supervisor", "music_expert")
+    return graph.compile()
+
+
+def test_feed_turns_chunks_into_tokens_handoffs_tool_results_and_done():
+    stream = supervisor.AgentStream()
+    events = []
+    for namespace, mode, chunk in _fake_app().stream(
+        {"messages": [{"role": "user", "content": "Queenの曲"}]},
+        stream_mode=supervisor.AgentStream.STREAM_MODE,
+        subgraphs=True,
+    ):
+        events.extend(stream.feed(namespace, mode, chunk))
+    events.append(stream.done())
+
+    kinds = [event["type"] for event in events]
+    assert kinds[:2] == ["handoff", "tool_result"]
+    assert set(kinds[2:-1]) == {"token"} and kinds[-1] == "done"
+    assert (events[0]["agent"], events[0]["source"]) == ("music_expert", "supervisor")
+    assert (events[1]["agent"], events[1]["name"]) == ("music_expert", "search_tracks")
+
+    tokens = [event for event in events if event["type"] == "token"]
+    assert len(tokens) > 1
+    assert {event["agent"] for event in tokens} == {"music_expert"}
+    assert "".join(event["text"] for event in tokens) == "Queen の 人気曲 です"
+
+    done = events[-1]
+    assert done["ttft_ms"] == tokens[0]["elapsed_ms"]
+    assert done["result"]["messages"][-1].content == "Queen の 人気曲 です"
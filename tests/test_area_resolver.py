@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent_common.area_resolver import resolve_area, resolve_genre
+
+
+@pytest.mark.parametrize("text", ["東京都", "東京都渋谷区", "東京都でお腹すいた"])
+def test_tokyo_prefecture_is_not_read_as_kyoto(text):
+    match = resolve_area(text)
+    assert (match.kind, match.name, match.code, match.start) == ("large_area", "東京", "Z011", 0)
+
+
+def test_area_prefers_the_earliest_then_longest_name():
+    assert resolve_area("新宿三丁目").name == "新宿三丁目"
+    assert resolve_area("渋谷駅周辺").name == "渋谷"
+    # 大エリアと中エリアで同じ名前・同じ位置なら完全一致と同様に大エリア
+    assert resolve_area("京都駅").kind == "large_area"
+
+
+@pytest.mark.parametrize("text", ["ハンバーガー", "バーガー", "おしゃれなバー"])
+def test_genre_inside_a_longer_word_does_not_match(text):
+    assert resolve_genre(text) is None
+
+
+def test_genre_matches_whole_names_and_tokens():
+    assert resolve_genre("バー").code == "G002"
+    assert resolve_genre("イタリアン料理").code == "G005"
+    assert resolve_genre("和食, 焼肉").code == "G008"
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("requests")
+
+# src/ の共通モジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent_common.async_http import BlockingCall, HttpCall, dual_io
+from agent_common.result_cache import ResultCache
+
+
+class Handler(BaseHTTPRequestHandler):
+    failures = {"count": 0}
+
+    def do_GET(self):
+        if self.path.startswith("/flaky") and Handler.failures["count"] < 1:
+            Handler.failures["count"] += 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setenv("HTTP_BACKOFF_FACTOR", "0")
+    monkeypatch.setenv("HTTP_BACKOFF_JITTER", "0")
+
+
+def make_tool(base_url):
+    @dual_io
+    def lookup(name: str) -> dict:
+        """Looks up a name."""
+        try:
+            first = yield HttpCall("GET", f"{base_url}/first", params={"q": name})
+            second = yield HttpCall("GET", "http://127.0.0.1:1/unreachable")
+        except Exception as e:
+            return {"error": type(e).__name__, "first": first.json()["path"], "url": first.url}
+        return {"second": second.json()}
+
+    return lookup
+
+
+def test_sync_and_async_drive_the_same_body(base_url):
+    lookup = make_tool(base_url)
+    sync_result = lookup("a b")
+    async_result = asyncio.run(lookup.acall("a b"))
+
+    assert sync_result["first"] == async_result["first"] == "/first?q=a+b"
+    assert isinstance(async_result["url"], str)
+    assert "error" in sync_result and "error" in async_result
+    assert lookup.__name__ == lookup.acall.__name__ == "lookup"
+
+
+def test_sync_and_async_return_the_same_error_dict(base_url):
+    import requests
+
+    @dual_io
+    def fetch(url: str) -> dict:
+        try:
+            response = yield HttpCall("GET", url)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            # 非同期版もhttpxではなくrequestsの例外で届く
+            return {"error": type(e).__name__, "message": str(e) if isinstance(e, requests.exceptions.HTTPError) else ""}
+        return {"status": response.status_code}
+
+    for url in (f"{base_url}/missing", "http://127.0.0.1:1/unreachable"):
+        assert fetch(url) == asyncio.run(fetch.acall(url))
+    assert fetch(f"{base_url}/missing") == {
+        "error": "HTTPError", "message": f"404 Client Error: Not Found for url: {base_url}/missing"
+    }
+    assert fetch("http://127.0.0.1:1/unreachable")["error"] == "ConnectionError"
+
+
+def test_async_retries_server_errors(base_url):
+    @dual_io
+    def flaky() -> dict:
+        response = yield HttpCall("GET", f"{base_url}/flaky")
+        return {"status": response.status_code}
+
+    assert asyncio.run(flaky.acall()) == {"status": 200}
+
+
+def test_blocking_calls_run_off_the_event_loop(base_url):
+    def slow_token(prefix):
+        if prefix == "bad":
+            raise ValueError("refresh failed")
+        return f"{prefix}-{threading.get_ident()}"
+
+    @dual_io
+    def authorized(prefix: str) -> dict:
+        try:
+            token = yield BlockingCall(slow_token, (prefix,))
+        except ValueError as e:
+            return {"error": str(e)}
+        response = yield HttpCall("GET", f"{base_url}/first", params={"token": token})
+        return {"token": token, "path": response.json()["path"]}
+
+    async def scenario():
+        return threading.get_ident(), await authorized.acall("t")
+
+    loop_thread, result = asyncio.run(scenario())
+    assert result["token"] != f"t-{loop_thread}"
+    assert result["path"] == f"/first?token={result['token']}"
+    assert authorized("t")["token"] == f"t-{threading.get_ident()}"
+    assert asyncio.run(authorized.acall("bad")) == {"error": "refresh failed"}
+
+
+def test_cache_is_shared_between_sync_and_async(base_url):
+    cache = ResultCache()
+    calls = []
+
+    @cache.cached("lookup", ttl=60)
+    @dual_io
+    def lookup(name: str) -> dict:
+        calls.append(name)
+        response = yield HttpCall("GET", f"{base_url}/first", params={"q": name})
+        return response.json()
+
+    assert lookup("x") == asyncio.run(lookup.acall("x"))
+    assert calls == ["x"]
+    assert cache.stats()["tools"]["lookup"]["hits"] == 1
@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+# src/ の共通モジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent_common.conversation_memory import SUMMARY_PREFIX, ConversationMemory
+
+
+def _ten_per_message(messages):
+    return 10 * len(messages)
+
+
+def _conversation(turns):
+    messages = []
+    for i in range(turns):
+        messages += [HumanMessage(content=f"q{i}"), AIMessage(content=f"a{i}")]
+    return messages
+
+
+def test_window_keeps_pinned_context_and_whole_recent_turns():
+    memory = ConversationMemory(max_tokens=60, token_counter=_ten_per_message)
+    tool_turn = [
+        HumanMessage(content="q3"),
+        AIMessage(content="", tool_calls=[{"name": "search", "args": {}, "id": "call-1"}]),
+        ToolMessage(content="result", tool_call_id="call-1"),
+        AIMessage(content="a3"),
+    ]
+    messages = [SystemMessage(content="system")] + _conversation(3) + tool_turn + [HumanMessage(content="q4")]
+
+    prompt = memory.window("s1", messages)
+
+    # system(10) + 現在のターン(10) + ツールを含むターン(40) = 60。それより前のターンは入らない
+    assert [m.content for m in prompt] == ["system", "q3", "", "result", "a3", "q4"]
+    stats = memory.last_stats("s1")
+    assert (stats.prompt_tokens, stats.history_tokens) == (60, 120)
+    assert stats.evicted_messages == 6
+
+
+def test_current_turn_is_kept_even_over_budget():
+    memory = ConversationMemory(max_tokens=10, token_counter=_ten_per_message)
+    messages = _conversation(2) + [HumanMessage(content="q2"), AIMessage(content="", tool_calls=[{"name": "t", "args": {}, "id": "c"}]), ToolMessage(content="r", tool_call_id="c")]
+    assert [m.content for m in memory.window("s1", messages)] == ["q2", "", "r"]
+
+
+def test_evicted_turns_are_summarised_in_the_background():
+    started = threading.Event()
+    calls = []
+
+    def slow_summarizer(previous, messages):
+        started.set()
+        time.sleep(0.5)
+        calls.append((previous, [m.content for m in messages]))
+        return previous + "".join(m.content for m in messages)
+
+    memory = ConversationMemory(max_tokens=40, summarizer=slow_summarizer, token_counter=_ten_per_message)
+    messages = _conversation(3) + [HumanMessage(content="q3")]
+
+    start = time.monotonic()
+    prompt = memory.window("s1", messages)
+    assert time.monotonic() - start < 0.2
+    assert started.wait(1)
+    # 要約が終わるまでは要約なしで直近のターンだけを送る
+    assert [m.content for m in prompt] == ["q2", "a2", "q3"]
+
+    memory.wait_for_summaries(timeout=2)
+    assert memory.summary("s1") == ("q0a0q1a1", 4)
+
+    messages += [AIMessage(content="a3"), HumanMessage(content="q4")]
+    prompt = memory.window("s1", messages)
+    assert prompt[0].content == SUMMARY_PREFIX + "q0a0q1a1"
+    assert memory.last_stats("s1").summarized_messages == 4
+
+    memory.wait_for_summaries(timeout=2)
+    # 2回目は前回の要約と、新たに溢れたメッセージだけを渡す
+    assert calls[-1][0] == "q0a0q1a1"
+    assert calls[-1][1] == ["q2", "a2"]
+
+
+def test_cleared_history_resets_summary_and_hook_uses_thread_id():
+    memory = ConversationMemory(max_tokens=20, summarizer=lambda previous, messages: "summary", token_counter=_ten_per_message)
+    memory.window("s1", _conversation(3) + [HumanMessage(content="q3")])
+    memory.wait_for_summaries(timeout=2)
+    assert memory.summary("s1")[0] == "summary"
+
+    update = memory.pre_model_hook({"messages": [HumanMessage(content="new")]}, {"configurable": {"thread_id": "s1"}})
+    assert [m.content for m in update["llm_input_messages"]] == ["new"]
+    assert memory.summary("s1") == ("", 0)
+
+
+def test_pre_model_hook_bounds_llm_input_of_react_agent():
+    pytest.importorskip("langgraph.prebuilt")
+    from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.prebuilt import create_react_agent
+
+    seen = []
+
+    class RecordingModel(FakeMessagesListChatModel):
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        def _generate(self, messages, *args, **kwargs):
+            seen.append(len(messages))
+            return super()._generate(messages, *args, **kwargs)
+
+    memory = ConversationMemory(max_tokens=50, token_counter=_ten_per_message)
+    model = RecordingModel(responses=[AIMessage(content=f"a{i}") for i in range(6)])
+    agent = create_react_agent(model, [], checkpointer=MemorySaver(), pre_model_hook=memory.pre_model_hook)
+    config = {"configurable": {"thread_id": "t1"}}
+    for i in range(6):
+        result = agent.invoke({"messages": [HumanMessage(content=f"q{i}")]}, config)
+
+    # 保存される履歴は全件、LLMに送るのは予算内の直近のターンだけ
+    assert len(result["messages"]) == 12
+    assert seen == [1, 3, 5, 5, 5, 5]
+    assert memory.last_stats("t1").history_tokens == 110
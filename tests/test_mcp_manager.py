@@ -0,0 +1,98 @@
+import asyncio
+import os
+import signal
+import sys
+
+import pytest
+
+pytest.importorskip("langchain_mcp_adapters")
+
+# src/ の共通モジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent_common.mcp_manager import MCPConnectionManager, ToolSchemaCache
+
+SERVER = '''
+import os
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP("Pid")
+
+
+@mcp.tool()
+def pid() -> str:
+    """Returns the server process id."""
+    return str(os.getpid())
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
+'''
+
+
+def _text(result):
+    return result if isinstance(result, str) else result[0]["text"]
+
+
+@pytest.fixture
+def config(tmp_path):
+    (tmp_path / "server.py").write_text(SERVER, encoding="utf-8")
+    return {"pid": {"command": sys.executable, "args": [str(tmp_path / "server.py")], "transport": "stdio"}}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ToolSchemaCache(str(tmp_path / "schemas.json"))
+
+
+def test_server_is_shared_across_calls_and_event_loops(config, cache):
+    manager = MCPConnectionManager(schema_cache=cache)
+    try:
+        tool = manager.get_tools(config, timeout=30)[0]
+        first = _text(tool.invoke({}))
+
+        async def other_session():
+            # Streamlitのセッションごとに別のイベントループから呼ばれる
+            tools = await manager.aget_tools(config)
+            return _text(await tools[0].ainvoke({}))
+
+        assert asyncio.run(other_session()) == first
+        assert asyncio.new_event_loop().run_until_complete(other_session()) == first
+        assert manager.status()[0]["state"] == "ready"
+    finally:
+        manager.shutdown()
+    assert manager.status()[0]["state"] == "stopped"
+
+
+def test_dead_server_is_restarted_and_call_retried(config, cache):
+    manager = MCPConnectionManager(ping_timeout=0.5, schema_cache=cache)
+    try:
+        tool = manager.get_tools(config, timeout=30)[0]
+        first = _text(tool.invoke({}))
+        os.kill(int(first), signal.SIGKILL)
+        second = _text(tool.invoke({}))
+        assert second != first
+        assert manager.status()[0]["restarts"] == 1
+    finally:
+        manager.shutdown()
+
+
+def test_broken_server_is_left_out_and_schemas_are_cached(config, cache, tmp_path):
+    (tmp_path / "broken.py").write_text('raise SystemExit("boom")', encoding="utf-8")
+    broken = {"command": sys.executable, "args": [str(tmp_path / "broken.py")], "transport": "stdio"}
+    manager = MCPConnectionManager(schema_cache=cache)
+    try:
+        tools = manager.get_tools(dict(config, broken=broken), timeout=60)
+        assert [tool.name for tool in tools] == ["pid"]
+        assert list(manager.unavailable(dict(config, broken=broken))) == ["broken"]
+    finally:
+        manager.shutdown()
+
+    # 別プロセス相当: キャッシュ済みのスキーマで即座にツールを返し、起動は待たない
+    manager = MCPConnectionManager(schema_cache=ToolSchemaCache(str(cache.path)))
+    try:
+        tool = manager.get_tools(config, timeout=60)[0]
+        assert manager.status()[0]["state"] == "starting"
+        assert _text(tool.invoke({})).isdigit()
+    finally:
+        manager.shutdown()
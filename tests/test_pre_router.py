@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+
+# src/ の共通モジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent_common.pre_router import SUPERVISOR, WEAK_RULES, KeywordRules, PreRouter, RouteDecision, build_pre_router
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "src", "langgraph-supervisor", "cli", "pre_router_fixtures.json")
+
+
+def test_rules_route_single_intent_and_defer_multi_intent():
+    rules = KeywordRules()
+    assert rules.route("ＹｏｕＴｕｂｅで料理を見たい").intent == "video"
+    assert rules.route("渋谷のレストランを探して明日の予定に入れて") == RouteDecision(None, 0.0, "rules")
+    assert rules.route("こんにちは") is None
+
+
+def test_ambiguous_keywords_do_not_route_by_themselves():
+    rules = KeywordRules(weak_rules=WEAK_RULES)
+    for text in ("京都旅行の予定を立てて", "ヘアバンドのおすすめ", "アポロ11号の写真", "写真のアルバムを整理したい"):
+        assert rules.route(text) is None
+    # 弱いキーワードが別の意図を示す依頼は複合扱い
+    assert rules.route("渋谷でディナーを探して明日の予定にも入れて") == RouteDecision(None, 0.0, "rules")
+
+    router = build_pre_router()
+    assert router.route("京都旅行の予定を立てて").intent != "scheduler"
+    assert router.route("ブロードバンド回線を比較して").intent != "music"
+    assert router.route("好きなバンドの新しいアルバム").intent == "music"
+    # 「調べて」「について教えて」は調べ物に限らない
+    for text in ("渋谷のイタリアンを調べて", "新宿でおいしい寿司屋を調べて", "ビートルズについて教えて"):
+        assert router.route(text).intent != "research"
+
+
+def test_compound_marks_requests_worth_planning():
+    router = build_pre_router()
+    assert router.route("渋谷でイタリアンのお店と、近くのホテル、移動中に聴けるジャズを探して").compound
+    assert router.route("新宿の居酒屋を探して、あと作業用BGMのプレイリストも教えて").compound
+    # 単一の意図や挨拶はプランナーを通さない
+    assert not router.route("こんにちは").compound
+    assert not router.route("King Gnuの代表曲は？").compound
+    assert not router.route("渋谷のレストランを探して").compound
+
+
+def test_custom_stage_is_pluggable():
+    class Always:
+        def route(self, text):
+            return RouteDecision("math", 0.9, "always")
+
+    decision = PreRouter([Always()]).route("anything")
+    assert decision.intent == "math" and decision.stage == "always"
+    assert PreRouter([]).route("anything").stage == "fallback"
+
+
+def test_fixture_set_has_no_misroutes():
+    with open(FIXTURES, encoding="utf-8") as f:
+        cases = json.load(f)
+    router = build_pre_router()
+
+    correct = misroutes = 0
+    for case in cases:
+        decision = router.route(case["text"])
+        expected = None if case["intent"] == SUPERVISOR else case["intent"]
+        correct += decision.intent == expected
+        misroutes += decision.bypass and decision.intent != expected
+
+    assert misroutes == 0
+    assert correct / len(cases) >= 0.7
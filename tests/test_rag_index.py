@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+pytest.importorskip("langchain_text_splitters")
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# mcp_chat/tools のモジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "streamlit-mcp-server-src", "mcp_chat", "tools"))
+
+from rag_index import RAGIndex
+
+
+def _text_loader(path):
+    # テスト用: テキストファイルを1ページとして読む（"CORRUPT" を含むファイルは読み込みエラー）
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if "CORRUPT" in text:
+        raise ValueError("cannot parse document")
+    yield Document(page_content=text, metadata={"source": path})
+
+
+def _index(tmp_path):
+    return RAGIndex(
+        embeddings=DeterministicFakeEmbedding(size=16),
+        source_dir=str(tmp_path / "docs"),
+        index_dir=str(tmp_path / "index"),
+        pattern="*.txt",
+        loader=_text_loader,
+        refresh_interval=0,
+    )
+
+
+def _write(tmp_path, name, text):
+    (tmp_path / "docs").mkdir(exist_ok=True)
+    (tmp_path / "docs" / name).write_text(text, encoding="utf-8")
+
+
+def _sources(vectorstore):
+    return sorted({doc.metadata["source_file"] for doc in vectorstore.docstore._dict.values()})
+
+
+def test_unreadable_file_is_skipped_and_keeps_its_previous_vectors(tmp_path):
+    _write(tmp_path, "a.txt", "alpha document")
+    _write(tmp_path, "b.txt", "beta document")
+    index = _index(tmp_path)
+    assert _sources(index.load_or_build()) == ["a.txt", "b.txt"]
+
+    _write(tmp_path, "b.txt", "beta CORRUPT now")
+    _write(tmp_path, "c.txt", "CORRUPT from the start")
+    _write(tmp_path, "d.txt", "delta document")
+    assert index.refresh() == {"changed": 1, "removed": 0, "unchanged": 1, "failed": 2}
+    # 読み込めない b.txt は以前のベクトルのまま、c.txt は取り込まれない
+    assert _sources(index.load_or_build()) == ["a.txt", "b.txt", "d.txt"]
+
+    # 内容が変わらない限り再試行しない
+    assert index.refresh()["failed"] == 0
+
+    _write(tmp_path, "b.txt", "beta fixed")
+    assert index.refresh()["changed"] == 1
+    contents = sorted(doc.page_content for doc in index.load_or_build().docstore._dict.values())
+    assert "beta fixed" in contents and "beta document" not in contents
+
+
+def test_missing_index_files_trigger_a_full_rebuild(tmp_path):
+    _write(tmp_path, "a.txt", "alpha document")
+    _index(tmp_path).load_or_build()
+    (tmp_path / "index" / "index.faiss").unlink()
+
+    restarted = _index(tmp_path)
+    assert _sources(restarted.load_or_build()) == ["a.txt"]
+    assert (tmp_path / "index" / "index.faiss").exists()
@@ -0,0 +1,46 @@
+import os
+import sys
+
+# mcp_integration のモジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "streamlit-mcp-server-src", "mcp_integration"))
+
+from restaurant_dedup import geohash_encode, merge_restaurants, normalize_address, normalize_name
+
+
+def test_normalize_name_folds_width_kana_and_suffix():
+    assert normalize_name("焼肉ジュージュー 大崎店") == normalize_name("焼肉じゅーじゅー大崎")
+    assert normalize_name("ＣＡＦＥ　ＭＯＣＨＡ") == normalize_name("Cafe Mocha")
+
+
+def test_normalize_address_google_and_hotpepper_formats():
+    google = normalize_address("日本、〒141-0032 東京都品川区大崎１丁目２−３")
+    hotpepper = normalize_address("東京都品川区大崎1-2-3")
+    assert google == hotpepper
+
+
+def test_geohash_encode_known_value():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_merge_matches_by_normalized_name_and_keeps_unmatched():
+    hp = [
+        {"name": "焼肉ジュージュー 大崎店", "address": "東京都品川区大崎1-2-3", "lat": "35.6197", "lng": "139.7286", "rating": "評価なし"},
+        {"name": "寿司まる", "address": "東京都渋谷区道玄坂2-1-1"},
+    ]
+    gm = [
+        {"name": "Other Place", "address": "日本、東京都港区六本木1-1-1"},
+        {"name": "焼肉じゅーじゅー", "address": "日本、〒141-0032 東京都品川区大崎１丁目２−３",
+         "lat": 35.6198, "lng": 139.7287, "rating": 4.1, "google_maps_url": "https://maps.example/1"},
+    ]
+    merged = merge_restaurants(hp, gm)
+
+    assert [r["name"] for r in merged] == ["焼肉ジュージュー 大崎店", "寿司まる", "Other Place"]
+    assert merged[0]["google_rating"] == 4.1
+    assert merged[0]["rating"] == 4.1
+    assert merged[0]["google_maps_url"] == "https://maps.example/1"
+
+
+def test_merge_rejects_same_name_far_apart():
+    hp = [{"name": "カフェ モカ", "lat": 35.6197, "lng": 139.7286}]
+    gm = [{"name": "カフェモカ", "lat": 34.7025, "lng": 135.4959}]
+    assert len(merge_restaurants(hp, gm)) == 2
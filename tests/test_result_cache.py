@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import time
+
+# src/ の共通モジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent_common.result_cache import ResultCache, SQLiteBackend
+
+
+def test_normalized_arguments_share_an_entry():
+    cache = ResultCache()
+    calls = []
+
+    @cache.cached("spotify_tracks", ttl=60)
+    def search(query: str, limit: int = 10) -> dict:
+        calls.append(query)
+        return {"results": [query]}
+
+    search("Mrs. GREEN APPLE")
+    search("  mrs.　green   apple ")
+    search(query="Mrs. GREEN APPLE", limit=10)
+
+    assert len(calls) == 1
+    assert cache.stats()["tools"]["spotify_tracks"]["hits"] == 2
+    assert search.__name__ == "search"
+
+
+def test_ttl_expiry_and_errors_not_cached():
+    now = [1000.0]
+    cache = ResultCache(clock=lambda: now[0])
+    calls = []
+
+    @cache.cached("youtube_videos", ttl=30)
+    def search(query: str) -> dict:
+        calls.append(query)
+        return {"error": "quota"} if query == "bad" else {"videos": []}
+
+    search("cats")
+    now[0] += 29
+    search("cats")
+    now[0] += 2
+    search("cats")
+    search("bad")
+    search("bad")
+
+    assert calls == ["cats", "cats", "bad", "bad"]
+    assert cache.stats()["tools"]["youtube_videos"]["uncached"] == 2
+
+
+def test_concurrent_identical_calls_are_coalesced():
+    cache = ResultCache()
+    calls = []
+    started = threading.Event()
+
+    @cache.cached("hotpepper_restaurants")
+    def search(location: str) -> dict:
+        calls.append(location)
+        started.set()
+        time.sleep(0.2)
+        return {"restaurants": [location]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(search("渋谷"))) for _ in range(5)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["渋谷"]
+    assert results == [{"restaurants": ["渋谷"]}] * 5
+    assert cache.stats()["tools"]["hotpepper_restaurants"]["coalesced"] == 4
+
+
+def test_sqlite_backend_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = ResultCache(persistent=SQLiteBackend(path))
+    first.set("k", {"v": 1}, ttl=60)
+
+    second = ResultCache(persistent=SQLiteBackend(path))
+    assert second.get("k") == (True, {"v": 1})
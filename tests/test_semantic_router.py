@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# mcp_integration のモジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "streamlit-mcp-server-src", "mcp_integration"))
+
+from semantic_router import EXEMPLARS, HashingEmbedder, SemanticRouter
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(len(texts))
+        return super().embed(texts)
+
+
+def test_exemplars_embedded_once_and_queries_batched():
+    embedder = CountingEmbedder()
+    router = SemanticRouter(EXEMPLARS, embedder)
+    results = router.classify(["あいみょんの歌を聴きたい", "お腹がすいたのでどこかいい店", "こんにちは"])
+
+    assert embedder.calls == [sum(len(v) for v in EXEMPLARS.values()), 3]
+    assert [r.intent for r in results] == ["music", "restaurant", None]
+    assert np.allclose(np.linalg.norm(router.matrix, axis=1), 1.0)
+
+
+def test_threshold_abstains():
+    router = SemanticRouter(EXEMPLARS, HashingEmbedder(), threshold=0.99)
+    match = router.route("あいみょんの歌を聴きたい")
+    assert match.intent is None
+    assert set(match.scores) == {"music", "restaurant"}
+
+
+def test_hashing_backend_unless_configured(monkeypatch):
+    from semantic_router import build_embedder
+
+    # APIキーがあるだけではOpenAIの埋め込み（同期のAPI呼び出し）を使わない
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.delenv("SEMANTIC_ROUTER_BACKEND", raising=False)
+    assert isinstance(build_embedder(), HashingEmbedder)
+
+
+def test_paraphrase_with_prefecture_infers_the_right_area():
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+    from agent_common.area_resolver import resolve_area
+
+    # _restaurant_route(infer_location=True) と同じ推定
+    text = "東京都でお腹すいた"
+    assert SemanticRouter(EXEMPLARS, HashingEmbedder()).route(text).intent == "restaurant"
+    assert resolve_area(text).name == "東京"
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+# src/ の共通モジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent_common.streaming_render import BufferedExpanderRenderer, BufferedMarkdownRenderer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Placeholder:
+    def __init__(self, log):
+        self.log = log
+
+    def markdown(self, text):
+        self.log.append(("markdown", text))
+
+    def expander(self, label, expanded=False):
+        self.log.append(("expander", label))
+        return self
+
+    def empty(self):
+        return self
+
+
+def test_frames_are_coalesced_by_time_and_size():
+    clock = Clock()
+    frames = []
+    renderer = BufferedMarkdownRenderer(frames.append, interval=0.05, max_chars=10, clock=clock)
+    renderer.append("a")  # 最初のチャンクは即座に描画
+    for chunk in "bcd":
+        clock.now += 0.01
+        renderer.append(chunk)
+    assert frames == ["a"]
+    clock.now += 0.05
+    renderer.append("e")  # 時間予算を超えた
+    renderer.append("x" * 10)  # 文字数予算を超えた
+    renderer.append("tail")
+    assert frames == ["a", "abcde", "abcde" + "x" * 10]
+    assert renderer.text.endswith("tail")
+    renderer.flush()
+    assert frames[-1] == renderer.text and renderer.frames == 4
+
+
+def test_expander_is_created_once_per_label():
+    log = []
+    renderer = BufferedExpanderRenderer(Placeholder(log), "tools", interval=0, clock=Clock())
+    renderer.append("1")
+    renderer.append("2")
+    renderer.set_label("tools (invalid)")
+    renderer.append("3")
+    assert [entry for entry in log if entry[0] == "expander"] == [("expander", "tools"), ("expander", "tools (invalid)")]
+    assert log[-1] == ("markdown", "123")
+
+
+def test_utils_reexport_the_shared_renderers():
+    pytest.importorskip("langgraph")
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "streamlit-mcp-server-src", "mcp_integration"))
+    import utils
+
+    assert utils.BufferedMarkdownRenderer is BufferedMarkdownRenderer
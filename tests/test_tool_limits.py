@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from typing import Annotated
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langgraph.prebuilt")
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import START, MessagesState, StateGraph
+from langgraph.prebuilt import InjectedState, ToolNode
+
+# src/ の共通モジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent_common.tool_limits import ToolLimits
+
+
+def slow(x: int) -> dict:
+    """Sleeps 0.3s."""
+    time.sleep(0.3)
+    return {"slow": x}
+
+
+def hang(x: int) -> dict:
+    """Sleeps too long."""
+    time.sleep(2)
+    return {"late": x}
+
+
+def broken(x: int) -> dict:
+    """Always fails."""
+    raise RuntimeError("boom")
+
+
+def with_context(x: int, state: Annotated[dict, InjectedState], config: RunnableConfig) -> str:
+    """Reads injected state and the run config."""
+    return f"{len(state['messages'])}:{config['configurable']['tag']}"
+
+
+async def aslow(x: int) -> dict:
+    await asyncio.sleep(0.3)
+    return {"slow": x}
+
+
+async def ahang(x: int) -> dict:
+    await asyncio.sleep(2)
+
+
+slow.acall = aslow
+hang.acall = ahang
+
+
+def _graph(tools, **kwargs):
+    graph = StateGraph(MessagesState)
+    graph.add_node("tools", ToolNode(tools, **kwargs))
+    graph.add_edge(START, "tools")
+    return graph.compile()
+
+
+def _input(*names):
+    calls = [{"name": name, "args": {"x": i}, "id": f"id_{i}", "type": "tool_call"} for i, name in enumerate(names)]
+    return {"messages": [AIMessage(content="", tool_calls=calls)]}
+
+
+def test_stock_tool_node_keeps_concurrency_injection_and_config():
+    limits = ToolLimits(max_concurrency=4, default_timeout=5)
+    graph = _graph([limits.wrap(f) for f in (slow, with_context)])
+    start = time.monotonic()
+    result = graph.invoke(_input("slow", "slow", "with_context"), {"configurable": {"tag": "t1"}})
+    assert time.monotonic() - start < 0.5
+    assert [m.content for m in result["messages"][1:]] == ['{"slow": 0}', '{"slow": 1}', "1:t1"]
+
+
+def test_timed_out_call_returns_error():
+    limits = ToolLimits(max_concurrency=2, timeouts={"hang": 0.2}, default_timeout=5)
+    graph = _graph([limits.wrap(f) for f in (hang, slow)])
+    start = time.monotonic()
+    result = graph.invoke(_input("hang", "slow"))
+    assert time.monotonic() - start < 1.0
+    contents = [m.content for m in result["messages"][1:]]
+    assert contents == ['{"error": "hang timed out after 0.2s"}', '{"slow": 1}']
+    assert limits.stats == {"calls": 2, "timeouts": 1, "running_after_timeout": 1}
+
+
+def test_timed_out_sync_call_keeps_its_slot_until_its_thread_ends():
+    release = threading.Event()
+
+    def stuck() -> str:
+        release.wait(5)
+        return "late"
+
+    limits = ToolLimits(max_concurrency=1, default_timeout=0.1)
+    stuck_call = limits.limit_sync("stuck", stuck)
+    quick_call = limits.limit_sync("quick", lambda: "ok")
+
+    assert stuck_call() == {"error": "stuck timed out after 0.1s"}
+    assert limits.stats["running_after_timeout"] == 1
+    # 残ったスレッドが枠を占有するため、次の呼び出しはそれが終わるまで待つ（待ち時間はタイムアウトに数えない）
+    threading.Timer(0.3, release.set).start()
+    start = time.monotonic()
+    assert quick_call() == "ok"
+    assert time.monotonic() - start >= 0.25
+    assert limits.stats == {"calls": 2, "timeouts": 1, "running_after_timeout": 0}
+
+
+def test_async_path_uses_acall_with_the_same_limits():
+    limits = ToolLimits(max_concurrency=1, timeouts={"hang": 0.1}, default_timeout=5)
+    graph = _graph([limits.wrap(f) for f in (slow, hang)])
+    start = time.monotonic()
+    result = asyncio.run(graph.ainvoke(_input("slow", "slow", "hang")))
+    # 上限1のため2つの slow は順に実行される
+    assert 0.6 <= time.monotonic() - start < 1.2
+    assert [m.content for m in result["messages"][1:]] == ['{"slow": 0}', '{"slow": 1}', '{"error": "hang timed out after 0.1s"}']
+
+
+def test_tool_errors_are_left_to_the_tool_node():
+    limits = ToolLimits(default_timeout=5)
+    result = _graph([limits.wrap(broken)], handle_tool_errors=True).invoke(_input("broken"))
+    message = result["messages"][-1]
+    assert message.status == "error" and "boom" in message.content
@@ -0,0 +1,93 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("langchain_openai")
+pytest.importorskip("langchain_google_community")
+
+# src/uv-agent-api のモジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "uv-agent-api"))
+
+from fastapi.testclient import TestClient
+
+from stub_llm_server import start_stub_server
+
+_stub, _base_url = start_stub_server(latency_ms=20)
+os.environ["OPENAI_BASE_URL"] = _base_url
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+import uv_api_main
+
+
+def _history(client, session_id):
+    response = client.get("/history", params={"session_id": session_id})
+    assert response.status_code == 200
+    return [message["content"] for message in response.json()["history"]]
+
+
+def test_sessions_keep_separate_histories():
+    with TestClient(uv_api_main.app) as client:
+        client.post("/ask", json={"input": "a1", "session_id": "alice"})
+        client.post("/ask", json={"input": "b1", "session_id": "bob"})
+        response = client.post("/ask", json={"input": "a2", "session_id": "alice"})
+        assert response.status_code == 200
+        assert response.json()["session_id"] == "alice"
+
+        assert _history(client, "alice")[::2] == ["a1", "a2"]
+        assert _history(client, "bob")[::2] == ["b1"]
+
+        client.delete("/history", params={"session_id": "alice"})
+        assert _history(client, "alice") == []
+        assert _history(client, "bob")[::2] == ["b1"]
+
+
+def test_concurrent_turns_of_one_session_are_all_kept():
+    with TestClient(uv_api_main.app) as client:
+        questions = [f"q{i}" for i in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(lambda q: client.post("/ask", json={"input": q, "session_id": "carol"}).status_code, questions))
+        assert statuses == [200] * 8
+        assert sorted(_history(client, "carol")[::2]) == questions
+
+
+def test_sqlite_checkpointer_survives_restart(tmp_path, monkeypatch):
+    pytest.importorskip("langgraph.checkpoint.sqlite")
+    monkeypatch.setattr(uv_api_main, "CHECKPOINT_DB", str(tmp_path / "sessions.sqlite"))
+    with TestClient(uv_api_main.app) as client:
+        client.post("/ask", json={"input": "remember me", "session_id": "dave"})
+    with TestClient(uv_api_main.app) as client:
+        assert _history(client, "dave")[::2] == ["remember me"]
+    # 停止後はメモリー保存のグラフに戻る
+    assert uv_api_main.get_graph(uv_api_main.app) is uv_api_main.graph
+
+
+def test_agent_failure_is_an_error_and_is_not_saved(monkeypatch):
+    import uv_api_agent
+
+    def broken_agent():
+        raise RuntimeError("agent unavailable")
+
+    with TestClient(uv_api_main.app) as client:
+        monkeypatch.setattr(uv_api_agent, "get_agent", broken_agent)
+        response = client.post("/ask", json={"input": "lost", "session_id": "erin"})
+        assert response.status_code == 500
+        assert "agent unavailable" in response.json()["detail"]
+        assert _history(client, "erin") == []
+
+
+def test_each_server_run_gets_its_own_llm_client():
+    import uv_api_agent
+
+    clients = []
+    for run in range(2):
+        with TestClient(uv_api_main.app) as client:
+            clients.append(uv_api_agent.get_llm())
+            # 前回の起動のイベントループは閉じているが、新しい接続プールで応答できる
+            response = client.post("/ask", json={"input": f"run{run}", "session_id": "frank"})
+            assert response.status_code == 200
+            assert _history(client, "frank")[::2] == [f"run{i}" for i in range(run + 1)]
+    assert clients[0] is not clients[1]
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("langchain_openai")
+pytest.importorskip("langchain_google_community")
+
+# src/uv-agent-api のモジュールをインポートできるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "uv-agent-api"))
+
+from fastapi.testclient import TestClient
+
+from stub_llm_server import DEFAULT_ANSWER, start_stub_server
+
+_stub, _base_url = start_stub_server(latency_ms=20)
+os.environ["OPENAI_BASE_URL"] = _base_url
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+import uv_api_main
+
+
+def _events(response):
+    events, name = [], None
+    for line in response.iter_lines():
+        if line.startswith("event:"):
+            name = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            events.append((name, json.loads(line[len("data:"):])))
+    return events
+
+
+def test_stream_sends_tokens_then_done_and_saves_the_turn():
+    with TestClient(uv_api_main.app) as client:
+        with client.stream("POST", "/ask/stream", json={"input": "hello", "session_id": "stream-1"}) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = _events(response)
+
+        names = [name for name, _ in events]
+        assert names[-1] == "done"
+        assert names.count("token") > 1
+        assert "".join(data["content"] for name, data in events if name == "token") == DEFAULT_ANSWER
+
+        done = events[-1][1]
+        assert done["response"] == DEFAULT_ANSWER
+        assert done["session_id"] == "stream-1"
+        assert done["ttfb_ms"] is not None
+
+        history = client.get("/history", params={"session_id": "stream-1"}).json()["history"]
+        assert [message["content"] for message in history] == ["hello", DEFAULT_ANSWER]
+        assert client.get("/health").json()["stream_ttfb_p50_ms"] is not None
+
+
+def test_stream_after_a_previous_server_run_still_sends_tokens():
+    # 前の起動（別のイベントループ）で使ったLLMクライアントを使い回さない
+    with TestClient(uv_api_main.app) as client:
+        assert client.post("/ask", json={"input": "first run", "session_id": "stream-2"}).status_code == 200
+    with TestClient(uv_api_main.app) as client:
+        with client.stream("POST", "/ask/stream", json={"input": "second run", "session_id": "stream-2"}) as response:
+            events = _events(response)
+
+    names = [name for name, _ in events]
+    assert names.count("token") > 1 and names[-1] == "done"
+    assert events[-1][1]["response"] == DEFAULT_ANSWER
+
+
+def test_limiter_rejects_when_slots_and_queue_are_full():
+    async def scenario():
+        limiter = uv_api_main.InflightLimiter(max_inflight=1, max_queue=0, queue_timeout=1)
+        async with limiter.slot():
+            with pytest.raises(uv_api_main.Overloaded):
+                async with limiter.slot():
+                    pass
+        async with limiter.slot():
+            return limiter.inflight
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_stream_holds_no_slot_until_the_body_runs():
+    async def scenario():
+        limiter = uv_api_main.InflightLimiter(max_inflight=1, max_queue=0, queue_timeout=1)
+        request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(limiter=limiter)))
+        query = uv_api_main.Query(input="hello", session_id="never-read")
+
+        # 本文を読まずに捨てたレスポンスは実行枠を確保しない
+        response = await uv_api_main.ask_stream_endpoint(query, request)
+        del response
+        assert (limiter.inflight, limiter.waiting) == (0, 0)
+
+        # 実行枠が埋まっている間は、ストリームを始める前に429を返す
+        async with limiter.slot():
+            with pytest.raises(uv_api_main.HTTPException) as excinfo:
+                await uv_api_main.ask_stream_endpoint(query, request)
+        assert excinfo.value.status_code == 429
+
+        # 途中で読むのをやめたストリームも閉じれば実行枠を返す
+        response = await uv_api_main.ask_stream_endpoint(query, request)
+        iterator = response.body_iterator
+        await iterator.__anext__()
+        assert limiter.inflight == 1
+        await iterator.aclose()
+        return limiter.inflight
+
+    assert asyncio.run(scenario()) == 0